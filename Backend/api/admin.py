@@ -1,23 +1,116 @@
 from django.contrib import admin
-from .models import Category, Product, Order, OrderItem
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ERROR_FLAG, PAGE_VAR
+from .pagination import EstimatedCountPaginator
+from .models import Category, Product, Order, OrderItem, DailySales, ProductSalesDaily, StockMovement, ArchivedOrder
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ("id", "name")
     search_fields = ("name",)
 
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist para tablas grandes: conteo estimado/acotado y sin el segundo COUNT(*) del total."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+class CategoryIdFilter(admin.SimpleListFilter):
+    """
+    Filtro por categoría con un input de id, sin consulta de opciones: el filtro por
+    FK cargaba y pintaba todas las categorías en la barra lateral en cada página.
+    """
+    title = "categoría"
+    parameter_name = "category__id__exact"
+    template = "admin/api/input_filter.html"
+
+    def lookups(self, request, model_admin):
+        return []
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        try:
+            return queryset.filter(category_id=int(self.value()))
+        except ValueError:
+            raise IncorrectLookupParameters(f"{self.parameter_name} debe ser un número.")
+
+    def choices(self, changelist):
+        yield {
+            "parameter_name": self.parameter_name,
+            "value": self.value() or "",
+            "hidden": [
+                (k, v) for k, v in changelist.params.items() if k not in (self.parameter_name, PAGE_VAR, ERROR_FLAG)
+            ],
+            "all_query_string": changelist.get_query_string(remove=[self.parameter_name]),
+        }
+
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(LargeTableAdmin):
     list_display = ("id", "sku", "name", "category", "price", "stock")
-    list_filter = ("category",)
+    list_select_related = ("category",)
+    list_filter = (CategoryIdFilter,)
     search_fields = ("sku", "name")
+    autocomplete_fields = ("category",)
 
 class OrderItemInline(admin.TabularInline):
-    model = Order.items.rel.related_model
+    model = OrderItem
     extra = 0
-    readonly_fields = ("product", "quantity", "price")
+    # snapshots de la línea: mostrar el FK product costaba una consulta por línea
+    fields = readonly_fields = ("product_sku", "product_name", "quantity", "price")
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
-    list_display = ("code", "created_at", "full_name", "payment_method", "total")
+class OrderAdmin(LargeTableAdmin):
+    list_display = ("code", "created_at", "full_name", "status", "payment_method", "total")
+    list_select_related = False   # sin FKs en el listado: nada que unir
+    # cada filtro tiene su índice (status|payment_method, created_at) en el orden del listado
+    list_filter = ("status", "payment_method")
+    date_hierarchy = "created_at"
+    ordering = ("-created_at", "-id")
+    search_fields = ("=code",)
     inlines = [OrderItemInline]
+
+@admin.register(DailySales)
+class DailySalesAdmin(admin.ModelAdmin):
+    list_display = ("day", "orders", "total")
+    date_hierarchy = "day"
+
+@admin.register(ProductSalesDaily)
+class ProductSalesDailyAdmin(LargeTableAdmin):
+    list_display = ("day", "product_sku", "product_name", "units", "revenue")
+    search_fields = ("product_sku",)
+    date_hierarchy = "day"
+
+@admin.register(StockMovement)
+class StockMovementAdmin(LargeTableAdmin):
+    list_display = ("created_at", "product_sku", "kind", "delta", "order", "note")
+    list_select_related = ("order",)   # FK nullable: Django no lo une solo
+    list_filter = ("kind",)
+    search_fields = ("product_sku",)
+    raw_id_fields = ("product", "order")
+
+    # append-only: las correcciones son movimientos nuevos
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(LargeTableAdmin):
+    list_display = ("code", "created_at", "status", "total", "archived_at")
+    list_filter = ("status",)
+    search_fields = ("=code",)
+    exclude = ("payload",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
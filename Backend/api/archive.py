@@ -0,0 +1,45 @@
+# api/archive.py
+"""
+Archivo de órdenes antiguas.
+
+archive_batch mueve un bloque de órdenes (con sus líneas) a ArchivedOrder en una
+transacción corta; archive_orders lo repite hasta vaciar el rango. Order y OrderItem
+quedan solo con el historial reciente, que es lo que recorren listados y admin.
+El detalle y la exportación siguen leyendo las archivadas.
+"""
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from .export import LINE_FIELDS, ORDER_FIELDS
+from .models import ArchivedOrder, Order, OrderItem, StockMovement
+
+
+def archive_batch(ids):
+    """Archiva las órdenes `ids`. Devuelve cuántas se movieron."""
+    with transaction.atomic():
+        orders = list(
+            Order.objects.select_for_update().filter(pk__in=ids).order_by("id").values(*ORDER_FIELDS, "notes")
+        )
+        if not orders:
+            return 0
+        ids = [o["id"] for o in orders]
+        items = {}
+        for line in OrderItem.objects.filter(order_id__in=ids).order_by("order_id", "id").values(
+            "order_id", "product_id", *LINE_FIELDS
+        ):
+            items.setdefault(line.pop("order_id"), []).append(line)
+
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(
+                id=o["id"], code=o["code"], created_at=o["created_at"], status=o["status"], total=o["total"],
+                payload=ArchivedOrder.pack({"order": o, "items": items.get(o["id"], [])}),
+            )
+            for o in orders
+        ])
+        # el ledger pierde el FK (SET_NULL): se deja el código de la orden en la nota
+        StockMovement.objects.filter(order_id__in=ids, note="").update(
+            note=Subquery(Order.objects.filter(pk=OuterRef("order_id")).values("code")[:1])
+        )
+        OrderItem.objects.filter(order_id__in=ids).delete()
+        Order.objects.filter(pk__in=ids).delete()
+    return len(orders)
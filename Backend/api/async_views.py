@@ -0,0 +1,93 @@
+# api/async_views.py
+"""
+Lecturas asíncronas para el modo ASGI (ASYNC_READ_VIEWS=True, ver start.sh).
+
+Solo el GET simple va por el ORM async. Cualquier otro método, o un GET con
+parámetros que la versión async no maneja (búsqueda, paginación...), se delega a la
+vista DRF síncrona. Autenticación y permisos son siempre los de la vista DRF, así
+que las respuestas son las mismas en ambos modos.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework.exceptions import NotFound
+from rest_framework.renderers import JSONRenderer
+
+from . import catalog_cache, routers
+from .models import ArchivedOrder, Order
+from .serializers import (
+    CategorySerializer, OrderSerializer, PRODUCT_LIST_VALUES, archived_order_row, product_rows,
+)
+from .views import CategoryListCreateView, OrderDetailView, ProductListCreateView
+
+
+def _authorize(view_class, request, args, kwargs):
+    """Corre auth/permisos/throttling de la vista DRF. Devuelve (request DRF, respuesta de error o None)."""
+    view = view_class()
+    view.args, view.kwargs = args, kwargs
+    drf_request = view.initialize_request(request, *args, **kwargs)
+    view.request = drf_request
+    view.headers = view.default_response_headers
+    try:
+        view.initial(drf_request, *args, **kwargs)
+    except Exception as exc:
+        response = view.finalize_response(drf_request, view.handle_exception(exc), *args, **kwargs)
+        response.render()
+        return drf_request, response
+    return drf_request, None
+
+
+def hybrid(view_class, async_get, params=()):
+    """GET async (si solo trae `params`); el resto va a view_class.as_view()."""
+    sync_view = view_class.as_view()
+    delegate = sync_to_async(sync_view)
+
+    async def view(request, *args, **kwargs):
+        if request.method != "GET" or not set(request.GET) <= set(params):
+            return await delegate(request, *args, **kwargs)
+        drf_request, denied = await sync_to_async(_authorize)(view_class, request, args, kwargs)
+        if denied is not None:
+            return denied
+        return await async_get(drf_request, *args, **kwargs)
+
+    view.csrf_exempt = True   # igual que las vistas DRF
+    return view
+
+
+def _json(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), content_type="application/json", status=status)
+
+
+# ---------- Catálogo ----------
+def _catalog_db(request):
+    return routers.read_db(request, fresh=catalog_cache.recently_changed())
+
+
+async def _product_list(request):
+    async def load():
+        qs = ProductListCreateView.queryset.using(await sync_to_async(_catalog_db)(request)).values(*PRODUCT_LIST_VALUES)
+        return product_rows([r async for r in qs], request)
+    return await catalog_cache.acached_list(request, load)
+
+
+async def _category_list(request):
+    async def load():
+        qs = CategoryListCreateView.queryset.using(await sync_to_async(_catalog_db)(request))
+        return CategorySerializer([c async for c in qs], many=True).data
+    return await catalog_cache.acached_list(request, load)
+
+
+# ---------- Órdenes ----------
+async def _order_detail(request, pk):
+    try:
+        order = await OrderDetailView.queryset.aget(pk=pk)
+    except Order.DoesNotExist:
+        archived = await ArchivedOrder.objects.filter(pk=pk).afirst()
+        if archived is None:
+            return _json({"detail": NotFound.default_detail}, status=404)
+        return _json(archived_order_row(archived))
+    return _json(OrderSerializer(order, context={"request": request}).data)
+
+
+product_list = hybrid(ProductListCreateView, _product_list)
+category_list = hybrid(CategoryListCreateView, _category_list)
+order_detail = hybrid(OrderDetailView, _order_detail)
@@ -0,0 +1,115 @@
+# api/authentication.py
+"""
+JWT con claims de usuario (username, groups, is_superuser) y modo stateless opcional.
+
+Con JWT_STATELESS_AUTH=True, StatelessJWTAuthentication arma el usuario desde el
+token sin hacer SELECT a auth_user. Para revocar tokens antes de que expiren se usa
+una lista en caché (JWT_REVOCATION_CACHE_ALIAS; revoke_user_tokens / revoke_token),
+consultada en cada request.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.utils.functional import cached_property
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+from .perms import user_groups
+
+
+def add_user_claims(token, user):
+    token["username"] = user.get_username()
+    token["groups"] = list(user_groups(user))
+    token["is_superuser"] = user.is_superuser
+    token["is_staff"] = user.is_staff
+    # "iat" tiene resolución de segundos; la revocación compara contra esta marca
+    token["claims_at"] = time.time()
+    return token
+
+
+# ---------- emisión ----------
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Al refrescar se vuelven a leer los claims (grupos pudieron cambiar)."""
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        refresh = self.token_class(attrs["refresh"])
+        user = get_user_model().objects.filter(
+            **{api_settings.USER_ID_FIELD: refresh[api_settings.USER_ID_CLAIM]}
+        ).first()
+        if user is None:
+            raise AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+        data["access"] = str(add_user_claims(refresh.access_token, user))
+        return data
+
+
+# ---------- revocación (caché) ----------
+# con varios workers JWT_REVOCATION_CACHE_ALIAS tiene que ser compartida, si no la
+# revocación solo llega al proceso que la hizo (ver api/shared_state.py)
+def _cache():
+    return caches[getattr(settings, "JWT_REVOCATION_CACHE_ALIAS", "default")]
+
+def _revoked_user_key(user_id):
+    return f"jwt-revoked-before:{user_id}"
+
+def _revoked_jti_key(jti):
+    return f"jwt-revoked:{jti}"
+
+def _ttl():
+    return int(api_settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+
+def revoke_user_tokens(user_id):
+    """Invalida los access tokens del usuario emitidos hasta ahora."""
+    _cache().set(_revoked_user_key(user_id), time.time(), _ttl())
+
+def revoke_token(jti):
+    _cache().set(_revoked_jti_key(jti), True, _ttl())
+
+def is_revoked(token):
+    user_id = token.get(api_settings.USER_ID_CLAIM)
+    jti = token.get(api_settings.JTI_CLAIM)
+    found = _cache().get_many([_revoked_user_key(user_id), _revoked_jti_key(jti)])
+    before = found.get(_revoked_user_key(user_id))
+    return bool(found.get(_revoked_jti_key(jti))) or (before is not None and token.get("claims_at", 0) < before)
+
+
+# ---------- modo stateless ----------
+class ClaimsUser(TokenUser):
+    """Usuario liviano respaldado por el token; user_groups() lee los grupos del claim."""
+
+    def __init__(self, token):
+        super().__init__(token)
+        self._group_names = tuple(token.get("groups", ()))
+
+    @cached_property
+    def id(self):
+        return int(self.token[api_settings.USER_ID_CLAIM])
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if is_revoked(validated_token):
+            raise AuthenticationFailed("El token fue revocado.", code="token_revoked")
+        # tokens emitidos antes de agregar los claims: camino normal con la BD
+        if "groups" not in validated_token:
+            return super().get_user(validated_token)
+        return ClaimsUser(validated_token)
+
+
+def full_user(request):
+    """El modelo User completo, para los endpoints que lo necesitan (una consulta en modo stateless)."""
+    user = request.user
+    if isinstance(user, TokenUser):
+        return get_user_model().objects.get(pk=user.pk)
+    return user
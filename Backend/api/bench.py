@@ -0,0 +1,106 @@
+# api/bench.py
+"""Utilidades compartidas por los comandos de benchmark (bench_*)."""
+import random
+import statistics
+import time
+
+from django.utils import timezone
+
+from .models import Category, Order, OrderItem, Product, StockMovement
+
+BENCH_PREFIX = "bench-"
+BENCH_CATEGORY = "Bench"
+
+_WORDS = [
+    "ramo", "rosa", "roja", "blanca", "lirio", "tulipán", "orquídea", "cactus", "suculenta",
+    "jade", "macetero", "greda", "vidrio", "tierra", "hoja", "primavera", "deluxe", "mini",
+    "girasol", "clavel", "helecho", "bonsái", "margarita", "hortensia", "lavanda", "arreglo",
+]
+
+
+def seed_products(n, batch_size=2000, seed=42):
+    """Crea n productos sintéticos (ids con prefijo bench-). Devuelve la lista de SKUs."""
+    rnd = random.Random(seed)
+    cat, _ = Category.objects.get_or_create(name=BENCH_CATEGORY)
+    skus = []
+    batch = []
+    for i in range(n):
+        words = rnd.sample(_WORDS, 3)
+        sku = f"{words[0][:4].upper()}-{i:06d}"
+        skus.append(sku)
+        batch.append(Product(
+            id=f"{BENCH_PREFIX}{i}", sku=sku, name=" ".join(words).capitalize(),
+            category=cat, price=rnd.randint(5, 300) * 100, stock=rnd.randint(0, 50),
+        ))
+        if len(batch) >= batch_size:
+            Product.objects.bulk_create(batch)
+            batch = []
+    Product.objects.bulk_create(batch)
+    return skus
+
+
+def seed_orders(n, products, lines=3, batch_size=500, seed=42):
+    """Crea n órdenes pagadas (código BENCH-...) con `lines` ítems cada una sobre `products`."""
+    rnd = random.Random(seed)
+    now = timezone.now()
+    for start in range(0, n, batch_size):
+        orders = Order.objects.bulk_create([
+            Order(
+                code=f"BENCH-{i:08d}", created_at=now - timezone.timedelta(minutes=i),
+                full_name="Cliente Bench", phone="+56 9 0000 0000", delivery_mode="retiro",
+                payment_method=rnd.choice(["efectivo", "debito", "credito"]), status="paid",
+            )
+            for i in range(start, min(start + batch_size, n))
+        ])
+        if orders[0].pk is None:  # backends sin RETURNING (MariaDB < 10.5)
+            orders = list(Order.objects.filter(code__in=[o.code for o in orders]))
+        items = []
+        for order in orders:
+            for product in rnd.sample(products, lines):
+                items.append(OrderItem(
+                    order=order, product=product, product_name=product.name, product_sku=product.sku,
+                    quantity=rnd.randint(1, 3), price=product.price,
+                ))
+        OrderItem.objects.bulk_create(items)
+        for order in orders:
+            order.total = sum(i.quantity * i.price for i in items if i.order_id == order.pk)
+        Order.objects.bulk_update(orders, ["total"])
+
+
+def cleanup_products():
+    StockMovement.objects.filter(product__pk__startswith=BENCH_PREFIX).delete()
+    Product.objects.filter(pk__startswith=BENCH_PREFIX).delete()
+    Category.objects.filter(name=BENCH_CATEGORY, products__isnull=True).delete()
+
+
+def cleanup_orders():
+    Order.objects.filter(code__startswith="BENCH-").delete()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(samples):
+    """Tiempos en segundos -> dict en milisegundos."""
+    return {
+        "n": len(samples),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3) if samples else 0.0,
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+    }
+
+
+def measure(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
@@ -0,0 +1,99 @@
+# api/catalog_cache.py
+"""
+Caché versionada del catálogo (productos y categorías).
+
+Cualquier cambio en Product/Category (signals) o en el stock (checkout) sube la
+versión; las respuestas quedan guardadas por (versión, path + query, host), así
+que nunca hay que invalidarlas una por una.
+"""
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from rest_framework.renderers import JSONRenderer
+
+VERSION_KEY = "catalog:version"
+FRESH_KEY = "catalog:fresh"
+
+
+def _cache():
+    return caches[getattr(settings, "CATALOG_CACHE_ALIAS", "catalog")]
+
+
+def get_version():
+    cache = _cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # en ms: si la clave se pierde, la nueva versión nunca choca con una anterior
+        cache.add(VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    cache = _cache()
+    # la réplica puede ir atrasada: por un rato los listados se arman desde la primaria (api/routers.py)
+    cache.set(FRESH_KEY, 1, getattr(settings, "REPLICA_PIN_SECONDS", 5))
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, int(time.time() * 1000), timeout=None)
+
+
+def recently_changed():
+    return _cache().get(FRESH_KEY) is not None
+
+
+def bump_on_commit():
+    transaction.on_commit(bump_version)
+
+
+def response_key(request, version):
+    raw = f"{request.path}?{request.META.get('QUERY_STRING', '')}|{request.get_host()}|{request.scheme}"
+    return f"catalog:{version}:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+
+def _etag_matches(request, etag):
+    header = request.META.get("HTTP_IF_NONE_MATCH", "")
+    tags = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return etag in tags or "*" in tags
+
+
+def _validators(request, version):
+    key = response_key(request, version)
+    return key, {"ETag": f'"{version}-{key[-16:]}"', "Cache-Control": "no-cache"}
+
+
+class CachedCatalogListMixin:
+    """GET de listado servido desde caché, con ETag / If-None-Match (304 sin tocar la BD)."""
+
+    def list(self, request, *args, **kwargs):
+        key, headers = _validators(request, get_version())
+        if _etag_matches(request, headers["ETag"]):
+            return HttpResponseNotModified(headers=headers)
+
+        cache = _cache()
+        body = cache.get(key)
+        if body is None:
+            data = super().list(request, *args, **kwargs).data
+            body = JSONRenderer().render(data)
+            cache.set(key, body, getattr(settings, "CATALOG_CACHE_TIMEOUT", 600))
+        return HttpResponse(body, content_type="application/json", headers=headers)
+
+
+async def acached_list(request, load):
+    """Lo mismo que CachedCatalogListMixin.list para las vistas async: load() devuelve los datos."""
+    key, headers = _validators(request, await sync_to_async(get_version)())
+    if _etag_matches(request, headers["ETag"]):
+        return HttpResponseNotModified(headers=headers)
+
+    cache = _cache()
+    body = await cache.aget(key)
+    if body is None:
+        body = JSONRenderer().render(await load())
+        await cache.aset(key, body, getattr(settings, "CATALOG_CACHE_TIMEOUT", 600))
+    return HttpResponse(body, content_type="application/json", headers=headers)
@@ -0,0 +1,218 @@
+# api/catalog_import.py
+"""
+Carga masiva del catálogo (CSV o JSON) con upsert por SKU.
+
+Por bloque: una consulta de categorías, una de productos existentes (por SKU, con
+select_for_update), una para validar los ids nuevos, un bulk_create y un bulk_update
+por combinación de columnas (una fila sin stock no reescribe el stock). Las filas con
+error (incluidos largos y rangos del modelo) no se guardan y se informan con su número
+de fila.
+
+Columnas: sku (obligatoria), name, price, stock, category (nombre) o category_id, id.
+"""
+import csv
+import io
+import json
+import uuid
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+
+from . import catalog_cache, events, stock
+from .models import Category, Product, StockMovement
+
+UPDATABLE = ("name", "price", "stock", "category")
+# rango de PositiveIntegerField válido en todos los motores (SQLite no lo valida)
+MAX_INT = 2147483647
+
+
+def read_rows(fh, fmt):
+    """fh: archivo binario o de texto. Devuelve una lista de dicts."""
+    data = fh.read()
+    if isinstance(data, bytes):
+        data = data.decode("utf-8-sig")
+    if fmt == "json":
+        rows = json.loads(data)
+        return rows.get("rows", []) if isinstance(rows, dict) else rows
+    return list(csv.DictReader(io.StringIO(data)))
+
+
+def _int(value, field, errors, required=False):
+    if value in (None, ""):
+        if required:
+            errors[field] = "Obligatorio."
+        return None
+    try:
+        n = int(str(value).strip())
+    except ValueError:
+        errors[field] = "Debe ser un entero."
+        return None
+    if n < 0:
+        errors[field] = "No puede ser negativo."
+        return None
+    if n > MAX_INT:
+        errors[field] = f"No puede ser mayor que {MAX_INT}."
+        return None
+    return n
+
+
+def _check(field, value, errors):
+    """Límites del modelo (max_length, rango del entero en la BD) como error de la fila."""
+    try:
+        Product._meta.get_field(field).clean(value, None)
+    except ValidationError as exc:
+        errors[field] = " ".join(exc.messages)
+
+
+def _clean(row):
+    errors = {}
+    clean = {"sku": str(row.get("sku") or "").strip()}
+    if not clean["sku"]:
+        errors["sku"] = "SKU es obligatorio."
+    for key in ("id", "name"):
+        if str(row.get(key) or "").strip():
+            clean[key] = str(row[key]).strip()
+    for key in ("price", "stock"):
+        n = _int(row.get(key), key, errors)
+        if n is not None:
+            clean[key] = n
+    if str(row.get("category_id") or "").strip():
+        clean["category_id"] = _int(row["category_id"], "category_id", errors)
+    elif str(row.get("category") or "").strip():
+        clean["category_name"] = str(row["category"]).strip()
+    for key in ("sku", "id", "name", "price", "stock"):
+        if clean.get(key) not in (None, "") and key not in errors:
+            _check(key, clean[key], errors)
+    return clean, errors
+
+
+def _new_ids(n, taken):
+    """n ids de 12 hex sin consultas por fila: se validan todos juntos contra la BD."""
+    ids = set()
+    while len(ids) < n:
+        candidates = {uuid.uuid4().hex[:12] for _ in range(n - len(ids))} - taken - ids
+        clash = set(Product.objects.filter(pk__in=candidates).values_list("pk", flat=True))
+        ids |= candidates - clash
+    return list(ids)
+
+
+def import_batch(rows):
+    """rows: [(n_fila, dict)]. Devuelve (creados, actualizados, errores)."""
+    errors, cleaned = [], []
+    seen = set()
+    for n, row in rows:
+        if not isinstance(row, dict):
+            errors.append({"row": n, "sku": "", "errors": {"row": "Fila inválida."}})
+            continue
+        clean, errs = _clean(row)
+        if clean["sku"] and clean["sku"] in seen:
+            errs["sku"] = "SKU repetido en el archivo."
+        seen.add(clean["sku"])
+        if errs:
+            errors.append({"row": n, "sku": clean["sku"], "errors": errs})
+        else:
+            cleaned.append((n, clean))
+
+    names = {c["category_name"] for _, c in cleaned if "category_name" in c}
+    cat_ids = {c["category_id"] for _, c in cleaned if "category_id" in c}
+    by_name, by_id = {}, {}
+    for cat in Category.objects.filter(Q(name__in=names) | Q(pk__in=cat_ids)):
+        by_name[cat.name] = by_id[cat.pk] = cat
+
+    with transaction.atomic():
+        # bloqueadas hasta el commit: el stock escrito es el del archivo, no uno leído antes.
+        # Primero los pk y después FOR UPDATE en orden de PK, como el checkout y el ajuste de
+        # stock: por el índice de sku se bloquearían en orden de SKU (deadlock 1213 con ellos)
+        skus = [c["sku"] for _, c in cleaned]
+        pks = Product.objects.filter(sku__in=skus).values_list("pk", flat=True)
+        existing = {
+            p.sku: p
+            for p in Product.objects.select_for_update().filter(pk__in=list(pks), sku__in=skus).order_by("pk")
+        }
+        explicit_ids = {c["id"] for _, c in cleaned if "id" in c and c["sku"] not in existing}
+        taken_ids = set(Product.objects.filter(pk__in=explicit_ids).values_list("pk", flat=True))
+
+        to_create, to_update, new_ids = [], [], set()
+        for n, c in cleaned:
+            errs = {}
+            category = None
+            if "category_id" in c:
+                category = by_id.get(c["category_id"])
+                if category is None:
+                    errs["category_id"] = "Categoría no existe."
+            elif "category_name" in c:
+                category = by_name.get(c["category_name"])
+                if category is None:
+                    errs["category"] = "Categoría no existe."
+
+            product = existing.get(c["sku"])
+            if product is None:
+                for key in ("name", "price"):
+                    if key not in c:
+                        errs[key] = "Obligatorio para productos nuevos."
+                if category is None and "category" not in errs and "category_id" not in errs:
+                    errs["category"] = "Obligatorio para productos nuevos."
+                if c.get("id") in taken_ids:
+                    errs["id"] = "Ya existe un producto con este id."
+                elif c.get("id") in new_ids:
+                    errs["id"] = "Id repetido en el archivo."
+            if errs:
+                errors.append({"row": n, "sku": c["sku"], "errors": errs})
+                continue
+
+            if product is None:
+                if "id" in c:
+                    new_ids.add(c["id"])
+                to_create.append(Product(
+                    id=c.get("id"), sku=c["sku"], name=c["name"], price=c["price"],
+                    stock=c.get("stock", 0), category=category,
+                ))
+            else:
+                changed = {key for key in ("name", "price", "stock") if key in c}
+                for key in changed:
+                    setattr(product, key, c[key])
+                if category is not None:
+                    product.category = category
+                    changed.add("category")
+                to_update.append((product, changed))
+
+        missing = [p for p in to_create if not p.id]
+        for product, pid in zip(missing, _new_ids(len(missing), explicit_ids | new_ids)):
+            product.id = pid
+
+        Product.objects.bulk_create(to_create)
+        # un bulk_update por combinación de columnas: cada fila escribe solo lo que trae
+        groups = {}
+        for product, changed in to_update:
+            if changed:
+                groups.setdefault(tuple(f for f in UPDATABLE if f in changed), []).append(product)
+        for fields, products in groups.items():
+            Product.objects.bulk_update(products, fields)
+        updated = [p for p, _ in to_update]
+        # bulk_* no dispara signals: ledger y caché a mano
+        StockMovement.objects.bulk_create(
+            [stock.movement(p, "opening", p.stock, note="importación") for p in to_create if p.stock]
+            + [
+                stock.movement(p, "adjust", p.stock - p._loaded_stock, note="importación")
+                for p in updated if p.stock != p._loaded_stock
+            ]
+        )
+        catalog_cache.bump_on_commit()
+        for p in updated:
+            if p.stock != p._loaded_stock:
+                events.publish_on_commit("stock", {"id": p.pk, "stock": p.stock})
+            if p.price != p._loaded_price:
+                events.publish_on_commit("price", {"id": p.pk, "price": p.price})
+    return len(to_create), len(to_update), errors
+
+
+def import_rows(rows, batch_size=500):
+    report = {"created": 0, "updated": 0, "errors": []}
+    numbered = list(enumerate(rows, start=1))
+    for start in range(0, len(numbered), batch_size):
+        created, updated, errors = import_batch(numbered[start:start + batch_size])
+        report["created"] += created
+        report["updated"] += updated
+        report["errors"] += errors
+    return report
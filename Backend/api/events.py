@@ -0,0 +1,297 @@
+# api/events.py
+"""
+Cambios de stock y precio en vivo (Server-Sent Events en /api/events/).
+
+Los cambios se publican después del commit en un broker con los últimos
+EVENTS_BUFFER eventos numerados. El cliente (EventSource) reconecta solo y manda
+Last-Event-ID: recibe lo que le faltó, o un evento "reset" si ya no está en el
+buffer (entonces vuelve a pedir el catálogo).
+
+EVENTS_BACKEND:
+  api.events.LocalBroker  memoria del proceso (un solo worker, o dev)
+  api.events.CacheBroker  caché compartida (EVENTS_CACHE_ALIAS); necesita incr
+                          atómico entre procesos, o sea redis/memcached
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import deque, namedtuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils.module_loading import import_string
+from django.views.decorators.http import require_GET
+
+Event = namedtuple("Event", "id type data")
+
+
+class Broker:
+    def __init__(self, size=1000, poll_interval=1.0):
+        self.size = size
+        self.poll_interval = poll_interval
+
+    def publish(self, type, data):
+        raise NotImplementedError
+
+    def head(self):
+        """Id del último evento publicado."""
+        raise NotImplementedError
+
+    def since(self, last_id):
+        """Eventos posteriores a last_id -> (eventos, reset). reset: last_id ya no está en el buffer."""
+        raise NotImplementedError
+
+    def wait(self, last_id, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            events, reset = self.since(last_id)
+            if events or reset or time.monotonic() >= deadline:
+                return events, reset
+            time.sleep(self.poll_interval)
+
+
+class LocalBroker(Broker):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.events = deque(maxlen=self.size)
+        # ids en ms: tras un reinicio, un Last-Event-ID viejo nunca parece válido
+        self.last_id = int(time.time() * 1000)
+        self.cond = threading.Condition()
+
+    def publish(self, type, data):
+        with self.cond:
+            self.last_id += 1
+            self.events.append(Event(self.last_id, type, data))
+            self.cond.notify_all()
+        return self.last_id
+
+    def head(self):
+        return self.last_id
+
+    def since(self, last_id):
+        with self.cond:
+            if last_id > self.last_id:
+                return [], True   # id de otro proceso o de antes de un reinicio
+            first = self.events[0].id if self.events else self.last_id + 1
+            if last_id < first - 1:
+                return [], True
+            return [e for e in self.events if e.id > last_id], False
+
+    def wait(self, last_id, timeout):
+        with self.cond:
+            self.cond.wait_for(lambda: self.last_id != last_id, timeout)
+        return self.since(last_id)
+
+
+class CacheBroker(Broker):
+    HEAD = "events:head"
+    # un hueco con eventos más nuevos detrás de él: otro publish en vuelo (incr hecho,
+    # set pendiente) si lo que sigue es así de reciente; si no, el evento expiró
+    IN_FLIGHT_SECONDS = 5
+
+    def __init__(self, alias="default", **kwargs):
+        super().__init__(**kwargs)
+        self.cache = caches[alias]
+        self.timeout = getattr(settings, "EVENTS_TTL", 3600)
+
+    def publish(self, type, data):
+        self.cache.add(self.HEAD, int(time.time() * 1000), timeout=None)
+        # el id sale del incr de HEAD: entre el incr y el set, HEAD ya apunta a un evento
+        # que todavía no está (since lo trata como "aún no")
+        event_id = self.cache.incr(self.HEAD)
+        self.cache.set(f"events:{event_id}", (type, data, time.time()), self.timeout)
+        return event_id
+
+    def head(self):
+        return self.cache.get(self.HEAD) or 0
+
+    def since(self, last_id):
+        head = self.head()
+        if last_id > head or last_id < head - self.size:
+            return [], True
+        keys = [f"events:{i}" for i in range(last_id + 1, head + 1)]
+        found = self.cache.get_many(keys)
+        # el tramo contiguo desde last_id; lo que falta al final se publica en el próximo sondeo
+        events = []
+        for key in keys:
+            if key not in found:
+                break
+            events.append(Event(last_id + 1 + len(events), *found[key][:2]))
+        later = [found[k] for k in keys[len(events) + 1:] if k in found]
+        if later and time.time() - later[0][2] >= self.IN_FLIGHT_SECONDS:
+            return [], True   # hueco bajo HEAD: expiró
+        return events, False
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            cls = import_string(getattr(settings, "EVENTS_BACKEND", "api.events.LocalBroker"))
+            kwargs = {"size": getattr(settings, "EVENTS_BUFFER", 1000)}
+            if issubclass(cls, CacheBroker):
+                kwargs["alias"] = getattr(settings, "EVENTS_CACHE_ALIAS", "default")
+            _broker = cls(**kwargs)
+        return _broker
+
+
+def check_broker(app_configs=None, **kwargs):
+    """System check: con EVENTS_BACKEND=cache la caché tiene que responder al arrancar
+    (start.sh corre migrate, que corre los checks), no recién en el primer evento."""
+    cls = import_string(getattr(settings, "EVENTS_BACKEND", "api.events.LocalBroker"))
+    if not issubclass(cls, CacheBroker):
+        return []
+    alias = getattr(settings, "EVENTS_CACHE_ALIAS", "default")
+    try:
+        caches[alias].get(CacheBroker.HEAD)
+    except Exception as exc:
+        return [checks.Error(
+            f"EVENTS_BACKEND=cache: la caché '{alias}' no responde ({exc.__class__.__name__}: {exc}).",
+            hint="Instala requirements.txt (redis) y levanta el servicio redis del compose "
+                 "(EVENTS_CACHE_LOCATION), o usa EVENTS_BACKEND=local con un solo worker.",
+            id="api.E001",
+        )]
+    return []
+
+
+# ---------- publicar ----------
+def publish_on_commit(type, data):
+    transaction.on_commit(lambda: broker().publish(type, data))
+
+
+def stock_changed(product_ids):
+    """Después del commit publica el stock actual de esos productos (tras UPDATEs sin instancias)."""
+    from .models import Product
+
+    ids = list(product_ids)
+
+    def send():
+        b = broker()
+        for pk, stock in Product.objects.filter(pk__in=ids).values_list("pk", "stock"):
+            b.publish("stock", {"id": pk, "stock": stock})
+
+    if ids:
+        transaction.on_commit(send)
+
+
+# ---------- SSE ----------
+def _format(event):
+    return f"id: {event.id}\nevent: {event.type}\ndata: {json.dumps(event.data, ensure_ascii=False)}\n\n"
+
+
+def _chunks(events, reset, b):
+    if reset:
+        # el cliente recarga el catálogo y sigue desde el último id
+        return [_format(Event(b.head(), "reset", {}))]
+    return [_format(e) for e in events]
+
+
+def _start(request, b):
+    """Last-Event-ID (reconexión de EventSource) o ?last_event_id=; si no, desde ahora."""
+    raw = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return b.head()
+
+
+def _stream(last_id, b, deadline):
+    yield f"retry: {getattr(settings, 'EVENTS_RETRY_MS', 3000)}\n\n"
+    while time.monotonic() < deadline:
+        events, reset = b.wait(last_id, timeout=max(0, min(15, deadline - time.monotonic())))
+        chunks = _chunks(events, reset, b)
+        if reset:
+            last_id = b.head()
+        elif events:
+            last_id = events[-1].id
+        yield "".join(chunks) if chunks else ": ping\n\n"
+
+
+async def _astream(last_id, b, deadline):
+    # ASGI: los iteradores sync se consumen completos antes de enviar, así que aquí se sondea
+    yield f"retry: {getattr(settings, 'EVENTS_RETRY_MS', 3000)}\n\n"
+    idle = 0.0
+    while time.monotonic() < deadline:
+        events, reset = await sync_to_async(b.since, thread_sensitive=False)(last_id)
+        if events or reset:
+            chunks = _chunks(events, reset, b)
+            last_id = b.head() if reset else events[-1].id
+            idle = 0.0
+            yield "".join(chunks)
+            continue
+        await asyncio.sleep(b.poll_interval)
+        idle += b.poll_interval
+        if idle >= 15:
+            idle = 0.0
+            yield ": ping\n\n"
+
+
+# ---------- cupo bajo WSGI ----------
+# con gthread cada stream ocupa un thread del worker: pocos por proceso y cortos
+_wsgi_streams = 0
+_wsgi_lock = threading.Lock()
+
+
+def _take_wsgi_slot():
+    global _wsgi_streams
+    with _wsgi_lock:
+        if _wsgi_streams >= getattr(settings, "EVENTS_WSGI_MAX_STREAMS", 2):
+            return False
+        _wsgi_streams += 1
+        return True
+
+
+class _WsgiStream:
+    """Libera el cupo cuando se cierra la respuesta (fin del stream o cliente que se fue)."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.open = True
+
+    def __iter__(self):
+        return self.stream
+
+    def close(self):
+        global _wsgi_streams
+        self.stream.close()
+        if self.open:
+            self.open = False
+            with _wsgi_lock:
+                _wsgi_streams -= 1
+
+
+def _busy():
+    # sin cupo: stream vacío con un retry largo; EventSource reconecta solo, con Last-Event-ID
+    yield f"retry: {getattr(settings, 'EVENTS_BUSY_RETRY_MS', 15000)}\n\n"
+
+
+@require_GET
+def events_view(request):
+    """
+    GET /api/events/: stream text/event-stream; se corta cada EVENTS_STREAM_SECONDS y el
+    cliente reconecta. Bajo WSGI el corte es a los EVENTS_WSGI_STREAM_SECONDS y hay a lo
+    más EVENTS_WSGI_MAX_STREAMS por proceso.
+    """
+    b = broker()
+    last_id = _start(request, b)
+    if hasattr(request, "scope"):
+        deadline = time.monotonic() + getattr(settings, "EVENTS_STREAM_SECONDS", 300)
+        stream = _astream(last_id, b, deadline)
+    elif _take_wsgi_slot():
+        deadline = time.monotonic() + getattr(settings, "EVENTS_WSGI_STREAM_SECONDS", 25)
+        stream = _WsgiStream(_stream(last_id, b, deadline))
+    else:
+        stream = _busy()
+    response = StreamingHttpResponse(stream, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"   # nginx: no juntar el stream en buffer
+    return response
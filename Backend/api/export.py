@@ -0,0 +1,125 @@
+# api/export.py
+"""
+Exportación de órdenes / líneas en CSV o NDJSON, en streaming.
+
+La exportación incluye también las órdenes archivadas: primero se recorre
+ArchivedOrder y después Order (iter_history). Ambas se leen por keyset (id > último)
+en bloques de chunk_size, con una sola consulta de ítems por bloque en Order. La
+memoria no depende del rango exportado: en MariaDB el cursor por defecto de
+mysqlclient trae el resultado completo al cliente, así que un único .iterator()
+sobre todo el rango no bastaría.
+"""
+import csv
+import json
+from datetime import date, datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import ArchivedOrder, Order, OrderItem
+
+ORDER_FIELDS = [
+    "id", "code", "created_at", "status", "full_name", "email", "phone",
+    "delivery_mode", "address", "payment_method", "total",
+]
+LINE_FIELDS = ["product_sku", "product_name", "quantity", "price"]
+FORMATS = ("csv", "ndjson")
+KINDS = ("orders", "lines")
+
+
+def parse_day(value):
+    """'YYYY-MM-DD' -> date (ValueError si no es válida)."""
+    return date.fromisoformat(value) if value else None
+
+
+def order_queryset(date_from=None, date_to=None, status=None, using=None, model=Order):
+    qs = model.objects.using(using)
+    if date_from:
+        qs = qs.filter(created_at__gte=timezone.make_aware(datetime.combine(date_from, time.min)))
+    if date_to:
+        qs = qs.filter(created_at__lt=timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min)))
+    if status:
+        qs = qs.filter(status=status)
+    return qs
+
+
+def iter_orders(qs, chunk_size=1000):
+    """Genera (orden, [líneas]) como dicts, bloque a bloque."""
+    last_id = 0
+    while True:
+        chunk = list(qs.filter(id__gt=last_id).order_by("id").values(*ORDER_FIELDS)[:chunk_size])
+        if not chunk:
+            return
+        lines = {}
+        items = (
+            OrderItem.objects.using(qs.db).filter(order_id__in=[o["id"] for o in chunk])
+            .order_by("order_id", "id")
+            .values("order_id", *LINE_FIELDS)
+        )
+        for item in items.iterator(chunk_size=chunk_size):
+            lines.setdefault(item.pop("order_id"), []).append(item)
+        for order in chunk:
+            order["created_at"] = timezone.localtime(order["created_at"])
+            yield order, lines.get(order["id"], [])
+        last_id = chunk[-1]["id"]
+
+
+def iter_archived(qs, chunk_size=1000):
+    """Lo mismo que iter_orders sobre un queryset de ArchivedOrder (payload comprimido)."""
+    last_id = 0
+    while True:
+        chunk = list(qs.filter(id__gt=last_id).order_by("id")[:chunk_size])
+        if not chunk:
+            return
+        for archived in chunk:
+            data = archived.unpack()
+            order = {f: data["order"].get(f) for f in ORDER_FIELDS}
+            order["created_at"] = timezone.localtime(archived.created_at)
+            order["status"] = archived.status
+            yield order, [{f: line[f] for f in LINE_FIELDS} for line in data["items"]]
+        last_id = chunk[-1].id
+
+
+def iter_history(date_from=None, date_to=None, status=None, using=None, chunk_size=1000):
+    """Órdenes archivadas (las más antiguas) y después las vigentes."""
+    yield from iter_archived(order_queryset(date_from, date_to, status, using, ArchivedOrder), chunk_size)
+    yield from iter_orders(order_queryset(date_from, date_to, status, using), chunk_size)
+
+
+class _Echo:
+    """Pseudo-buffer para csv.writer: devuelve la línea en vez de guardarla."""
+
+    def write(self, value):
+        return value
+
+
+def csv_rows(orders, kind="orders"):
+    writer = csv.writer(_Echo())
+    if kind == "lines":
+        yield writer.writerow(["order_code", "created_at", "status", *LINE_FIELDS, "line_total"])
+        for order, lines in orders:
+            for line in lines:
+                yield writer.writerow([
+                    order["code"], order["created_at"].isoformat(), order["status"],
+                    *(line[f] for f in LINE_FIELDS), line["quantity"] * line["price"],
+                ])
+    else:
+        yield writer.writerow([*ORDER_FIELDS, "items"])
+        for order, lines in orders:
+            order["created_at"] = order["created_at"].isoformat()
+            yield writer.writerow([*(order[f] for f in ORDER_FIELDS), len(lines)])
+
+
+def ndjson_rows(orders, kind="orders"):
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=DjangoJSONEncoder().default).encode
+    for order, lines in orders:
+        if kind == "lines":
+            for line in lines:
+                yield dumps({"order_code": order["code"], "created_at": order["created_at"],
+                             "status": order["status"], **line}) + "\n"
+        else:
+            yield dumps({**order, "items": lines}) + "\n"
+
+
+def export_rows(fmt, kind, orders):
+    return (csv_rows if fmt == "csv" else ndjson_rows)(orders, kind)
@@ -0,0 +1,102 @@
+# api/idempotency.py
+"""
+Idempotency-Key para POST que crean cosas (checkout).
+
+El primer request con una clave la marca "en curso" (cache.add, atómico) y corre la
+vista; si responde 2xx se guarda la respuesta IDEMPOTENCY_TTL segundos. Un reintento
+con la misma clave recibe esa respuesta sin volver a tocar la BD; uno concurrente
+espera a que termine el primero. Si el primero falla, la clave se libera.
+
+La marca "en curso" dura IDEMPOTENCY_LOCK_SECONDS y se renueva mientras corre la vista:
+un checkout esperando bloqueos de fila puede tardar más que eso (innodb_lock_wait_timeout
+es 50 s por sentencia), y si la marca venciera, el reintento del cliente arrancaría un
+segundo checkout. Si el worker muere, la marca vence sola a los IDEMPOTENCY_LOCK_SECONDS.
+
+Con varios workers la caché (IDEMPOTENCY_CACHE_ALIAS) tiene que ser compartida y con
+add atómico (redis/memcached): con locmem gunicorn no arranca más de un worker (ver
+api/shared_state.py).
+"""
+import hashlib
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+HEADER = "Idempotency-Key"
+PENDING = "pending"
+
+
+def _cache():
+    return caches[getattr(settings, "IDEMPOTENCY_CACHE_ALIAS", "default")]
+
+
+def _fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def _error(detail, code):
+    return Response({"detail": detail}, status=code)
+
+
+def _keep_pending(key, ttl, stop):
+    """Renueva la marca "en curso" cada ttl/3 segundos hasta que la vista termina."""
+    cache = _cache()
+    try:
+        while not stop.wait(ttl / 3):
+            cache.touch(key, ttl)
+    finally:
+        cache.close()
+
+
+class IdempotentPostMixin:
+    """POST con Idempotency-Key: el mismo resultado por clave y usuario, una sola ejecución."""
+
+    def post(self, request, *args, **kwargs):
+        raw = request.headers.get(HEADER)
+        if not raw:
+            return super().post(request, *args, **kwargs)
+        if len(raw) > 255:
+            return _error(f"{HEADER} demasiado larga.", status.HTTP_400_BAD_REQUEST)
+
+        cache = _cache()
+        key = f"idem:{request.path}:{request.user.pk}:{hashlib.sha1(raw.encode()).hexdigest()}"
+        fingerprint = _fingerprint(request)
+        lock_ttl = getattr(settings, "IDEMPOTENCY_LOCK_SECONDS", 30)
+        deadline = time.monotonic() + getattr(settings, "IDEMPOTENCY_WAIT_SECONDS", 10)
+
+        while not cache.add(key, (PENDING, fingerprint), lock_ttl):
+            stored = cache.get(key)
+            if stored is not None:
+                if stored[1] != fingerprint:
+                    return _error(f"{HEADER} ya usada con otro contenido.", status.HTTP_422_UNPROCESSABLE_ENTITY)
+                if stored[0] != PENDING:
+                    _, _, code, data = stored
+                    return Response(data, status=code, headers={"Idempotent-Replayed": "true"})
+            # en curso, o liberada entre el add y el get: se reintenta hasta el plazo
+            if time.monotonic() >= deadline:
+                return _error("La misma solicitud todavía se está procesando.", status.HTTP_409_CONFLICT)
+            time.sleep(0.1)
+
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=_keep_pending, args=(key, lock_ttl, stop), daemon=True)
+        heartbeat.start()
+        try:
+            response = super().post(request, *args, **kwargs)
+        except BaseException:
+            cache.delete(key)
+            raise
+        finally:
+            # antes de escribir el resultado: un touch tardío no puede alargar otra cosa
+            stop.set()
+            heartbeat.join()
+        if status.is_success(response.status_code):
+            cache.set(key, ("done", fingerprint, response.status_code, response.data),
+                      getattr(settings, "IDEMPOTENCY_TTL", 86400))
+        else:
+            cache.delete(key)
+        return response
@@ -0,0 +1,122 @@
+# api/images.py
+"""
+Variantes redimensionadas (WebP + JPEG) de Product.image.
+
+Se generan en un pool de threads después del commit, así el request que sube la
+imagen no espera a Pillow. El resultado queda en Product.image_variants:
+    {"src": "<image.name>", "webp": {"200": "<path>", ...}, "jpeg": {...}}
+"""
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connection, transaction
+from PIL import Image, ImageOps
+
+from . import catalog_cache
+from .models import Product
+
+log = logging.getLogger(__name__)
+
+VARIANT_DIR = "products/variants"
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def widths():
+    return tuple(getattr(settings, "IMAGE_VARIANT_WIDTHS", (200, 400, 800)))
+
+
+def needs_variants(product):
+    name = product.image.name if product.image else ""
+    return (product.image_variants or {}).get("src", "") != name
+
+
+def variant_files(variants):
+    """Nombres en el storage de todas las variantes de un mapa image_variants."""
+    return [path for fmt in FORMATS for path in ((variants or {}).get(fmt) or {}).values()]
+
+
+def render_variants(src):
+    """Genera los archivos para la imagen `src` (nombre en el storage) y devuelve el mapa."""
+    with default_storage.open(src, "rb") as fh:
+        img = ImageOps.exif_transpose(Image.open(fh))
+        img.load()
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+
+    variants = {"src": src}
+    sizes = [w for w in widths() if w < img.width] or [img.width]
+    for fmt, (pil_format, options) in FORMATS.items():
+        variants[fmt] = {}
+        for w in sizes:
+            copy = img.copy()
+            copy.thumbnail((w, w * 4), Image.LANCZOS)
+            buf = io.BytesIO()
+            copy.save(buf, pil_format, **options)
+            # ContentAddressedStorage guarda <sha256>.<ext>: del nombre solo cuentan
+            # directorio y extensión, y una variante idéntica no se reescribe
+            variants[fmt][str(w)] = default_storage.save(f"{VARIANT_DIR}/{w}.{fmt}", ContentFile(buf.getvalue()))
+    return variants
+
+
+def build_variants(product_id):
+    product = Product.objects.filter(pk=product_id).only("id", "image", "image_variants").first()
+    if product is None or not needs_variants(product):
+        return
+    src = product.image.name if product.image else ""
+    variants = render_variants(src) if src else {}
+    # si la imagen cambió mientras tanto, el otro job se encarga
+    if Product.objects.filter(pk=product_id, image=src).update(image_variants=variants):
+        catalog_cache.bump_version()
+
+
+def _run(product_id):
+    close_old_connections()
+    try:
+        build_variants(product_id)
+    except Exception:
+        log.exception("No se pudieron generar las variantes de imagen de %s", product_id)
+    finally:
+        connection.close()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "IMAGE_VARIANT_WORKERS", 2),
+                thread_name_prefix="img-variants",
+            )
+        return _executor
+
+
+def schedule(product):
+    pk = product.pk
+    if getattr(settings, "IMAGE_VARIANTS_ASYNC", True):
+        transaction.on_commit(lambda: _get_executor().submit(_run, pk))
+    else:
+        transaction.on_commit(lambda: build_variants(pk))
+
+
+def srcset(variants, url=default_storage.url):
+    """{"webp": {"200": path}} -> {"webp": "url 200w, url 400w"} para <source srcset>.
+    `url` convierte el nombre en el storage a URL (absoluta si corresponde)."""
+    out = {}
+    for fmt in FORMATS:
+        sizes = (variants or {}).get(fmt) or {}
+        out[fmt] = ", ".join(
+            f"{url(path)} {w}w"
+            for w, path in sorted(sizes.items(), key=lambda kv: int(kv[0]))
+        )
+    return out
@@ -0,0 +1,38 @@
+# api/management/commands/archive_orders.py
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.archive import archive_batch
+from api.models import Order
+
+
+class Command(BaseCommand):
+    help = "Mueve a ArchivedOrder las órdenes más antiguas que --older-than-days, en bloques cortos"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than-days", type=int, default=getattr(settings, "ORDER_ARCHIVE_AFTER_DAYS", 365))
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--sleep", type=float, default=0.0, help="pausa entre bloques (s), para no saturar la réplica")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, older_than_days, batch_size, sleep, dry_run, **kwargs):
+        cutoff = timezone.now() - timedelta(days=older_than_days)
+        pending = Order.objects.filter(created_at__lt=cutoff)
+        if dry_run:
+            self.stdout.write(f"{pending.count()} órdenes anteriores a {cutoff:%Y-%m-%d}.")
+            return
+
+        moved = 0
+        while True:
+            ids = list(pending.order_by("id").values_list("id", flat=True)[:batch_size])
+            if not ids:
+                break
+            moved += archive_batch(ids)
+            self.stdout.write(f"  {moved} archivadas…")
+            if sleep:
+                time.sleep(sleep)
+        self.stdout.write(self.style.SUCCESS(f"{moved} órdenes archivadas (anteriores a {cutoff:%Y-%m-%d})."))
@@ -0,0 +1,237 @@
+# api/management/commands/bench_api.py
+"""
+Benchmark de regresión de la API.
+
+Siembra un dataset configurable y recorre los endpoints calientes con el cliente de
+test de Django (secuencial, midiendo consultas SQL) y con un driver concurrente
+(threads). Compara contra un baseline guardado y termina con error si se supera.
+
+    DB_ENGINE=sqlite python manage.py bench_api
+    docker compose run --rm backend python manage.py bench_api --in-place   # MariaDB del compose
+
+Un cambio que agrega consultas a un endpoint regraba el baseline (--save-baseline) en
+el mismo commit y explica por qué.
+
+Por defecto corre en una base de test desechable; --in-place usa la base configurada
+(el usuario de la app en el contenedor de MariaDB no puede crear bases) y borra al
+final los datos sembrados. El checkout (orders_create) suma a DailySales y
+ProductSalesDaily: la limpieza recalcula esos días desde las órdenes que quedan.
+OrderSequence no se rebobina: los códigos usados quedan como huecos, igual que los
+bloques sin usar de api/sequences.py (rebobinar podría repetir un código si entró
+una orden real durante el bench).
+"""
+import json
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_databases, teardown_databases
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api import catalog_cache
+from api.bench import cleanup_orders, cleanup_products, seed_orders, seed_products, summarize
+from api.models import Order, Product
+
+BENCH_USER = "bench-admin"
+
+
+class Command(BaseCommand):
+    help = "Latencia p50/p95/p99, throughput y consultas SQL por endpoint, contra un baseline"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=2000)
+        parser.add_argument("--orders", type=int, default=5000)
+        parser.add_argument("--requests", type=int, default=50, help="requests secuenciales por endpoint")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--concurrent-requests", type=int, default=200)
+        parser.add_argument("--baseline", help="JSON de baseline (por defecto bench/baseline.<motor>.json)")
+        parser.add_argument("--save-baseline", action="store_true", help="guardar los resultados como baseline")
+        parser.add_argument("--tolerance", type=float, default=0.5,
+                            help="holgura de latencia sobre el baseline (0.5 = +50%%)")
+        parser.add_argument("--in-place", action="store_true", help="usar la base configurada en vez de una de test")
+        parser.add_argument("--output", help="escribir los resultados en este JSON")
+
+    def handle(self, *args, **opts):
+        # ids de las órdenes que crea el checkout del bench: la limpieza borra solo esas
+        self.created_orders = []
+        old_config = None
+        if not opts["in_place"]:
+            old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            self.seed(opts["products"], opts["orders"])
+            try:
+                results = self.run(opts)
+            finally:
+                self.cleanup()
+        finally:
+            if old_config is not None:
+                teardown_databases(old_config, verbosity=0)
+
+        self.report(results)
+        if opts["output"]:
+            Path(opts["output"]).write_text(json.dumps(results, indent=2))
+
+        path = Path(opts["baseline"] or settings.BASE_DIR / "bench" / f"baseline.{connection.vendor}.json")
+        if opts["save_baseline"]:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(results, indent=2) + "\n")
+            self.stdout.write(self.style.SUCCESS(f"Baseline guardado en {path}"))
+            return
+        if not path.exists():
+            self.stdout.write(self.style.WARNING(f"Sin baseline en {path} (usa --save-baseline)."))
+            return
+        failures = compare(results, json.loads(path.read_text()), opts["tolerance"])
+        for line in failures:
+            self.stderr.write(line)
+        if failures:
+            raise CommandError(f"{len(failures)} regresiones contra {path}")
+        self.stdout.write(self.style.SUCCESS(f"Sin regresiones contra {path}"))
+
+    # ---------- dataset ----------
+    def seed(self, n_products, n_orders):
+        self.cleanup()
+        skus = seed_products(n_products)
+        Product.objects.filter(pk__startswith="bench-").update(stock=10 ** 6)
+        self.product_ids = list(Product.objects.filter(sku__in=skus[:200]).values_list("pk", flat=True))
+        seed_orders(n_orders, list(Product.objects.filter(pk__in=self.product_ids[:50])))
+        self.order_ids = list(Order.objects.filter(code__startswith="BENCH-").values_list("pk", flat=True)[:500])
+
+        user, _ = User.objects.get_or_create(username=BENCH_USER)
+        user.groups.add(Group.objects.get_or_create(name="admin")[0])
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(user).access_token}"}
+
+    def cleanup(self):
+        # solo las órdenes del checkout pasaron por record_sale (las sembradas no tocan rollups).
+        # Por id, no por nombre: con --in-place la base tiene órdenes reales
+        checkout = Order.objects.filter(pk__in=self.created_orders)
+        days = {timezone.localdate(d) for d in checkout.values_list("created_at", flat=True)}
+        checkout.delete()
+        self.created_orders = []
+        cleanup_orders()
+        cleanup_products()
+        User.objects.filter(username=BENCH_USER).delete()
+        if days:
+            span = {"date_from": min(days).isoformat(), "date_to": max(days).isoformat()}
+            call_command("rebuild_daily_sales", **span, stdout=self.stdout)
+            call_command("rebuild_product_sales", **span, stdout=self.stdout)
+
+    # ---------- escenarios ----------
+    def endpoints(self):
+        rnd = random.Random(1)
+
+        def checkout_body():
+            return json.dumps({
+                "customer": {"full_name": "Cliente Bench", "phone": "+56 9 0000 0000"},
+                "delivery": {"mode": "retiro"},
+                "payment_method": "efectivo",
+                # pocos SKU calientes, como un día de alta demanda: mide el checkout en régimen
+                # (filas del día ya creadas en ProductSalesDaily), no la primera venta de cada SKU
+                "items": [{"product_id": pid, "quantity": 1} for pid in rnd.sample(self.product_ids[:20], 3)],
+            })
+
+        def create_order(client):
+            response = client.post("/api/orders/", checkout_body(), content_type="application/json", **self.auth)
+            if response.status_code == 201:
+                self.created_orders.append(response.json()["id"])   # list.append: seguro entre threads
+            return response
+
+        def products_cold(client):
+            catalog_cache.bump_version()
+            return client.get("/api/products/", **self.auth)
+
+        return {
+            "products_list_cold": products_cold,
+            "products_list_cached": lambda c: c.get("/api/products/", **self.auth),
+            "products_search": lambda c: c.get("/api/products/", {"search": rnd.choice(["ros", "ramo", "mini"])}, **self.auth),
+            "orders_create": create_order,
+            "orders_list_page": lambda c: c.get("/api/orders/list/", {"limit": 50}, **self.auth),
+            "orders_detail": lambda c: c.get(f"/api/orders/{rnd.choice(self.order_ids)}/", **self.auth),
+        }
+
+    def run(self, opts):
+        results = {}
+        # SQLite serializa escrituras: el checkout concurrente solo se mide en MariaDB
+        concurrent_writes = connection.vendor != "sqlite"
+        for name, call in self.endpoints().items():
+            client = Client()
+            call(client)  # warm-up
+            samples, queries, errors = [], [], 0
+            for _ in range(opts["requests"]):
+                with CaptureQueriesContext(connection) as ctx:
+                    t0 = time.perf_counter()
+                    response = call(client)
+                    samples.append(time.perf_counter() - t0)
+                queries.append(len(ctx))
+                errors += response.status_code >= 400
+            # mediana, no máximo: la recarga periódica del bloque de códigos (api/sequences.py)
+            # o la primera venta del día de un SKU no deciden si el gate falla
+            row = {"queries": statistics.median_high(queries), "errors": errors, **summarize(samples)}
+            if concurrent_writes or not name.startswith("orders_create"):
+                row["concurrent"] = self.run_concurrent(call, opts["concurrency"], opts["concurrent_requests"])
+            results[name] = row
+        return results
+
+    def run_concurrent(self, call, workers, total):
+        local = threading.local()
+        samples, errors = [], []
+
+        def one(_):
+            if not hasattr(local, "client"):
+                local.client = Client()
+            t0 = time.perf_counter()
+            try:
+                status = call(local.client).status_code
+            except Exception:
+                status = 599
+            samples.append(time.perf_counter() - t0)
+            if status >= 400:
+                errors.append(status)
+
+        def close_connection(_):
+            connection.close()
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(one, range(total)))
+            list(pool.map(close_connection, range(workers)))
+        elapsed = time.perf_counter() - t0
+        return {"workers": workers, "rps": round(total / elapsed, 1), "errors": len(errors), **summarize(samples)}
+
+    def report(self, results):
+        self.stdout.write(f"{'endpoint':<22}{'queries':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'rps':>9}{'p95 conc':>10}")
+        for name, r in results.items():
+            conc = r.get("concurrent", {})
+            self.stdout.write(
+                f"{name:<22}{r['queries']:>8}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}"
+                f"{conc.get('rps', '-'):>9}{conc.get('p95_ms', '-'):>10}"
+            )
+
+
+def compare(results, baseline, tolerance):
+    """Lista de regresiones: más consultas que el baseline, p95 sobre el margen o errores nuevos."""
+    failures = []
+    for name, base in baseline.items():
+        cur = results.get(name)
+        if cur is None:
+            continue
+        if cur["queries"] > base["queries"]:
+            failures.append(f"{name}: {cur['queries']} consultas (baseline {base['queries']})")
+        if cur["errors"] > base.get("errors", 0):
+            failures.append(f"{name}: {cur['errors']} respuestas con error")
+        limit = base["p95_ms"] * (1 + tolerance)
+        if cur["p95_ms"] > limit:
+            failures.append(f"{name}: p95 {cur['p95_ms']} ms > {limit:.1f} ms")
+        base_conc, cur_conc = base.get("concurrent"), cur.get("concurrent")
+        if base_conc and cur_conc and cur_conc["rps"] < base_conc["rps"] / (1 + tolerance):
+            failures.append(f"{name}: {cur_conc['rps']} req/s concurrente (baseline {base_conc['rps']})")
+    return failures
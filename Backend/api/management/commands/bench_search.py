@@ -0,0 +1,54 @@
+# api/management/commands/bench_search.py
+import random
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from api.bench import cleanup_products, measure, seed_products, summarize
+from api.models import Product
+from api.search import ProductSearchFilter, fulltext_available
+from api.views import ProductListCreateView
+
+
+class Command(BaseCommand):
+    help = "Compara la búsqueda de productos actual contra LIKE '%término%' sobre un catálogo sintético"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=100_000)
+        parser.add_argument("--repeat", type=int, default=30, help="repeticiones por término")
+        parser.add_argument("--keep", action="store_true", help="no borrar los productos sintéticos al final")
+
+    def handle(self, *args, products, repeat, keep, **kwargs):
+        self.stdout.write(f"Sembrando {products} productos...")
+        cleanup_products()
+        skus = seed_products(products)
+        try:
+            self.run(skus, repeat)
+        finally:
+            if not keep:
+                cleanup_products()
+
+    def run(self, skus, repeat):
+        rnd = random.Random(7)
+        terms = ["ros", "ramo rosa", "orquídea", "bonsái mini", rnd.choice(skus), rnd.choice(skus)[:4]]
+        base = Product.objects.select_related("category").order_by("name")
+        backend, factory = ProductSearchFilter(), RequestFactory()
+        view = ProductListCreateView()
+
+        self.stdout.write(f"FULLTEXT disponible: {fulltext_available()}")
+        self.stdout.write(f"{'término':<16}{'filas':>8}{'like p50':>12}{'like p95':>12}{'nuevo p50':>12}{'nuevo p95':>12}")
+        for term in terms:
+            def like():
+                return list(base.filter(Q(name__icontains=term) | Q(sku__icontains=term))[:50])
+
+            def indexed():
+                request = Request(factory.get("/api/products/", {"search": term}))
+                return list(backend.filter_queryset(request, base, view)[:50])
+
+            rows = len(indexed())
+            old, new = summarize(measure(like, repeat)), summarize(measure(indexed, repeat))
+            self.stdout.write(
+                f"{term:<16}{rows:>8}{old['p50_ms']:>12}{old['p95_ms']:>12}{new['p50_ms']:>12}{new['p95_ms']:>12}"
+            )
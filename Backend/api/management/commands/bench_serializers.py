@@ -0,0 +1,75 @@
+# api/management/commands/bench_serializers.py
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from api.bench import cleanup_orders, cleanup_products, measure, seed_orders, seed_products, summarize
+from api.models import Order, Product
+from api.serializers import (
+    ORDER_LIST_VALUES, PRODUCT_LIST_VALUES,
+    OrderSerializer, ProductSerializer, order_rows, product_rows,
+)
+
+
+class LegacyOrderSerializer(OrderSerializer):
+    """OrderSerializer con el get_items anterior: lee Product por el prefetch items__product."""
+
+    def get_items(self, obj):
+        out = []
+        for i in obj.items.all():
+            # si product fue borrado, usa snapshot
+            pname = i.product.name if i.product else (i.product_name or "")
+            psku  = i.product.sku  if i.product else (i.product_sku or "")
+            out.append({
+                "product": pname,
+                "sku": psku,
+                "quantity": i.quantity,
+                "price": i.price,
+                "line_total": i.quantity * i.price
+            })
+        return out
+
+
+class Command(BaseCommand):
+    help = "Costo por fila: ModelSerializer vs serialización rápida (.values()) en los listados"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=2000)
+        parser.add_argument("--orders", type=int, default=2000)
+        parser.add_argument("--repeat", type=int, default=10)
+
+    def handle(self, *args, products, orders, repeat, **kwargs):
+        cleanup_orders()
+        cleanup_products()
+        seed_products(products)
+        catalog = list(Product.objects.filter(pk__startswith="bench-")[:50])
+        seed_orders(orders, catalog)
+        try:
+            self.run(repeat)
+        finally:
+            cleanup_orders()
+            cleanup_products()
+
+    def run(self, repeat):
+        request = Request(RequestFactory().get("/api/products/"))
+        products = Product.objects.filter(pk__startswith="bench-").select_related("category").order_by("name")
+        orders = Order.objects.filter(code__startswith="BENCH-").order_by("-created_at", "-id")
+        n_products, n_orders = products.count(), orders.count()
+
+        cases = [
+            ("productos / ModelSerializer", n_products,
+             lambda: ProductSerializer(products, many=True, context={"request": request}).data),
+            ("productos / values()", n_products,
+             lambda: product_rows(products.values(*PRODUCT_LIST_VALUES), request)),
+            ("órdenes / ModelSerializer (antes)", n_orders,
+             lambda: LegacyOrderSerializer(orders.prefetch_related("items__product"), many=True).data),
+            ("órdenes / ModelSerializer", n_orders,
+             lambda: OrderSerializer(orders.prefetch_related("items"), many=True).data),
+            ("órdenes / values()", n_orders,
+             lambda: order_rows(orders.values(*ORDER_LIST_VALUES))),
+        ]
+        self.stdout.write(f"{'caso':<36}{'filas':>8}{'p50 ms':>10}{'p95 ms':>10}{'µs/fila':>10}")
+        for name, rows, fn in cases:
+            stats = summarize(measure(fn, repeat))
+            per_row = stats["p50_ms"] * 1000 / max(rows, 1)
+            self.stdout.write(f"{name:<36}{rows:>8}{stats['p50_ms']:>10}{stats['p95_ms']:>10}{per_row:>10.1f}")
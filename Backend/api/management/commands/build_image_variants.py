@@ -0,0 +1,28 @@
+# api/management/commands/build_image_variants.py
+from django.core.management.base import BaseCommand
+
+from api.images import build_variants, needs_variants
+from api.models import Product
+
+
+class Command(BaseCommand):
+    help = "Genera las variantes WebP/JPEG de las imágenes de productos que aún no las tienen"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="regenerar aunque ya existan")
+
+    def handle(self, *args, force=False, **kwargs):
+        qs = Product.objects.exclude(image="").exclude(image__isnull=True).only("id", "image", "image_variants")
+        done = failed = 0
+        for product in qs.iterator(chunk_size=200):
+            if not force and not needs_variants(product):
+                continue
+            if force:
+                Product.objects.filter(pk=product.pk).update(image_variants={})
+            try:
+                build_variants(product.pk)
+                done += 1
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"{product.pk}: {e}")
+        self.stdout.write(self.style.SUCCESS(f"Variantes generadas: {done} (errores: {failed})."))
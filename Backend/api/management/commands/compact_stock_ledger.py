@@ -0,0 +1,97 @@
+# api/management/commands/compact_stock_ledger.py
+from datetime import date, datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from api.models import Product, StockMovement
+from api.stock import ledger_balances
+
+
+class Command(BaseCommand):
+    help = (
+        "Resume los movimientos de stock anteriores a --before en un saldo por producto "
+        "y verifica que el ledger coincida con Product.stock"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--before", help="YYYY-MM-DD (por defecto: hace --keep-days días)")
+        parser.add_argument("--keep-days", type=int, default=90)
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--check-only", action="store_true", help="No compacta, solo verifica")
+        parser.add_argument(
+            "--repair", action="store_true",
+            help="Agrega un ajuste por cada diferencia para que el ledger cuadre con el stock",
+        )
+
+    def handle(self, *args, before=None, keep_days=90, batch_size=500, check_only=False, repair=False, **kwargs):
+        try:
+            day = date.fromisoformat(before) if before else timezone.localdate() - timedelta(days=keep_days)
+        except ValueError as e:
+            raise CommandError(f"Fecha inválida: {e}")
+        cutoff = timezone.make_aware(datetime.combine(day, time.min))
+
+        if not check_only:
+            compacted, removed = self.compact(cutoff, batch_size)
+            self.stdout.write(f"Compactados {compacted} productos ({removed} movimientos) antes de {day}.")
+
+        drift = self.reconcile(repair, batch_size)
+        if drift and not repair:
+            raise CommandError(f"{drift} productos no cuadran con el ledger (usar --repair).")
+        self.stdout.write(self.style.SUCCESS("Ledger de stock OK."))
+
+    def compact(self, cutoff, batch_size):
+        old = StockMovement.objects.filter(created_at__lt=cutoff)
+        # movimientos de productos borrados: ya no tienen saldo que mantener
+        removed = old.filter(product__isnull=True).delete()[0]
+
+        ids = list(
+            old.filter(product__isnull=False).values("product_id")
+            .annotate(n=Count("id")).filter(n__gt=1).values_list("product_id", flat=True)
+        )
+        for start in range(0, len(ids), batch_size):
+            chunk = old.filter(product_id__in=ids[start:start + batch_size])
+            with transaction.atomic():
+                totals = list(chunk.values("product_id").annotate(sku=Max("product_sku"), total=Sum("delta"), n=Count("id")))
+                removed += chunk.delete()[0]
+                StockMovement.objects.bulk_create([
+                    StockMovement(
+                        product_id=t["product_id"], product_sku=t["sku"], kind="compacted",
+                        delta=t["total"], created_at=cutoff, note=f"{t['n']} movimientos",
+                    )
+                    for t in totals
+                ])
+        return len(ids), removed
+
+    def reconcile(self, repair, batch_size):
+        # primera pasada sin bloqueos: ledger y stock se leen en momentos distintos, así que
+        # una venta entre las dos lecturas aparece como diferencia. Solo da candidatos
+        balances = ledger_balances()
+        suspects = [
+            pk for pk, stock in Product.objects.values_list("pk", "stock").iterator(chunk_size=2000)
+            if stock != balances.get(pk, 0)
+        ]
+        drift = 0
+        for start in range(0, len(suspects), batch_size):
+            # confirmación con las filas bloqueadas: el checkout y los ajustes escriben stock y
+            # ledger en la misma transacción que el UPDATE, así que aquí no se pueden mover
+            with transaction.atomic():
+                rows = list(
+                    Product.objects.select_for_update().filter(pk__in=suspects[start:start + batch_size])
+                    .order_by("pk").values_list("pk", "sku", "stock")
+                )
+                balances = ledger_balances([pk for pk, _, _ in rows])
+                fixes = []
+                for pk, sku, stock in rows:
+                    delta = stock - balances.get(pk, 0)
+                    if delta:
+                        self.stderr.write(f"{sku}: stock {stock}, ledger {stock - delta}")
+                        fixes.append(StockMovement(product_id=pk, product_sku=sku, kind="adjust", delta=delta, note="conciliación"))
+                if repair:
+                    StockMovement.objects.bulk_create(fixes)
+            drift += len(fixes)
+        if repair and drift:
+            self.stdout.write(f"{drift} ajustes de conciliación agregados.")
+        return drift
@@ -0,0 +1,37 @@
+# api/management/commands/export_orders.py
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.export import FORMATS, KINDS, export_rows, iter_history, parse_day
+from api.models import Order
+from api.routers import read_db
+
+
+class Command(BaseCommand):
+    help = "Exporta órdenes o líneas de orden a CSV / NDJSON (en streaming, memoria constante)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", dest="fmt", choices=FORMATS, default="csv")
+        parser.add_argument("--kind", choices=KINDS, default="orders")
+        parser.add_argument("--from", dest="date_from", help="YYYY-MM-DD (incluido)")
+        parser.add_argument("--to", dest="date_to", help="YYYY-MM-DD (incluido)")
+        parser.add_argument("--status", choices=[c for c, _ in Order.STATUS_CHOICES])
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("-o", "--output", help="archivo de salida (por defecto stdout)")
+        parser.add_argument("--database", help="alias de la BD (por defecto la réplica de lectura, si hay)")
+
+    def handle(self, *args, fmt, kind, date_from, date_to, status, chunk_size, output, database, **kwargs):
+        try:
+            d_from, d_to = parse_day(date_from), parse_day(date_to)
+        except ValueError as e:
+            raise CommandError(f"Fecha inválida: {e}")
+        orders = iter_history(d_from, d_to, status, using=database or read_db(), chunk_size=chunk_size)
+
+        out = open(output, "w", encoding="utf-8", newline="") if output else sys.stdout
+        try:
+            for chunk in export_rows(fmt, kind, orders):
+                out.write(chunk)
+        finally:
+            if output:
+                out.close()
@@ -0,0 +1,51 @@
+# api/management/commands/gc_media.py
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from api.images import variant_files
+from api.models import Product
+
+
+class Command(BaseCommand):
+    help = "Borra de media/products los archivos (imágenes y variantes) que ningún producto referencia"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", default="products")
+        parser.add_argument(
+            "--grace-minutes", type=int, default=60,
+            help="no toca archivos más nuevos que esto (subidas en curso)",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, dir="products", grace_minutes=60, dry_run=False, **kwargs):
+        referenced = set()
+        for image, variants in Product.objects.values_list("image", "image_variants").iterator(chunk_size=2000):
+            if image:
+                referenced.add(image)
+            referenced.update(variant_files(variants))
+
+        cutoff = time.time() - grace_minutes * 60
+        removed = size = 0
+        for name in self.walk(dir):
+            if name in referenced or default_storage.get_modified_time(name).timestamp() > cutoff:
+                continue
+            size += default_storage.size(name)
+            removed += 1
+            if dry_run:
+                self.stdout.write(name)
+            else:
+                default_storage.delete(name)
+
+        verb = "Se borrarían" if dry_run else "Borrados"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {removed} archivos ({size / 1024 / 1024:.1f} MB)."))
+
+    def walk(self, path):
+        if not default_storage.exists(path):
+            return
+        dirs, files = default_storage.listdir(path)
+        for name in files:
+            yield f"{path}/{name}"
+        for sub in dirs:
+            yield from self.walk(f"{path}/{sub}")
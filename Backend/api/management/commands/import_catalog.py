@@ -0,0 +1,33 @@
+# api/management/commands/import_catalog.py
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.catalog_import import import_rows, read_rows
+
+
+class Command(BaseCommand):
+    help = "Importa/actualiza productos desde CSV o JSON (upsert por SKU, en bloques)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", dest="fmt", choices=["csv", "json"], help="por defecto según la extensión")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, path, fmt, batch_size, **kwargs):
+        fmt = fmt or ("json" if path.lower().endswith(".json") else "csv")
+        if not os.path.exists(path):
+            raise CommandError(f"No existe el archivo {path}")
+        with open(path, "rb") as fh:
+            try:
+                rows = read_rows(fh, fmt)
+            except (ValueError, UnicodeDecodeError) as e:
+                raise CommandError(f"No se pudo leer {path}: {e}")
+
+        report = import_rows(rows, batch_size=batch_size)
+        for err in report["errors"]:
+            self.stderr.write(f"fila {err['row']} ({err['sku'] or '-'}): {json.dumps(err['errors'], ensure_ascii=False)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Creados: {report['created']}, actualizados: {report['updated']}, con error: {len(report['errors'])}."
+        ))
@@ -0,0 +1,64 @@
+# api/management/commands/rebuild_product_sales.py
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.models import ArchivedOrder, OrderItem, ProductSalesDaily
+from api.rollups import days_q, replace_rows
+
+
+class Command(BaseCommand):
+    help = "Recalcula ProductSalesDaily desde las líneas de órdenes pagadas (y las archivadas), por bloques"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="date_from", help="YYYY-MM-DD (incluido)")
+        parser.add_argument("--to", dest="date_to", help="YYYY-MM-DD (incluido)")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, date_from=None, date_to=None, chunk_size=2000, **kwargs):
+        try:
+            d_from = date.fromisoformat(date_from) if date_from else None
+            d_to = date.fromisoformat(date_to) if date_to else None
+        except ValueError as e:
+            raise CommandError(f"Fecha inválida: {e}")
+
+        def aggregate(days):
+            # (día, sku) -> {nombre, unidades, ingreso}; se agrega en Python, como rebuild_daily_sales
+            acc = {}
+
+            def add(created_at, sku, name, qty, price):
+                row = acc.setdefault(
+                    (timezone.localdate(created_at), sku), {"product_name": "", "units": 0, "revenue": 0},
+                )
+                row["product_name"] = row["product_name"] or name
+                row["units"] += qty
+                row["revenue"] += qty * price
+
+            # primero las líneas de Order y después las archivadas, saltando las órdenes ya
+            # contadas: una orden que archive_orders mueve entre las dos lecturas cuenta una vez
+            seen = set()
+            lines = OrderItem.objects.filter(days_q("order__created_at", d_from, d_to, days), order__status="paid")
+            for order_id, *row in lines.values_list(
+                "order_id", "order__created_at", "product_sku", "product_name", "quantity", "price",
+            ).iterator(chunk_size=chunk_size):
+                seen.add(order_id)
+                add(*row)
+
+            archived = ArchivedOrder.objects.filter(days_q("created_at", d_from, d_to, days), status="paid")
+            for order in archived.only("created_at", "payload").iterator(chunk_size=chunk_size):
+                if order.pk in seen:
+                    continue
+                for it in order.unpack()["items"]:
+                    add(order.created_at, it["product_sku"], it["product_name"], it["quantity"], it["price"])
+            return acc
+
+        old = ProductSalesDaily.objects.all()
+        if d_from:
+            old = old.filter(day__gte=d_from)
+        if d_to:
+            old = old.filter(day__lte=d_to)
+        # bloquea las filas del rango antes de leer las líneas (ver api/rollups.replace_rows)
+        n = replace_rows(old, ["day", "product_sku"], aggregate)
+
+        self.stdout.write(self.style.SUCCESS(f"ProductSalesDaily reconstruido: {n} filas."))
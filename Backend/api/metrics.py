@@ -0,0 +1,197 @@
+# api/metrics.py
+"""
+Métricas por vista: latencia, consultas SQL (cantidad y tiempo) y tamaño de respuesta.
+
+MetricsMiddleware las acumula en memoria del proceso y metrics_view las expone en
+formato texto de Prometheus (/metrics). Con varios workers cada proceso tiene sus
+propios contadores. En respuestas streaming la latencia llega hasta que la vista
+devuelve la respuesta, no hasta el final del stream.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+log = logging.getLogger("api.metrics")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+def fingerprint(sql):
+    """SQL sin literales: agrupa las consultas repetidas (N+1)."""
+    sql = re.sub(r"'(?:[^']|'')*'", "?", sql)
+    sql = re.sub(r"\b\d+(\.\d+)?\b", "?", sql)
+    sql = re.sub(r"\((?:\s*\?\s*,)+\s*\?\s*\)", "(?...)", sql)
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests = Counter()                              # (view, method, status)
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.queries = defaultdict(lambda: Histogram(QUERY_BUCKETS))
+        self.query_seconds = Counter()                         # (view, method)
+        self.response_bytes = Counter()
+
+    def record(self, view, method, status, seconds, n_queries, query_seconds, size):
+        key = (view, method)
+        with self.lock:
+            self.requests[(view, method, str(status))] += 1
+            self.latency[key].observe(seconds)
+            self.queries[key].observe(n_queries)
+            self.query_seconds[key] += query_seconds
+            self.response_bytes[key] += size
+
+    def render(self):
+        out = []
+        with self.lock:
+            out.append("# HELP api_requests_total Requests por vista, método y status.")
+            out.append("# TYPE api_requests_total counter")
+            for (view, method, status), n in sorted(self.requests.items()):
+                out.append(f'api_requests_total{{{_labels(view, method)},status="{status}"}} {n}')
+            _histogram(out, "api_request_duration_seconds", "Latencia del request.", self.latency)
+            _histogram(out, "api_db_queries", "Consultas SQL por request.", self.queries)
+            _counter(out, "api_db_query_seconds_total", "Tiempo en consultas SQL.", self.query_seconds)
+            _counter(out, "api_response_bytes_total", "Bytes de respuesta (no streaming).", self.response_bytes)
+        return "\n".join(out) + "\n"
+
+
+def _labels(view, method):
+    view = view.replace("\\", "\\\\").replace('"', '\\"')
+    return f'view="{view}",method="{method}"'
+
+
+def _counter(out, name, help_text, values):
+    out.append(f"# HELP {name} {help_text}")
+    out.append(f"# TYPE {name} counter")
+    for (view, method), v in sorted(values.items()):
+        out.append(f"{name}{{{_labels(view, method)}}} {round(v, 6)}")
+
+
+def _histogram(out, name, help_text, histograms):
+    out.append(f"# HELP {name} {help_text}")
+    out.append(f"# TYPE {name} histogram")
+    for (view, method), h in sorted(histograms.items()):
+        labels = _labels(view, method)
+        for bound, n in zip(h.buckets, h.counts):
+            out.append(f'{name}_bucket{{{labels},le="{bound}"}} {n}')
+        out.append(f'{name}_bucket{{{labels},le="+Inf"}} {h.count}')
+        out.append(f"{name}_sum{{{labels}}} {round(h.sum, 6)}")
+        out.append(f"{name}_count{{{labels}}} {h.count}")
+
+
+registry = Registry()
+
+
+class QueryCollector:
+    """execute_wrapper: cuenta y cronometra cada consulta del request."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        t0 = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - t0
+            self.count += 1
+            self.statements.append(sql)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.query_budget = getattr(settings, "METRICS_QUERY_BUDGET", 20)
+        self.query_budgets = getattr(settings, "METRICS_QUERY_BUDGETS", {})
+        self.latency_budget = getattr(settings, "METRICS_LATENCY_BUDGET_MS", 500) / 1000
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        collector = QueryCollector()
+        t0 = time.perf_counter()
+        with self.collecting(collector):
+            response = self.get_response(request)
+        return self.record(request, response, collector, time.perf_counter() - t0)
+
+    async def __acall__(self, request):
+        # ASGI: el ORM corre en el hilo sync del request, el wrapper se instala ahí
+        collector = QueryCollector()
+        stack = await sync_to_async(self.collecting)(collector)
+        t0 = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.record(request, response, collector, time.perf_counter() - t0)
+
+    @staticmethod
+    def collecting(collector):
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(collector))
+        return stack
+
+    def record(self, request, response, collector, elapsed):
+        match = getattr(request, "resolver_match", None)
+        view = match.route if match else "<unmatched>"
+        if view == "metrics":
+            return response
+        size = 0 if response.streaming else len(response.content)
+        registry.record(view, request.method, response.status_code, elapsed,
+                        collector.count, collector.seconds, size)
+
+        if collector.count > self.query_budgets.get(view, self.query_budget) or elapsed > self.latency_budget:
+            top = Counter(fingerprint(sql) for sql in collector.statements).most_common(5)
+            log.warning(
+                "%s %s: %.0f ms, %d consultas (%.0f ms en SQL). Más repetidas: %s",
+                request.method, request.path, elapsed * 1000, collector.count, collector.seconds * 1000,
+                "; ".join(f"{n}x {fp[:200]}" for fp, n in top),
+            )
+        return response
+
+
+def metrics_view(request):
+    # sin METRICS_TOKEN solo en DEBUG: las rutas y los tiempos no se publican por omisión
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if not token and not settings.DEBUG:
+        return HttpResponseForbidden()
+    if token and not constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
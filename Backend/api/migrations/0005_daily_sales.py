@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_order_status_orderitem_product_name_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveBigIntegerField(default=0, help_text='Ingreso bruto en CLP')),
+            ],
+            options={
+                'ordering': ['-day'],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+
+INDEX = "product_name_sku_ft"
+
+
+def add_fulltext(apps, schema_editor):
+    # solo MariaDB/MySQL; en SQLite la búsqueda usa LIKE (ver api/search.py)
+    if schema_editor.connection.vendor != "mysql":
+        return
+    schema_editor.execute(f"CREATE FULLTEXT INDEX {INDEX} ON api_product (name, sku)")
+
+
+def drop_fulltext(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    schema_editor.execute(f"DROP INDEX {INDEX} ON api_product")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_order_sequence'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_fulltext, drop_fulltext),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+from django.db.models import OuterRef, Q, Subquery
+
+
+def backfill(apps, schema_editor):
+    # ítems anteriores a 0004 no tienen snapshot; los listados ahora solo leen el snapshot
+    OrderItem = apps.get_model("api", "OrderItem")
+    Product = apps.get_model("api", "Product")
+    product = Product.objects.filter(pk=OuterRef("product_id"))
+    OrderItem.objects.filter(Q(product_name="") | Q(product_sku=""), product__isnull=False).update(
+        product_name=Subquery(product.values("name")[:1]),
+        product_sku=Subquery(product.values("sku")[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_product_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
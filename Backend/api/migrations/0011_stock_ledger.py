@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def opening_balances(apps, schema_editor):
+    # el ledger parte con el stock actual de cada producto
+    Product = apps.get_model("api", "Product")
+    StockMovement = apps.get_model("api", "StockMovement")
+    rows = Product.objects.filter(stock__gt=0).values_list("pk", "sku", "stock")
+    StockMovement.objects.bulk_create(
+        [StockMovement(product_id=pk, product_sku=sku, kind="opening", delta=stock) for pk, sku, stock in rows],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_backfill_item_snapshots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_sku', models.CharField(blank=True, max_length=40)),
+                ('kind', models.CharField(choices=[('opening', 'Saldo inicial'), ('sale', 'Venta'), ('cancel', 'Anulación'), ('restock', 'Reposición'), ('adjust', 'Ajuste'), ('compacted', 'Saldo compactado')], max_length=10)),
+                ('delta', models.IntegerField()),
+                ('note', models.CharField(blank=True, max_length=200)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='api.order')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movements', to='api.product')),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['product', 'created_at'], name='stockmove_product_created_idx')],
+            },
+        ),
+        migrations.RunPython(opening_balances, migrations.RunPython.noop),
+    ]
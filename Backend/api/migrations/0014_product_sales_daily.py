@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_product_category_name_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSalesDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('product_sku', models.CharField(max_length=40)),
+                ('product_name', models.CharField(max_length=120)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('revenue', models.PositiveBigIntegerField(default=0, help_text='Ingreso bruto en CLP')),
+            ],
+            options={
+                'ordering': ['-day', 'product_sku'],
+                'indexes': [models.Index(fields=['product_sku', 'day'], name='productsales_sku_day_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='productsalesdaily',
+            constraint=models.UniqueConstraint(fields=('day', 'product_sku'), name='productsales_day_sku_uniq'),
+        ),
+    ]
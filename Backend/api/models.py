@@ -1,6 +1,7 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils import timezone
-import os, uuid
+import json, os, zlib
 
 class Category(models.Model):
     name = models.CharField(max_length=80, unique=True)
@@ -9,9 +10,8 @@ class Category(models.Model):
         return self.name
 
 def product_image_path(instance, filename):
-    ext = filename.split(".")[-1]
-    new_name = f"{uuid.uuid4().hex}.{ext}"
-    return os.path.join("products", new_name)
+    # solo el directorio: api.storage.ContentAddressedStorage lo guarda como products/<sha256>.<ext>
+    return os.path.join("products", filename)
 
 class Product(models.Model):
     id = models.CharField(primary_key=True, max_length=20)  # e.g. "P001"
@@ -21,6 +21,26 @@ class Product(models.Model):
     price = models.PositiveIntegerField(help_text="Precio en CLP, sin decimales")
     stock = models.PositiveIntegerField(default=0)
     image = models.ImageField(upload_to=product_image_path, blank=True, null=True)
+    # miniaturas generadas en segundo plano (ver api/images.py)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # listado por categoría ordenado por nombre (?category_id=, /api/catalog/)
+            models.Index(fields=["category", "name"], name="product_category_name_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # saldo leído: al guardar, la diferencia queda en el ledger (ver api/stock.py)
+        instance._loaded_stock = instance.__dict__.get("stock")
+        # precio leído: los cambios se publican en /api/events/ (ver api/events.py)
+        instance._loaded_price = instance.__dict__.get("price")
+        # imagen leída: si se reemplaza, la anterior se recolecta (ver api/storage.py)
+        instance._loaded_image = instance.__dict__.get("image")
+        instance._loaded_variants = instance.__dict__.get("image_variants")
+        return instance
 
     def __str__(self):
         return f"{self.name} ({self.sku})"
@@ -52,15 +72,21 @@ class Order(models.Model):
     # 👇 nuevo: estado final de la orden
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='paid')
 
+    class Meta:
+        indexes = [
+            # paginación por cursor (created_at, id) en OrderListView
+            models.Index(fields=["created_at", "id"], name="order_created_id_idx"),
+            # filtros del admin, con el mismo orden del changelist (-created_at)
+            models.Index(fields=["status", "created_at"], name="order_status_created_idx"),
+            models.Index(fields=["payment_method", "created_at"], name="order_payment_created_idx"),
+        ]
+
     def save(self, *args, **kwargs):
-        creating = self._state.adding
+        # el código se asigna antes del INSERT: una sola escritura por orden
+        if self._state.adding and not self.code:
+            from .sequences import next_order_code
+            self.code = next_order_code(timezone.localdate(self.created_at))
         super().save(*args, **kwargs)
-        if creating and not self.code:
-            today = timezone.localdate()
-            prefix = f"PDLF-{today.strftime('%Y%m%d')}"
-            seq = str(self.id).zfill(4)
-            self.code = f"{prefix}-{seq}"
-            super().save(update_fields=['code'])
 
     def __str__(self):
         return self.code or f"Order {self.pk}"
@@ -68,8 +94,9 @@ class Order(models.Model):
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
 
-    # Permite borrar productos sin romper historial
-    product = models.ForeignKey('Product', on_delete=models.SET_NULL, null=True, blank=True)
+    # Permite borrar productos sin romper historial. Sin FK en la base: el INSERT no toma
+    # bloqueo S sobre el producto, que el checkout bloquea recién al final (ver api/stock.py)
+    product = models.ForeignKey('Product', on_delete=models.SET_NULL, null=True, blank=True, db_constraint=False)
 
     # snapshots para conservar info aunque borres el producto
     product_name = models.CharField(max_length=120, blank=True)
@@ -80,3 +107,107 @@ class OrderItem(models.Model):
 
     def line_total(self):
         return self.quantity * self.price
+
+class OrderSequence(models.Model):
+    """Correlativo diario para Order.code (PDLF-YYYYMMDD-NNNN)."""
+    day = models.DateField(unique=True)
+    last = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.day}: {self.last}"
+
+# ---------- Rollups ----------
+class DailySales(models.Model):
+    """Ventas pagadas agregadas por día local (se actualiza en cada checkout)."""
+    day = models.DateField(unique=True)
+    orders = models.PositiveIntegerField(default=0)
+    total = models.PositiveBigIntegerField(default=0, help_text="Ingreso bruto en CLP")
+
+    class Meta:
+        ordering = ["-day"]
+
+    def __str__(self):
+        return f"{self.day}: {self.total} ({self.orders})"
+
+
+class ProductSalesDaily(models.Model):
+    """Unidades e ingreso pagados por producto (SKU snapshot) y día local; se actualiza en cada checkout."""
+    day = models.DateField()
+    product_sku = models.CharField(max_length=40)
+    product_name = models.CharField(max_length=120)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.PositiveBigIntegerField(default=0, help_text="Ingreso bruto en CLP")
+
+    class Meta:
+        ordering = ["-day", "product_sku"]
+        constraints = [
+            # también sirve para el ranking por rango de días
+            models.UniqueConstraint(fields=["day", "product_sku"], name="productsales_day_sku_uniq"),
+        ]
+        indexes = [
+            # serie de un SKU (?sku=)
+            models.Index(fields=["product_sku", "day"], name="productsales_sku_day_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.product_sku}: {self.units}"
+
+
+# ---------- Ledger de stock ----------
+class StockMovement(models.Model):
+    """
+    Registro append-only de cada cambio de stock. Product.stock es el saldo
+    acumulado (caché); la suma de delta por producto debe coincidir con él.
+    """
+    KIND_CHOICES = [
+        ('opening', 'Saldo inicial'),
+        ('sale', 'Venta'),
+        ('cancel', 'Anulación'),
+        ('restock', 'Reposición'),
+        ('adjust', 'Ajuste'),
+        ('compacted', 'Saldo compactado'),
+    ]
+
+    # sin FK en la base, igual que OrderItem.product (SET_NULL lo hace Django al borrar)
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True, related_name='movements', db_constraint=False)
+    product_sku = models.CharField(max_length=40, blank=True)   # snapshot
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    delta = models.IntegerField()
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_movements')
+    note = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(fields=["product", "created_at"], name="stockmove_product_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_sku} {self.delta:+d} ({self.kind})"
+
+
+# ---------- Archivo histórico ----------
+class ArchivedOrder(models.Model):
+    """
+    Orden antigua movida fuera de Order/OrderItem (ver api/archive.py). Quedan como
+    columnas solo los campos para filtrar; cliente y líneas van en payload (JSON zlib).
+    """
+    id = models.BigIntegerField(primary_key=True)   # el mismo id que tenía en Order
+    code = models.CharField(max_length=40, unique=True)
+    created_at = models.DateTimeField(db_index=True)
+    status = models.CharField(max_length=10, choices=Order.STATUS_CHOICES)
+    total = models.PositiveIntegerField()
+    payload = models.BinaryField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    @staticmethod
+    def pack(data):
+        return zlib.compress(json.dumps(data, cls=DjangoJSONEncoder, separators=(",", ":")).encode(), 9)
+
+    def unpack(self):
+        """{"order": {...}, "items": [{...}]}"""
+        return json.loads(zlib.decompress(self.payload))
+
+    def __str__(self):
+        return self.code
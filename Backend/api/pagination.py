@@ -0,0 +1,158 @@
+# api/pagination.py
+import base64
+from datetime import datetime
+
+from django.conf import settings
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por cursor sobre (created_at, id) descendente.
+    Cada página es un range scan sobre el índice compuesto: la página N cuesta lo mismo que la 1.
+
+    Sin ?cursor ni ?limit responde la lista completa (modo compatibilidad) mientras
+    settings.ORDERS_LEGACY_LIST sea True.
+    """
+    page_size = 50
+    max_page_size = 200
+    cursor_query_param = "cursor"
+    page_size_query_param = "limit"
+    ordering = ("-created_at", "-id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            if getattr(settings, "ORDERS_LEGACY_LIST", True):
+                return None
+
+        self.request = request
+        limit = self.get_page_size(request)
+        qs = queryset.order_by(*self.ordering)
+
+        cursor = params.get(self.cursor_query_param)
+        if cursor:
+            created_at, pk = self.decode_cursor(cursor)
+            qs = qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+        rows = list(qs[:limit + 1])
+        self.has_next = len(rows) > limit
+        rows = rows[:limit]
+        self.next_cursor = self.encode_cursor(rows[-1]) if self.has_next else None
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
+
+    # ----- cursor opaco: base64("<iso created_at>|<id>") -----
+    @staticmethod
+    def encode_cursor(obj):
+        # instancia o fila de .values()
+        created_at, pk = (obj["created_at"], obj["id"]) if isinstance(obj, dict) else (obj.created_at, obj.pk)
+        raw = f"{created_at.isoformat()}|{pk}"
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+            ts, pk = raw.rsplit("|", 1)
+            return datetime.fromisoformat(ts), int(pk)
+        except (ValueError, UnicodeDecodeError):
+            raise NotFound("Cursor inválido.")
+
+
+class CatalogPagination(LimitOffsetPagination):
+    """
+    ?limit=&offset= sobre el catálogo (ordenado por nombre) -> {"count", "next", "previous", "results"}.
+    Sin ?limit responde la lista completa, como antes.
+    """
+    max_limit = 200
+
+
+# ---------- admin ----------
+def estimated_rows(model, using="default"):
+    """Filas según las estadísticas del motor (sin recorrer la tabla); None si no hay estimación."""
+    conn = connections[using]
+    table = model._meta.db_table
+    if conn.vendor == "mysql":
+        sql = "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s"
+    elif conn.vendor == "postgresql":
+        sql = "SELECT reltuples::bigint FROM pg_class WHERE relname = %s"
+    else:
+        return None
+    with conn.cursor() as cursor:
+        cursor.execute(sql, [table])
+        row = cursor.fetchone()
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginador del admin para tablas grandes. El COUNT(*) exacto recorre toda la tabla:
+    sin filtros se usa la estimación del motor si pasa de ADMIN_EXACT_COUNT_LIMIT, y con
+    filtros se cuenta como mucho hasta ese límite. Si el conteo no es exacto, las páginas
+    después de num_pages se abren igual mientras tengan filas.
+    """
+    exact = True
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        limit = getattr(settings, "ADMIN_EXACT_COUNT_LIMIT", 100_000)
+        if not qs.query.where:
+            estimate = estimated_rows(qs.model, qs.db)
+            if estimate is not None and estimate > limit:
+                self.exact = False
+                return estimate
+        count = qs.order_by()[:limit].count()
+        self.exact = count < limit
+        return count
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            number = int(number)
+            if self.exact or number < 1:
+                raise
+            return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if self.exact or number <= self.num_pages:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        rows = self.object_list[bottom:bottom + self.per_page]
+        if not rows:
+            raise EmptyPage("That page contains no results")
+        return self._get_page(rows, number, self)
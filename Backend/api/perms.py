@@ -1,11 +1,46 @@
 # api/perms.py
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
 from rest_framework.permissions import BasePermission
 
+
+# ---------- grupos del usuario (cacheados) ----------
+# con varios workers GROUPS_CACHE_ALIAS tiene que ser compartida, si no la invalidación
+# solo llega al proceso que la hizo (ver api/shared_state.py)
+def _cache():
+    return caches[getattr(settings, "GROUPS_CACHE_ALIAS", "default")]
+
+def _groups_key(user_id):
+    return f"user-groups:{user_id}"
+
+def user_groups(user):
+    """Nombres de los grupos del usuario: memo en el objeto del request + caché con TTL.
+    Se invalida desde api/signals.py cuando cambia la membresía."""
+    if not user or not user.is_authenticated:
+        return ()
+    names = getattr(user, "_group_names", None)
+    if names is None:
+        cache = _cache()
+        names = cache.get(_groups_key(user.pk))
+        if names is None:
+            names = tuple(user.groups.order_by("id").values_list("name", flat=True))
+            cache.set(_groups_key(user.pk), names, getattr(settings, "GROUPS_CACHE_TTL", 300))
+        user._group_names = names
+    return names
+
+def invalidate_user_groups(*user_ids):
+    keys = [_groups_key(uid) for uid in user_ids]
+    _cache().delete_many(keys)
+    # otro worker pudo volver a cachear la membresía vieja antes del commit
+    transaction.on_commit(lambda: _cache().delete_many(keys))
+
+
 class InGroup(BasePermission):
     def __init__(self, *groups): self.groups = set(groups)
     def has_permission(self, request, view):
         if not request.user or not request.user.is_authenticated: return False
-        return request.user.groups.filter(name__in=self.groups).exists() or request.user.is_superuser
+        return request.user.is_superuser or not self.groups.isdisjoint(user_groups(request.user))
 
 # helper para declarar bonito
 def group_perm(*names):
@@ -0,0 +1,184 @@
+# api/rollups.py
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, F, Max, Q, Sum, When
+from django.utils import timezone
+
+from .models import DailySales, ProductSalesDaily
+
+
+def _bump(model, lookup, **deltas):
+    """UPDATE ... SET col = col + delta; crea la fila si aún no existe."""
+    changes = {k: F(k) + v for k, v in deltas.items()}
+    if model.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # otro checkout creó la fila entre medio
+        model.objects.filter(**lookup).update(**changes)
+
+
+def record_sale(order, items):
+    """
+    Suma la orden (y sus líneas) a los rollups diarios. Llamar dentro de la transacción del
+    checkout, al final: las filas del día son calientes y quedan bloqueadas hasta el COMMIT.
+    """
+    day = timezone.localdate(order.created_at)
+    lines = {}
+    for it in items:
+        row = lines.setdefault(it.product_sku, {"name": it.product_name, "units": 0, "revenue": 0})
+        row["units"] += it.quantity
+        row["revenue"] += it.quantity * it.price
+    # mismo orden que record_cancel: ProductSalesDaily y después DailySales
+    _bump_products(day, lines)
+    _bump(DailySales, {"day": day}, orders=1, total=order.total)
+
+
+def record_cancel(order):
+    """Resta una orden anulada de los rollups (si el día aún no existe, lo arman los rebuild_*)."""
+    day = timezone.localdate(order.created_at)
+    lines = order.items.values("product_sku").annotate(units=Sum("quantity"), revenue=Sum(F("quantity") * F("price")))
+    _bump_products(day, {r["product_sku"]: {"units": -r["units"], "revenue": -r["revenue"]} for r in lines})
+    DailySales.objects.filter(day=day, orders__gt=0, total__gte=order.total).update(
+        orders=F("orders") - 1, total=F("total") - order.total,
+    )
+
+
+def _bump_products(day, lines):
+    """
+    lines: {sku: {"units", "revenue"[, "name"]}}. Un UPDATE con CASE sin importar cuántas
+    líneas (los descuentos nunca bajan de 0). Solo la primera venta del día de un SKU agrega
+    un SELECT, el INSERT IGNORE de las filas que falten y un UPDATE de esas.
+    """
+    if not lines:
+        return
+    if _update_products(day, lines) == len(lines):
+        return
+    existing = set(
+        ProductSalesDaily.objects.filter(day=day, product_sku__in=list(lines)).values_list("product_sku", flat=True)
+    )
+    new = {sku: v for sku, v in lines.items() if v["units"] > 0 and sku not in existing}
+    if not new:
+        return
+    # ignore_conflicts: otro checkout pudo crear la fila entre medio; el UPDATE suma igual
+    ProductSalesDaily.objects.bulk_create(
+        [ProductSalesDaily(day=day, product_sku=sku, product_name=v.get("name", "")) for sku, v in new.items()],
+        ignore_conflicts=True,
+    )
+    _update_products(day, new)
+
+
+def _update_products(day, lines):
+    guard = Q()
+    for sku, v in lines.items():
+        guard |= Q(product_sku=sku, units__gte=-v["units"], revenue__gte=-v["revenue"]) if v["units"] < 0 else Q(product_sku=sku)
+
+    def case(field):
+        return Case(
+            *[When(product_sku=sku, then=F(field) + v[field]) for sku, v in lines.items()],
+            output_field=models.PositiveBigIntegerField(),
+        )
+
+    return ProductSalesDaily.objects.filter(guard, day=day).update(units=case("units"), revenue=case("revenue"))
+
+
+# ---------- rebuild ----------
+def replace_rows(queryset, key_fields, aggregate):
+    """
+    Reescribe las filas de un rollup (queryset: las del rango) con aggregate(days), que
+    devuelve {(day, ...): {campo: valor}} leyendo las órdenes (days=None: todo el rango).
+
+    Sin perder ventas ni anulaciones concurrentes: primero bloquea las filas (FOR UPDATE)
+    y recién después lee las órdenes. Lo que ya hizo commit queda en la lectura; el
+    checkout que aún no lo hace espera el bloqueo (su UPDATE de rollup va al final) y suma
+    encima de la fila reescrita. Por eso las filas se actualizan en su lugar en vez de
+    borrarse y reinsertarse. Las claves sin fila se crean, se bloquean y sus días se
+    vuelven a leer. Las filas siguen bloqueadas durante toda la lectura: con historiales
+    grandes, mejor acotar el rango. Devuelve la cantidad de filas.
+    """
+    model = queryset.model
+
+    def key(row):
+        return tuple(getattr(row, f) for f in key_fields)
+
+    with transaction.atomic():
+        rows = {key(r): r for r in queryset.select_for_update().order_by(*key_fields)}
+        acc = aggregate(None)
+        missing = [k for k in acc if k not in rows]
+        while missing:
+            model.objects.bulk_create(
+                [model(**dict(zip(key_fields, k)), **acc[k]) for k in missing], ignore_conflicts=True, batch_size=1000,
+            )
+            days = {k[0] for k in missing}
+            for r in model.objects.select_for_update().filter(day__in=days).order_by(*key_fields):
+                rows[key(r)] = r
+            acc = {k: v for k, v in acc.items() if k[0] not in days}
+            acc.update(aggregate(days))
+            missing = [k for k in acc if k not in rows]
+
+        stale = [r.pk for k, r in rows.items() if k not in acc]
+        for start in range(0, len(stale), 1000):
+            model.objects.filter(pk__in=stale[start:start + 1000]).delete()
+        changed = []
+        for k, values in acc.items():
+            row = rows[k]
+            for field, value in values.items():
+                setattr(row, field, value)
+            changed.append(row)
+        if changed:
+            model.objects.bulk_update(changed, list(next(iter(acc.values()))), batch_size=500)
+    return len(acc)
+
+
+# ---------- lecturas ----------
+def top_products(date_from, date_to, limit=20, by="revenue", using=None):
+    """Ranking de productos entre dos días (incluidos), desde ProductSalesDaily."""
+    return list(
+        ProductSalesDaily.objects.using(using)
+        .filter(day__range=(date_from, date_to))
+        .values("product_sku")
+        .annotate(name=Max("product_name"), units=Sum("units"), revenue=Sum("revenue"))
+        .order_by(f"-{by}", "product_sku")[:limit]
+    )
+
+
+def product_series(sku, date_from, date_to, group="day", using=None):
+    """Unidades e ingreso de un SKU por día, semana (lunes) o mes."""
+    buckets = {}
+    rows = ProductSalesDaily.objects.using(using).filter(product_sku=sku, day__range=(date_from, date_to))
+    for day, units, revenue in rows.order_by("day").values_list("day", "units", "revenue"):
+        start = period_start(day, group)
+        b = buckets.setdefault(start, {"period": start.isoformat(), "units": 0, "revenue": 0})
+        b["units"] += units
+        b["revenue"] += revenue
+    return list(buckets.values())
+
+
+def day_start(d, offset=0):
+    """Inicio (aware) del día local d + offset."""
+    return timezone.make_aware(datetime.combine(d + timedelta(days=offset), time.min))
+
+
+def days_q(field, d_from=None, d_to=None, days=None):
+    """Q sobre un DateTimeField: días locales [d_from, d_to] (incluidos), o solo los de `days`."""
+    if days is not None:
+        return Q(*[Q(**{f"{field}__gte": day_start(d), f"{field}__lt": day_start(d, offset=1)}) for d in days], _connector=Q.OR)
+    q = Q()
+    if d_from:
+        q &= Q(**{f"{field}__gte": day_start(d_from)})
+    if d_to:
+        q &= Q(**{f"{field}__lt": day_start(d_to, offset=1)})
+    return q
+
+
+def period_start(day, group):
+    if group == "week":
+        return day - timedelta(days=day.weekday())
+    if group == "month":
+        return day.replace(day=1)
+    if group == "year":
+        return day.replace(month=1, day=1)
+    return day
@@ -0,0 +1,74 @@
+# api/routers.py
+"""
+Réplica de lectura (alias "replica").
+
+Las escrituras siempre van a "default". Las lecturas también, salvo en las vistas
+que lo piden explícitamente con read_db() (listados, estadísticas, exportación).
+Read-your-writes: tras una escritura exitosa el usuario queda fijado a la primaria
+REPLICA_PIN_SECONDS, y tras un cambio del catálogo (catalog_cache.bump_version) los
+listados de catálogo también leen de la primaria durante ese lapso, para no guardar
+en la caché una respuesta armada con datos atrasados.
+
+El pin vive en REPLICA_PIN_CACHE_ALIAS y la marca de catálogo recién cambiado en la
+caché del catálogo: con varios workers las dos tienen que ser compartidas, si no el
+request siguiente puede caer en otro proceso que no las ve (ver api/shared_state.py).
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.permissions import SAFE_METHODS
+
+REPLICA = "replica"
+DB_ALIASES = {"default", REPLICA}
+
+
+class PrimaryReplicaRouter:
+    def db_for_write(self, model, **hints):
+        # también para instancias leídas desde la réplica
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if obj1._state.db in DB_ALIASES and obj2._state.db in DB_ALIASES:
+            return True
+        return None
+
+
+# ---------- stickiness ----------
+def _cache():
+    return caches[getattr(settings, "REPLICA_PIN_CACHE_ALIAS", "default")]
+
+
+def _pin_key(user_id):
+    return f"db-pin:{user_id}"
+
+
+def pin_seconds():
+    return getattr(settings, "REPLICA_PIN_SECONDS", 5)
+
+
+def pin_primary(user):
+    _cache().set(_pin_key(user.pk), 1, pin_seconds())
+
+
+def is_pinned(user):
+    return bool(user and user.is_authenticated and _cache().get(_pin_key(user.pk)))
+
+
+def read_db(request=None, fresh=False):
+    """Alias para lecturas de una vista. fresh=True fuerza la primaria (dato recién escrito)."""
+    if not getattr(settings, "REPLICA_READS", False) or REPLICA not in settings.DATABASES:
+        return "default"
+    if fresh or (request is not None and is_pinned(getattr(request, "user", None))):
+        return "default"
+    return REPLICA
+
+
+class ReplicaPinMiddleware(MiddlewareMixin):
+    """Fija al usuario a la primaria después de un POST/PUT/PATCH/DELETE exitoso."""
+
+    def process_response(self, request, response):
+        # DRF deja en request.user el usuario autenticado por JWT
+        user = getattr(request, "user", None)
+        if request.method not in SAFE_METHODS and response.status_code < 400 and user and user.is_authenticated:
+            pin_primary(user)
+        return response
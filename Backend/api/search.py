@@ -0,0 +1,92 @@
+# api/search.py
+import re
+
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+from rest_framework.exceptions import ValidationError
+
+from .models import Product
+
+FULLTEXT_INDEX = "product_name_sku_ft"
+FULLTEXT_MIN_TERM = 3  # innodb_ft_min_token_size
+
+
+def fulltext_available(conn=connection):
+    return conn.vendor == "mysql"
+
+
+def boolean_query(term):
+    """
+    "ramo ros" -> "+ramo* +ros*" (todas las palabras, por prefijo). None si alguna palabra
+    es más corta que FULLTEXT_MIN_TERM: el índice no la tiene y la búsqueda va por LIKE.
+    """
+    # los operadores de BOOLEAN MODE (+ - * " ~ < > @ ( )) no son \w: quedan como separadores
+    words = [w for w in re.split(r"\W+", term) if w]
+    if not words or any(len(w) < FULLTEXT_MIN_TERM for w in words):
+        return None
+    return " ".join(f"+{w}*" for w in words)
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """
+    Búsqueda de productos por ?search=:
+
+    1. SKU exacto -> lookup sobre el índice único (lector de código de barras).
+    2. MariaDB -> MATCH ... AGAINST sobre el índice FULLTEXT (name, sku), ordenado por relevancia.
+    3. Otros motores o términos cortos -> LIKE por palabra, con ranking (SKU por prefijo > nombre por prefijo > resto).
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        term = " ".join(self.get_search_terms(request))
+        if not term:
+            return queryset
+
+        exact = queryset.filter(sku__iexact=term)
+        if exact.exists():
+            return exact
+
+        query = boolean_query(term)
+        if fulltext_available() and query:
+            table = connection.ops.quote_name(Product._meta.db_table)
+            match = f"MATCH({table}.`name`, {table}.`sku`) AGAINST (%s IN BOOLEAN MODE)"
+            return (
+                queryset.annotate(rank=RawSQL(match, (query,)))
+                .filter(rank__gt=0)
+                .order_by("-rank", "name")
+            )
+
+        return self.like_search(queryset, term)
+
+    @staticmethod
+    def like_search(queryset, term):
+        # cada palabra en name o sku, en cualquier orden (como SearchFilter); el término
+        # completo solo ordena
+        for word in term.split():
+            queryset = queryset.filter(Q(name__icontains=word) | Q(sku__icontains=word))
+        return (
+            queryset
+            .annotate(rank=Case(
+                When(sku__istartswith=term, then=Value(3)),
+                When(name__istartswith=term, then=Value(2)),
+                default=Value(1),
+                output_field=IntegerField(),
+            ))
+            .order_by("-rank", "name")
+        )
+
+
+class CatalogFilter(filters.BaseFilterBackend):
+    """?category_id= (índice (category, name)) y ?in_stock=1 para los listados de catálogo."""
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        if params.get("category_id"):
+            try:
+                queryset = queryset.filter(category_id=int(params["category_id"]))
+            except ValueError:
+                raise ValidationError({"category_id": ["Debe ser un número."]})
+        if params.get("in_stock", "").lower() in ("1", "true"):
+            queryset = queryset.filter(stock__gt=0)
+        return queryset
@@ -0,0 +1,73 @@
+# api/sequences.py
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Order, OrderSequence
+
+CODE_PREFIX = "PDLF"
+
+
+def format_order_code(day, seq):
+    return f"{CODE_PREFIX}-{day.strftime('%Y%m%d')}-{str(seq).zfill(4)}"
+
+
+def _initial_seq(day):
+    """Últimos correlativos ya usados ese día (códigos antiguos usaban el id de la orden)."""
+    prefix = format_order_code(day, 0).rsplit("-", 1)[0] + "-"
+    last = 0
+    for code in Order.objects.filter(code__startswith=prefix).values_list("code", flat=True):
+        suffix = code[len(prefix):]
+        if suffix.isdigit():
+            last = max(last, int(suffix))
+    return last
+
+
+def _reserve(day, size):
+    """Reserva [start, end] en OrderSequence con un UPDATE atómico."""
+    with transaction.atomic():
+        if not OrderSequence.objects.filter(day=day).update(last=F("last") + size):
+            try:
+                with transaction.atomic():
+                    OrderSequence.objects.create(day=day, last=_initial_seq(day) + size)
+            except IntegrityError:
+                OrderSequence.objects.filter(day=day).update(last=F("last") + size)
+        end = OrderSequence.objects.filter(day=day).values_list("last", flat=True).get()
+    return end - size + 1, end
+
+
+class BlockAllocator:
+    """
+    Entrega correlativos desde bloques reservados por proceso, así el checkout no
+    espera en la fila del contador. Los números no usados de un bloque (reinicio
+    del worker) quedan como huecos; los códigos nunca se repiten.
+    """
+
+    def __init__(self, block_size):
+        self.block_size = max(1, block_size)
+        self._lock = threading.Lock()
+        self._day = None
+        self._next = self._end = 0
+
+    def next(self, day):
+        # dentro de una transacción la reserva podría revertirse: no se guarda en memoria
+        if connection.in_atomic_block:
+            return _reserve(day, 1)[1]
+        with self._lock:
+            if day != self._day or self._next > self._end:
+                self._next, self._end = _reserve(day, self.block_size)
+                self._day = day
+            seq = self._next
+            self._next += 1
+            return seq
+
+
+_allocator = BlockAllocator(getattr(settings, "ORDER_CODE_BLOCK_SIZE", 20))
+
+
+def next_order_code(day=None):
+    day = day or timezone.localdate()
+    return format_order_code(day, _allocator.next(day))
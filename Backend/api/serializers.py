@@ -1,5 +1,13 @@
+from django.db import transaction
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from django.utils.encoding import filepath_to_uri
 from rest_framework import serializers
-from .models import Category, Product, Order, OrderItem
+from .models import Category, Product, Order, OrderItem, StockMovement
+from .rollups import record_sale
+from . import catalog_cache, events, stock
+from .sequences import next_order_code
+from .images import srcset
 import uuid
 
 # ------ helper ------
@@ -44,11 +52,13 @@ class ProductSerializer(serializers.ModelSerializer):
         
     def to_representation(self, instance):
         data = super().to_representation(instance)
+        request = self.context.get("request")
+        absolute = request.build_absolute_uri if request else (lambda url: url)
         img = data.get("image")
-        if img:
-            request = self.context.get("request")
-            if request and not img.startswith("http"):
-                data["image"] = request.build_absolute_uri(img)
+        if img and not img.startswith("http"):
+            data["image"] = absolute(img)
+        # srcset por formato: {"webp": "url 200w, url 400w, ...", "jpeg": ...}
+        data["image_srcset"] = srcset(instance.image_variants, lambda name: absolute(default_storage.url(name)))
         return data
 
     # Validaciones
@@ -106,14 +116,34 @@ class OrderCreateSerializer(serializers.Serializer):
         return data
 
     def create(self, validated):
-        from django.db import transaction
-
         customer = validated["customer"]
         delivery = validated["delivery"]
         items = validated["items"]
         pm = validated["payment_method"]
 
+        # cantidad total por producto (una línea repetida suma)
+        wanted = {}
+        for it in items:
+            wanted[it["product_id"]] = wanted.get(it["product_id"], 0) + int(it["quantity"])
+        ids = sorted(wanted)
+
+        # fuera de la transacción: el correlativo sale del bloque reservado por este worker
+        created_at = timezone.now()
+        code = next_order_code(timezone.localdate(created_at))
+
+        # lectura sin bloqueo: valida y arma el snapshot; el UPDATE condicionado es el que manda
+        products = Product.objects.in_bulk(ids)
+        for pid in ids:
+            product = products.get(pid)
+            if product is None:
+                raise serializers.ValidationError({"items": [f"Producto '{pid}' no existe."]})
+            if product.stock < wanted[pid]:
+                raise serializers.ValidationError({"items": [f"Stock insuficiente para {product.name}. Disponible: {product.stock}."]})
+        total = sum(int(it["quantity"]) * products[it["product_id"]].price for it in items)
+
         with transaction.atomic():
+            # primero lo que no compite: la orden, sus líneas y el ledger (solo INSERT; sin FK
+            # hacia Product en la base, así que no toman bloqueos S sobre los productos)
             order = Order.objects.create(
                 full_name=customer["full_name"],
                 email=customer.get("email"),
@@ -123,37 +153,93 @@ class OrderCreateSerializer(serializers.Serializer):
                 notes=delivery.get("notes") or "",
                 payment_method=pm,
                 status="paid",
+                total=total,
+                code=code,
+                created_at=created_at,
             )
-            total = 0
 
+            lines = []
             for it in items:
-                try:
-                    product = Product.objects.select_for_update().get(pk=it["product_id"])
-                except Product.DoesNotExist:
-                    raise serializers.ValidationError({"items": [f"Producto '{it['product_id']}' no existe."]})
-
-                qty = int(it["quantity"])
-                if product.stock < qty:
-                    raise serializers.ValidationError({"items": [f"Stock insuficiente para {product.name}. Disponible: {product.stock}."]})
-
-                product.stock -= qty
-                product.save(update_fields=["stock"])
-
-                OrderItem.objects.create(
+                product = products[it["product_id"]]
+                lines.append(OrderItem(
                     order=order,
                     product=product,                # FK (puede borrarse luego)
                     product_name=product.name,      # snapshot
                     product_sku=product.sku,        # snapshot
-                    quantity=qty,
+                    quantity=int(it["quantity"]),
                     price=product.price,
-                )
-                total += qty * product.price
+                ))
+            OrderItem.objects.bulk_create(lines)
+            StockMovement.objects.bulk_create([
+                stock.movement(products[pid], "sale", -wanted[pid], order=order) for pid in ids
+            ])
 
-            order.total = total
-            order.save(update_fields=["total"])
+            # al final las filas calientes, en el mismo orden que cancel_order: productos (PK),
+            # ProductSalesDaily y DailySales. Sus bloqueos X duran esos UPDATE y el COMMIT.
+            # stock = stock - qty WHERE stock >= qty: si no alcanza, se deshace todo lo anterior
+            if stock.apply_deltas({pid: -wanted[pid] for pid in ids}) != len(ids):
+                raise serializers.ValidationError({"items": ["Stock insuficiente, intenta nuevamente."]})
+            record_sale(order, lines)
+            # el UPDATE de stock no dispara signals
+            catalog_cache.bump_on_commit()
 
         return order
 
+class StockAdjustItemSerializer(serializers.Serializer):
+    product_id = serializers.CharField()
+    delta = serializers.IntegerField(required=False)
+    absolute = serializers.IntegerField(required=False, min_value=0)
+
+    def validate(self, data):
+        if ("delta" in data) == ("absolute" in data):
+            raise serializers.ValidationError("Indica delta o absolute (solo uno).")
+        return data
+
+class StockAdjustSerializer(serializers.Serializer):
+    """Conteo/ajuste de stock en lote: una transacción, una lectura bloqueada y un bulk_update."""
+    items = StockAdjustItemSerializer(many=True, allow_empty=False, max_length=2000)
+    note = serializers.CharField(required=False, allow_blank=True, max_length=200, default="")
+
+    def create(self, validated):
+        items = validated["items"]
+        ids = sorted({it["product_id"] for it in items})
+        with transaction.atomic():
+            # FOR UPDATE en orden de PK (igual que el UPDATE del checkout): sin deadlocks entre ajustes
+            products = Product.objects.select_for_update().order_by("pk").in_bulk(ids)
+            missing = [pid for pid in ids if pid not in products]
+            if missing:
+                raise serializers.ValidationError({"items": [f"Producto '{pid}' no existe." for pid in missing]})
+
+            levels = {pid: products[pid].stock for pid in ids}
+            counted = set()   # productos con un conteo (absolute): su diferencia es un ajuste
+            for it in items:
+                pid = it["product_id"]
+                if "absolute" in it:
+                    levels[pid] = it["absolute"]
+                    counted.add(pid)
+                else:
+                    levels[pid] += it["delta"]
+            negative = [pid for pid in ids if levels[pid] < 0]
+            if negative:
+                raise serializers.ValidationError({"items": [f"El stock de '{pid}' quedaría negativo." for pid in negative]})
+
+            changed = [products[pid] for pid in ids if levels[pid] != products[pid].stock]
+            moves = []
+            for product in changed:
+                delta = levels[product.pk] - product.stock
+                # solo deltas positivos = reposición; conteos y descuentos = ajuste
+                kind = "restock" if delta > 0 and product.pk not in counted else "adjust"
+                moves.append(stock.movement(product, kind, delta, note=validated["note"]))
+                product.stock = product._loaded_stock = levels[product.pk]
+            # bulk_* no dispara signals: ledger, caché y eventos a mano
+            Product.objects.bulk_update(changed, ["stock"])
+            StockMovement.objects.bulk_create(moves)
+            for product in changed:
+                events.publish_on_commit("stock", {"id": product.pk, "stock": product.stock})
+            if changed:
+                catalog_cache.bump_on_commit()
+        return [{"id": pid, "stock": levels[pid]} for pid in ids]
+
 class OrderSerializer(serializers.ModelSerializer):
     items = serializers.SerializerMethodField()
 
@@ -166,16 +252,99 @@ class OrderSerializer(serializers.ModelSerializer):
         ]
 
     def get_items(self, obj):
-        out = []
-        for i in obj.items.all():
-            # si product fue borrado, usa snapshot
-            pname = i.product.name if i.product else (i.product_name or "")
-            psku  = i.product.sku  if i.product else (i.product_sku or "")
-            out.append({
-                "product": pname,
-                "sku": psku,
-                "quantity": i.quantity,
-                "price": i.price,
-                "line_total": i.quantity * i.price
-            })
-        return out
+        # solo snapshots: no hace falta cargar Product
+        return [item_row(i.product_name, i.product_sku, i.quantity, i.price) for i in obj.items.all()]
+
+
+# ------ Lectura rápida (listados) ------
+# Mismo JSON que ProductSerializer / OrderSerializer, pero desde .values():
+# sin instancias de modelo, sin fields de DRF por fila y con la URL base de media resuelta una vez.
+
+class MediaUrls:
+    """nombre en el storage -> URL absoluta, resolviendo host y MEDIA_URL una sola vez."""
+
+    def __init__(self, request=None):
+        absolute = request.build_absolute_uri if request else (lambda url: url)
+        base_url = getattr(default_storage, "base_url", None)
+        self.base = absolute(base_url) if base_url else None
+        self.absolute = absolute
+
+    def __call__(self, name):
+        if not name:
+            return None
+        if self.base is None:
+            return self.absolute(default_storage.url(name))
+        return self.base + filepath_to_uri(name)
+
+
+PRODUCT_LIST_VALUES = ["id", "sku", "name", "price", "stock", "image", "image_variants", "category_id", "category__name"]
+if hasattr(Product, "barcode"):
+    PRODUCT_LIST_VALUES.append("barcode")
+
+def product_rows(rows, request=None):
+    urls = MediaUrls(request)
+    out = []
+    for r in rows:
+        row = {
+            "id": r["id"],
+            "sku": r["sku"],
+            "name": r["name"],
+            "price": r["price"],
+            "stock": r["stock"],
+            "image": urls(r["image"]),
+        }
+        if "barcode" in r:
+            row["barcode"] = r["barcode"]
+        row["category"] = {"id": r["category_id"], "name": r["category__name"]}
+        row["image_srcset"] = srcset(r["image_variants"], urls)
+        out.append(row)
+    return out
+
+
+ORDER_LIST_VALUES = [
+    "id", "code", "created_at", "status",
+    "full_name", "phone", "delivery_mode", "address",
+    "payment_method", "total",
+]
+
+def item_row(name, sku, quantity, price):
+    return {"product": name or "", "sku": sku or "", "quantity": quantity, "price": price, "line_total": quantity * price}
+
+def order_rows(rows, request=None):
+    """request no se usa: mismo contrato que product_rows (ValuesListMixin.list_rows)."""
+    rows = list(rows)
+    items = {}
+    lines = (
+        OrderItem.objects.filter(order_id__in=[r["id"] for r in rows])
+        .order_by("order_id", "id")
+        .values_list("order_id", "product_name", "product_sku", "quantity", "price")
+    )
+    for order_id, *line in lines:
+        items.setdefault(order_id, []).append(item_row(*line))
+
+    created_at = serializers.DateTimeField()
+    out = []
+    for r in rows:
+        row = dict(r)
+        row["created_at"] = created_at.to_representation(r["created_at"])
+        row["items"] = items.get(r["id"], [])
+        out.append(row)
+    return out
+
+
+def archived_order_row(archived):
+    """ArchivedOrder -> mismo JSON que OrderSerializer (más "archived": true)."""
+    data = archived.unpack()
+    order = data["order"]
+    row = {
+        "id": archived.id,
+        "code": archived.code,
+        "created_at": serializers.DateTimeField().to_representation(archived.created_at),
+        "status": archived.status,
+    }
+    for key in ("full_name", "phone", "delivery_mode", "address", "payment_method"):
+        row[key] = order.get(key)
+    row["total"] = archived.total
+    row["items"] = [item_row(i["product_name"], i["product_sku"], i["quantity"], i["price"]) for i in data["items"]]
+    row["archived"] = True
+    return row
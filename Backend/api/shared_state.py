@@ -0,0 +1,43 @@
+# api/shared_state.py
+"""
+Estado que tiene que ser el mismo en todos los workers.
+
+Con LocMemCache (o EVENTS_BACKEND=local) cada proceso guarda su copia: una
+invalidación, un pin a la primaria, un token revocado o un Idempotency-Key solo
+existen en el worker que los escribió. FileBasedCache sí se comparte en la máquina,
+pero su add() e incr() no son atómicos entre procesos: sirve para lo que solo lee y
+borra, no para el lock de Idempotency-Key ni para los contadores (versión del
+catálogo, ids de eventos).
+gunicorn.conf.py arranca con un solo worker mientras quede algo de esto sin
+compartir, y no arranca si se le piden más (GUNICORN_WORKERS).
+"""
+from django.conf import settings
+
+LOCMEM = "django.core.cache.backends.locmem.LocMemCache"
+FILE = "django.core.cache.backends.filebased.FileBasedCache"
+
+
+def cache_stores():
+    """{descripción: (alias de caché, necesita add/incr atómicos)} de lo que se comparte entre requests."""
+    stores = {
+        "caché y versión del catálogo (api/catalog_cache.py)": (getattr(settings, "CATALOG_CACHE_ALIAS", "catalog"), True),
+        "grupos por usuario (api/perms.py)": (getattr(settings, "GROUPS_CACHE_ALIAS", "default"), False),
+        "pin a la primaria (api/routers.py)": (getattr(settings, "REPLICA_PIN_CACHE_ALIAS", "default"), False),
+        "Idempotency-Key (api/idempotency.py)": (getattr(settings, "IDEMPOTENCY_CACHE_ALIAS", "default"), True),
+        "tokens revocados (api/authentication.py)": (getattr(settings, "JWT_REVOCATION_CACHE_ALIAS", "default"), False),
+    }
+    if getattr(settings, "EVENTS_BACKEND", "") == "api.events.CacheBroker":
+        stores["broker de /api/events/ (api/events.py)"] = (getattr(settings, "EVENTS_CACHE_ALIAS", "default"), True)
+    return stores
+
+
+def process_local_stores():
+    """Lo que con la configuración actual quedaría por proceso, o sin add/incr atómicos entre procesos."""
+    local = []
+    for name, (alias, atomic) in cache_stores().items():
+        backend = settings.CACHES[alias]["BACKEND"]
+        if backend == LOCMEM or (atomic and backend == FILE):
+            local.append(name)
+    if getattr(settings, "EVENTS_BACKEND", "api.events.LocalBroker") == "api.events.LocalBroker":
+        local.append("broker de /api/events/ (api/events.py)")
+    return local
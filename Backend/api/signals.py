@@ -0,0 +1,89 @@
+# api/signals.py
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import catalog_cache, events, images, stock, storage
+from .models import Category, Product
+from .authentication import revoke_user_tokens
+from .perms import invalidate_user_groups
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+def catalog_changed(sender, **kwargs):
+    catalog_cache.bump_on_commit()
+
+
+@receiver(post_save, sender=Product)
+def product_image_changed(sender, instance, **kwargs):
+    if images.needs_variants(instance):
+        images.schedule(instance)
+
+
+@receiver(post_save, sender=Product)
+def product_image_replaced(sender, instance, raw=False, **kwargs):
+    old = getattr(instance, "_loaded_image", None)
+    new = instance.image.name if instance.image else ""
+    if old and old != new and not raw:
+        storage.collect_on_commit(old, instance._loaded_variants)
+    instance._loaded_image, instance._loaded_variants = new, instance.image_variants
+
+
+@receiver(post_delete, sender=Product)
+def product_image_deleted(sender, instance, **kwargs):
+    if instance.image:
+        storage.collect_on_commit(instance.image.name, instance.image_variants)
+
+
+@receiver(post_save, sender=Product)
+def product_live_changed(sender, instance, created, raw=False, **kwargs):
+    # antes de product_stock_changed, que actualiza _loaded_stock
+    if raw or created:
+        return
+    if getattr(instance, "_loaded_stock", None) not in (None, instance.stock):
+        events.publish_on_commit("stock", {"id": instance.pk, "stock": instance.stock})
+    if getattr(instance, "_loaded_price", None) not in (None, instance.price):
+        events.publish_on_commit("price", {"id": instance.pk, "price": instance.price})
+    instance._loaded_price = instance.price
+
+
+@receiver(post_save, sender=Product)
+def product_stock_changed(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        stock.record_save(instance, created)
+
+
+# ---------- caché de grupos (api/perms.py) ----------
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # user.groups.add/remove/clear
+        if action in ("post_add", "post_remove", "post_clear"):
+            _groups_changed(instance.pk)
+    elif action in ("post_add", "post_remove"):
+        # group.user_set.add/remove
+        _groups_changed(*pk_set)
+    elif action == "pre_clear":
+        _groups_changed(*instance.user_set.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    _groups_changed(*instance.user_set.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=get_user_model())
+def user_changed(sender, instance, created, update_fields=None, **kwargs):
+    # desactivación, cambio de clave, superusuario...: los claims del token quedan viejos
+    if not created and update_fields != frozenset({"last_login"}):
+        revoke_user_tokens(instance.pk)
+
+
+def _groups_changed(*user_ids):
+    invalidate_user_groups(*user_ids)
+    # en modo stateless los grupos viajan en el token: se fuerza un refresh
+    for uid in user_ids:
+        revoke_user_tokens(uid)
@@ -0,0 +1,88 @@
+# api/stock.py
+"""
+Ledger de stock (StockMovement).
+
+Cada cambio de stock agrega filas al ledger (solo INSERT, no compiten entre sí) y
+ajusta Product.stock, el saldo acumulado con el que se vende. El UPDATE del saldo es
+condicionado (stock >= cantidad), así que no hay sobreventa aunque no se bloquee la
+fila durante todo el checkout: va al final de la transacción, después de los INSERT,
+y el bloqueo X del producto dura solo ese UPDATE, los de los rollups y el COMMIT.
+OrderItem y StockMovement no tienen FK hacia Product en la base: con FK, cada INSERT
+tomaría un bloqueo S sobre el producto y dos ventas del mismo SKU se cruzarían al
+pedir el X (deadlock 1213). compact_stock_ledger resume movimientos antiguos y
+verifica que ledger y saldo coincidan.
+"""
+from django.db import models
+from django.db.models import Case, F, Q, Sum, When
+
+from . import catalog_cache, events
+from .models import Product, StockMovement
+from .rollups import record_cancel
+
+
+def movement(product, kind, delta, order=None, note=""):
+    return StockMovement(
+        product=product, product_sku=product.sku, kind=kind, delta=delta, order=order, note=note,
+    )
+
+
+def apply_deltas(deltas):
+    """
+    deltas: {product_id: delta}. Un solo UPDATE; los descuentos solo se aplican si
+    alcanza el stock. Devuelve la cantidad de productos actualizados.
+    """
+    if not deltas:
+        return 0
+    guard = Q()
+    for pid, delta in deltas.items():
+        guard |= Q(pk=pid, stock__gte=-delta) if delta < 0 else Q(pk=pid)
+    updated = Product.objects.filter(guard).update(
+        stock=Case(
+            *[When(pk=pid, then=F("stock") + delta) for pid, delta in deltas.items()],
+            output_field=models.PositiveIntegerField(),
+        )
+    )
+    # el UPDATE no dispara signals: el stock nuevo se publica a mano (api/events.py)
+    events.stock_changed(deltas)
+    return updated
+
+
+def record_save(product, created):
+    """Cambios vía save() (admin, PATCH, seed): registra la diferencia con el saldo leído."""
+    before = 0 if created else getattr(product, "_loaded_stock", None)
+    if before is None:
+        return
+    delta = product.stock - before
+    if delta:
+        movement(product, "opening" if created else "adjust", delta).save()
+    product._loaded_stock = product.stock
+
+
+def cancel_order(order):
+    """
+    Anula una orden pagada: devuelve su stock vía ledger y la descuenta del rollup.
+    Llamar dentro de una transacción, con la orden bloqueada. Bloquea en el mismo orden
+    que el checkout (productos, ProductSalesDaily, DailySales).
+    """
+    deltas, skus = {}, {}
+    for pid, sku, qty in order.items.filter(product__isnull=False).values_list("product_id", "product_sku", "quantity"):
+        deltas[pid] = deltas.get(pid, 0) + qty
+        skus[pid] = sku
+    StockMovement.objects.bulk_create([
+        StockMovement(product_id=pid, product_sku=skus[pid], kind="cancel", delta=qty, order=order)
+        for pid, qty in deltas.items()
+    ])
+    apply_deltas(deltas)
+    order.status = "cancelled"
+    order.save(update_fields=["status"])
+    record_cancel(order)
+    # el UPDATE de stock no dispara signals
+    catalog_cache.bump_on_commit()
+
+
+def ledger_balances(product_ids=None):
+    """{product_id: suma de movimientos}."""
+    qs = StockMovement.objects.filter(product__isnull=False)
+    if product_ids is not None:
+        qs = qs.filter(product_id__in=product_ids)
+    return dict(qs.values("product_id").annotate(total=Sum("delta")).values_list("product_id", "total"))
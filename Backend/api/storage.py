@@ -0,0 +1,168 @@
+# api/storage.py
+"""
+Media direccionada por contenido.
+
+ContentAddressedStorage nombra cada archivo por el sha256 de su contenido: subir la
+misma foto dos veces reutiliza el archivo, y un nombre nunca cambia de contenido,
+así que media_view lo sirve con Cache-Control: immutable. Como un archivo puede
+estar compartido por varios productos, solo se borra cuando ya nadie lo referencia
+(collect_orphan al reemplazar/borrar la imagen, y gc_media para lo que quede).
+"""
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+import time
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import transaction
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_safe
+
+HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def file_digest(content):
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def is_content_addressed(name):
+    return bool(HASH_RE.match(os.path.splitext(posixpath.basename(name))[0]))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Se guarda como <directorio>/<sha256>.<ext>; si ya existe, no se vuelve a escribir."""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        ext = os.path.splitext(name)[1].lower()
+        name = posixpath.join(posixpath.dirname(name), f"{file_digest(content)}{ext}")
+        if self.exists(name):
+            # "recién usado": collect_orphan no lo borra mientras dure la gracia
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length)
+
+
+# ---------- recolección de huérfanos ----------
+def _grace():
+    return getattr(settings, "MEDIA_GC_GRACE_SECONDS", 600)
+
+
+def collect_orphan(name, variants=None):
+    """Borra `name` y sus variantes si ningún producto usa ya esa imagen."""
+    from .images import variant_files
+    from .models import Product
+
+    if not name or Product.objects.filter(image=name).exists():
+        return
+    try:
+        if time.time() - default_storage.get_modified_time(name).timestamp() < _grace():
+            return  # otra subida pudo reutilizarlo recién; lo revisa gc_media
+    except (FileNotFoundError, NotImplementedError):
+        pass
+    for path in [name, *variant_files(variants)]:
+        default_storage.delete(path)
+
+
+def collect_on_commit(name, variants=None):
+    transaction.on_commit(lambda: collect_orphan(name, variants))
+
+
+# ---------- servir media ----------
+def _byte_range(header, size):
+    """'bytes=a-b' -> (inicio, fin) inclusivo; None si no aplica; ValueError si no se puede cumplir."""
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first == "":
+        # sufijo: los últimos N bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError
+    return start, end
+
+
+def _read(path, start, length, chunk_size=64 * 1024):
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        while length > 0:
+            data = fh.read(min(chunk_size, length))
+            if not data:
+                return
+            length -= len(data)
+            yield data
+
+
+@require_safe
+def media_view(request, path):
+    """MEDIA_URL en producción: ETag, Range y caché larga; MEDIA_OFFLOAD delega el envío a nginx/Apache."""
+    try:
+        full = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full):
+        raise Http404
+    stat = os.stat(full)
+    immutable = is_content_addressed(path)
+    etag = f'"{os.path.splitext(posixpath.basename(path))[0]}"' if immutable else f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE if immutable else "public, max-age=3600",
+        "Accept-Ranges": "bytes",
+    }
+    content_type = mimetypes.guess_type(full)[0] or "application/octet-stream"
+
+    tags = parse_etags(request.META.get("HTTP_IF_NONE_MATCH", ""))
+    if etag in tags or "*" in tags:
+        return HttpResponseNotModified(headers=headers)
+
+    offload = getattr(settings, "MEDIA_OFFLOAD", "")
+    if offload == "x-accel":
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response["X-Accel-Redirect"] = getattr(settings, "MEDIA_ACCEL_PREFIX", "/protected-media/") + quote(path)
+        return response
+    if offload == "x-sendfile":
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response["X-Sendfile"] = full
+        return response
+
+    range_header = request.META.get("HTTP_RANGE")
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if range_header and (not if_range or if_range == etag):
+        try:
+            byte_range = _byte_range(range_header, stat.st_size)
+        except ValueError:
+            return HttpResponse(status=416, headers={"Content-Range": f"bytes */{stat.st_size}"})
+        if byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                _read(full, start, end - start + 1), status=206, content_type=content_type, headers=headers,
+            )
+            response["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+            response["Content-Length"] = str(end - start + 1)
+            return response
+
+    return FileResponse(open(full, "rb"), content_type=content_type, headers=headers)
@@ -1,3 +1,1212 @@
-from django.test import TestCase
+import csv
+import hashlib
+import importlib
+import io
+import json
+import shutil
+import tempfile
+import threading
+import time
 
-# Create your tests here.
+from datetime import timedelta
+from unittest import mock, skipIf
+
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache, caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.paginator import EmptyPage
+from django.db import connection
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve
+from django.utils import timezone
+from PIL import Image
+from rest_framework import serializers
+
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import async_views, catalog_cache, events, export, metrics, stock
+from . import urls as api_urls
+from .catalog_import import import_rows
+from .authentication import ClaimsUser, StatelessJWTAuthentication
+from .images import variant_files
+from .models import ArchivedOrder, Category, DailySales, Order, OrderItem, Product, ProductSalesDaily, StockMovement
+from .stock import ledger_balances
+from .admin import ProductAdmin
+from .pagination import EstimatedCountPaginator
+from .search import ProductSearchFilter, boolean_query
+from .shared_state import process_local_stores
+from .serializers import (
+    OrderCreateSerializer, OrderSerializer, ProductSerializer,
+    ORDER_LIST_VALUES, PRODUCT_LIST_VALUES, order_rows, product_rows,
+)
+
+
+def make_catalog():
+    cat = Category.objects.create(name="Ramos")
+    return [
+        Product.objects.create(id=f"P{n:03}", sku=f"SKU-{n}", name=f"Producto {n}", category=cat, price=1000 * n, stock=10)
+        for n in range(1, 5)
+    ]
+
+
+def checkout(*lines):
+    s = OrderCreateSerializer(data={
+        "customer": {"full_name": "Cliente", "phone": "+56 9 1234 5678"},
+        "delivery": {"mode": "retiro"},
+        "payment_method": "efectivo",
+        "items": [{"product_id": pid, "quantity": qty} for pid, qty in lines],
+    })
+    s.is_valid(raise_exception=True)
+    return s.save()
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.products = make_catalog()
+
+    def test_descuenta_stock_y_guarda_snapshots(self):
+        order = checkout(("P001", 2), ("P002", 1), ("P001", 1))
+        self.assertEqual(order.total, 3 * 1000 + 2000)
+        self.assertEqual(Product.objects.get(pk="P001").stock, 7)
+        self.assertEqual(Product.objects.get(pk="P002").stock, 9)
+        self.assertEqual(
+            list(order.items.order_by("id").values_list("product_sku", "quantity")),
+            [("SKU-1", 2), ("SKU-2", 1), ("SKU-1", 1)],
+        )
+
+    def test_sin_stock_no_modifica_nada(self):
+        with self.assertRaises(serializers.ValidationError):
+            checkout(("P002", 1), ("P001", 6), ("P001", 5))
+        self.assertEqual(Product.objects.get(pk="P001").stock, 10)
+        self.assertEqual(Product.objects.get(pk="P002").stock, 10)
+        self.assertFalse(Order.objects.exists())
+
+    def test_update_condicionado_no_descuenta_sin_stock(self):
+        self.assertEqual(stock.apply_deltas({"P001": -11, "P002": -1}), 1)
+        self.assertEqual(Product.objects.get(pk="P001").stock, 10)
+
+    def test_stock_vendido_entre_medio_revierte_la_orden(self):
+        real = stock.apply_deltas
+
+        def after_concurrent_sale(deltas):
+            # otro checkout se llevó el stock después de la validación sin bloqueo
+            Product.objects.filter(pk="P001").update(stock=1)
+            return real(deltas)
+
+        with mock.patch.object(stock, "apply_deltas", after_concurrent_sale):
+            with self.assertRaises(serializers.ValidationError):
+                checkout(("P001", 2), ("P002", 1))
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(StockMovement.objects.filter(kind="sale").exists())
+        self.assertFalse(DailySales.objects.exists())
+        self.assertEqual(Product.objects.get(pk="P002").stock, 10)
+
+    def test_producto_inexistente(self):
+        with self.assertRaises(serializers.ValidationError):
+            checkout(("P001", 1), ("NOPE", 1))
+        self.assertFalse(OrderItem.objects.exists())
+
+    def test_queries_no_crecen_con_las_lineas(self):
+        checkout(("P001", 1), ("P002", 1), ("P003", 1), ("P004", 1))  # crea las filas de los rollups del día
+        with CaptureQueriesContext(connection) as one:
+            checkout(("P001", 1))
+        with CaptureQueriesContext(connection) as many:
+            checkout(("P004", 1), ("P003", 2), ("P002", 1), ("P001", 1))
+        self.assertEqual(len(one), len(many))
+
+    def test_orden_se_escribe_una_vez_con_codigo(self):
+        with CaptureQueriesContext(connection) as ctx:
+            order = checkout(("P001", 1), ("P002", 1))
+        table = connection.ops.quote_name(Order._meta.db_table)
+        writes = [
+            q["sql"] for q in ctx.captured_queries
+            if q["sql"].startswith(("INSERT", "UPDATE")) and table in q["sql"].split("SET")[0].split("(")[0]
+        ]
+        self.assertEqual(len(writes), 1)
+        self.assertRegex(order.code, r"^PDLF-\d{8}-0001$")
+        self.assertEqual(checkout(("P001", 1)).code[-4:], "0002")
+
+
+class StockLedgerTests(APITestCase):
+    def setUp(self):
+        self.products = make_catalog()
+        admin = User.objects.create_user("admin", password="x")
+        admin.groups.add(Group.objects.get_or_create(name="admin")[0])
+        self.client.force_authenticate(admin)
+
+    def assertCuadra(self):
+        stock = dict(Product.objects.values_list("pk", "stock"))
+        self.assertEqual(ledger_balances(), stock)
+
+    def test_checkout_y_ajustes_quedan_en_el_ledger(self):
+        order = checkout(("P001", 2), ("P002", 1), ("P001", 1))
+        self.assertEqual(
+            sorted(order.stock_movements.values_list("product_id", "kind", "delta")),
+            [("P001", "sale", -3), ("P002", "sale", -1)],
+        )
+        product = Product.objects.get(pk="P003")
+        product.stock = 4
+        product.save()
+        self.assertEqual(product.movements.latest("id").delta, -6)
+        self.assertCuadra()
+
+    def test_checkout_bloquea_las_filas_calientes_al_final(self):
+        checkout(("P001", 1), ("P002", 1))   # crea las filas del día en los rollups
+        with CaptureQueriesContext(connection) as ctx:
+            checkout(("P002", 1), ("P001", 2))
+        writes = [
+            q["sql"].split()[:3] for q in ctx.captured_queries
+            if q["sql"].startswith(("INSERT", "UPDATE")) and "api_ordersequence" not in q["sql"]
+        ]
+        self.assertEqual(
+            [w[0] if w[0] == "INSERT" else w[1].strip('"') for w in writes],
+            ["INSERT", "INSERT", "INSERT", "api_product", "api_productsalesdaily", "api_dailysales"],
+        )
+        self.assertCuadra()
+
+    def test_ajuste_en_lote(self):
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.post("/api/stock/adjust/", [
+                {"product_id": "P001", "delta": -3}, {"product_id": "P002", "absolute": 25},
+                {"product_id": "P001", "delta": 1}, {"product_id": "P003", "absolute": 10},
+            ], format="json")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json()["results"], [
+            {"id": "P001", "stock": 8}, {"id": "P002", "stock": 25}, {"id": "P003", "stock": 10},
+        ])
+        self.assertEqual(len([q for q in ctx.captured_queries if "api_product" in q["sql"].split("WHERE")[0]]), 2)
+        self.assertEqual(
+            sorted(StockMovement.objects.filter(kind="adjust").values_list("product_id", "delta")),
+            [("P001", -2), ("P002", 15)],
+        )
+        self.assertCuadra()
+
+        r = self.client.post("/api/stock/adjust/", {"items": [
+            {"product_id": "P001", "delta": -100}, {"product_id": "P004", "absolute": 0},
+        ]}, format="json")
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(Product.objects.get(pk="P004").stock, 10)
+        bad = self.client.post("/api/stock/adjust/", [{"product_id": "P001", "delta": 1, "absolute": 2}], format="json")
+        self.assertEqual(bad.status_code, 400)
+
+        r = self.client.post("/api/stock/adjust/", [{"product_id": "P004", "delta": 5}], format="json")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(list(StockMovement.objects.filter(kind="restock").values_list("product_id", "delta")), [("P004", 5)])
+        self.assertCuadra()
+
+    def test_anular_devuelve_stock_y_descuenta_rollup(self):
+        order = checkout(("P001", 2), ("P002", 1))
+        r = self.client.post(f"/api/orders/{order.pk}/cancel/")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.data["status"], "cancelled")
+        self.assertEqual(Product.objects.get(pk="P001").stock, 10)
+        day = DailySales.objects.get()
+        self.assertEqual((day.orders, day.total), (0, 0))
+        self.assertCuadra()
+        self.assertEqual(self.client.post(f"/api/orders/{order.pk}/cancel/").status_code, 409)
+
+
+    def test_conciliacion_confirma_con_la_fila_bloqueada(self):
+        Product.objects.filter(pk="P002").update(stock=7)   # diferencia real, sin movimiento
+        checkout(("P001", 2))
+        real = ledger_balances()
+        # la pasada sin bloqueo ve el ledger de antes de la venta de P001 (venta entre las dos lecturas)
+        stale = {**real, "P001": real["P001"] + 2}
+        with mock.patch(
+            "api.management.commands.compact_stock_ledger.ledger_balances", side_effect=[stale, real],
+        ) as balances:
+            call_command("compact_stock_ledger", check_only=True, repair=True, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(sorted(balances.call_args_list[1].args[0]), ["P001", "P002"])
+        self.assertEqual(
+            list(StockMovement.objects.filter(note="conciliación").values_list("product_id", "delta")), [("P002", -3)],
+        )
+        self.assertCuadra()
+
+class CatalogImportTests(TestCase):
+    def setUp(self):
+        make_catalog()
+
+    def test_crea_y_actualiza_en_el_mismo_bloque(self):
+        report = import_rows([
+            {"sku": "SKU-1", "price": "1500"},
+            {"sku": "SKU-2", "stock": "4"},
+            {"sku": "SKU-9", "id": "P009", "name": "Nuevo", "price": "900", "stock": "3", "category": "Ramos"},
+        ])
+        self.assertEqual((report["created"], report["updated"], report["errors"]), (1, 2, []))
+        self.assertEqual(Product.objects.get(pk="P001").price, 1500)
+        self.assertEqual(Product.objects.get(pk="P002").stock, 4)
+        self.assertEqual(Product.objects.get(pk="P009").stock, 3)
+        self.assertEqual(ledger_balances(["P002", "P009"]), {"P002": 4, "P009": 3})
+
+    def test_errores_por_fila(self):
+        report = import_rows([
+            {"sku": "SKU-8", "id": "P008", "name": "x" * 121, "price": "100", "category": "Ramos"},
+            {"sku": "S" * 41, "name": "Largo", "price": "100", "category": "Ramos"},
+            {"sku": "SKU-7", "name": "Caro", "price": str(10 ** 20), "category": "Ramos"},
+            {"sku": "SKU-5", "id": "P005", "name": "Uno", "price": "100", "category": "Ramos"},
+            {"sku": "SKU-6", "id": "P005", "name": "Otro", "price": "100", "category": "Ramos"},
+        ])
+        self.assertEqual(report["created"], 1)
+        self.assertEqual(
+            [(e["row"], sorted(e["errors"])) for e in report["errors"]],
+            [(1, ["name"]), (2, ["sku"]), (3, ["price"]), (5, ["id"])],
+        )
+        self.assertEqual(Product.objects.get(pk="P005").sku, "SKU-5")
+
+    def test_bloquea_en_orden_de_pk(self):
+        with CaptureQueriesContext(connection) as ctx:
+            import_rows([{"sku": "SKU-4", "price": "1"}, {"sku": "SKU-1", "price": "2"}])
+        locking = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("SELECT") and '"api_product"."sku" IN' in q["sql"]]
+        self.assertTrue(locking[-1].endswith('ORDER BY "api_product"."id" ASC'), locking[-1])
+        self.assertIn('"api_product"."id" IN', locking[-1])
+
+    def test_fila_sin_stock_no_escribe_stock(self):
+        with CaptureQueriesContext(connection) as ctx:
+            import_rows([{"sku": "SKU-1", "name": "Renombrado"}, {"sku": "SKU-2", "stock": "7"}])
+        updates = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 2)
+        renamed = next(sql for sql in updates if "Renombrado" in sql)
+        self.assertNotIn('"stock"', renamed)
+        self.assertEqual(Product.objects.get(pk="P001").stock, 10)
+        self.assertFalse(StockMovement.objects.filter(product_id="P001", kind="adjust").exists())
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        make_catalog()
+        Product.objects.filter(pk="P002").update(name="Ramo de rosas")
+
+    def search(self, term):
+        request = APIRequestFactory().get("/api/products/", {"search": term})
+        return ProductSearchFilter().filter_queryset(Request(request), Product.objects.all(), None)
+
+    def test_boolean_query(self):
+        self.assertEqual(boolean_query("ramo ros"), "+ramo* +ros*")
+        self.assertEqual(boolean_query('+ramo -"rosas"* (ros)~ @3'), None)   # "3" es corta
+        self.assertEqual(boolean_query('+ramo -"rosas"* <ros>'), "+ramo* +rosas* +ros*")
+        self.assertIsNone(boolean_query("ro"))
+        self.assertIsNone(boolean_query("ramo de rosas"))
+        self.assertIsNone(boolean_query("+-*"))
+
+    def test_terminos_cortos_van_por_like(self):
+        with mock.patch("api.search.fulltext_available", return_value=True):
+            self.assertIn("MATCH(", str(self.search("ramo rosas").query))
+            qs = self.search("de ro")
+            self.assertNotIn("MATCH(", str(qs.query))
+            self.assertEqual([p.pk for p in qs], ["P002"])
+            self.assertEqual([p.pk for p in self.search("sku-3")], ["P003"])   # SKU exacto
+
+    def test_like_por_palabra_en_cualquier_orden(self):
+        with mock.patch("api.search.fulltext_available", return_value=False):
+            for term in ("rosas ramo", "ramo ro", "ramo de rosas", "rosas de ramo", "sku-2 rosas"):
+                self.assertEqual([p.pk for p in self.search(term)], ["P002"], term)
+            self.assertEqual([p.pk for p in self.search("ramo lirios")], [])
+
+
+class CatalogCacheTests(APITestCase):
+    def setUp(self):
+        make_catalog()
+        caches["catalog"].clear()
+
+    def test_etag_304_y_cambio_de_producto(self):
+        first = self.client.get("/api/products/")
+        self.assertEqual(first.status_code, 200)
+        etag = first["ETag"]
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/api/products/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.assertEqual(self.client.get("/api/products/").content, first.content)
+
+        product = Product.objects.get(pk="P001")
+        product.price = 1234
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        r = self.client.get("/api/products/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r["ETag"], etag)
+        self.assertEqual(r.json()[0]["price"], 1234)
+        self.assertEqual(self.client.get("/api/products/", HTTP_IF_NONE_MATCH=r["ETag"]).status_code, 304)
+
+    def test_etag_depende_de_la_url(self):
+        etag = self.client.get("/api/categories/")["ETag"]
+        self.assertEqual(self.client.get("/api/products/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class CatalogPagingTests(APITestCase):
+    def setUp(self):
+        self.products = make_catalog()
+        other = Category.objects.create(name="Maceteros")
+        Product.objects.filter(pk="P004").update(category=other, stock=0)
+        caches["catalog"].clear()
+
+    def test_filtros_y_paginas(self):
+        r = self.client.get("/api/products/?limit=2&offset=1").json()
+        self.assertEqual((r["count"], [p["id"] for p in r["results"]]), (4, ["P002", "P003"]))
+        self.assertIn("offset=3", r["next"])
+        r = self.client.get("/api/products/?in_stock=1&category_id={}".format(self.products[0].category_id))
+        self.assertEqual([p["id"] for p in r.json()], ["P001", "P002", "P003"])
+        self.assertEqual(len(self.client.get("/api/products/").json()), 4)   # sin limit: lista completa
+        self.assertEqual(self.client.get("/api/products/?category_id=x").status_code, 400)
+
+    @override_settings(CATALOG_PAGE_SIZE=2)
+    def test_bootstrap_en_un_request(self):
+        r = self.client.get("/api/catalog/?in_stock=1")
+        self.assertEqual(r.status_code, 200)
+        data = r.json()
+        self.assertEqual([(c["name"], c["count"]) for c in data["categories"]], [("Maceteros", 0), ("Ramos", 3)])
+        self.assertEqual((data["products"]["count"], len(data["products"]["results"])), (3, 2))
+
+
+class OrderCursorTests(APITestCase):
+    def setUp(self):
+        make_catalog()
+        seller = User.objects.create_user("vendedor")
+        seller.groups.add(Group.objects.create(name="vendedor"))
+        self.client.force_authenticate(seller)
+
+    def test_next_recorre_todo_sin_repetir_con_fechas_empatadas(self):
+        orders = [checkout(("P001", 1)) for _ in range(7)]
+        now = timezone.now().replace(microsecond=0)
+        # tres órdenes en el mismo instante, dos en otro y dos sueltas
+        stamps = [now, now, now, now - timedelta(minutes=1), now - timedelta(minutes=1),
+                  now - timedelta(hours=1), now + timedelta(hours=1)]
+        for order, ts in zip(orders, stamps):
+            Order.objects.filter(pk=order.pk).update(created_at=ts)
+        expected = list(Order.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+
+        seen, url, pages = [], "/api/orders/list/?limit=2", 0
+        while url:
+            page = self.client.get(url).json()
+            self.assertLessEqual(len(page["results"]), 2)
+            seen += [o["id"] for o in page["results"]]
+            url, pages = page["next"], pages + 1
+        self.assertEqual(seen, expected)
+        self.assertEqual(pages, 4)
+        self.assertEqual(self.client.get("/api/orders/list/?cursor=xx").status_code, 404)
+
+
+class IdempotentCheckoutTests(APITestCase):
+    def setUp(self):
+        make_catalog()
+        seller = User.objects.create_user("vendedor")
+        seller.groups.add(Group.objects.create(name="vendedor"))
+        self.client.force_authenticate(seller)
+        self.payload = {
+            "customer": {"full_name": "Cliente", "phone": "+56 9 1234 5678"},
+            "delivery": {"mode": "retiro"},
+            "payment_method": "efectivo",
+            "items": [{"product_id": "P001", "quantity": 2}],
+        }
+
+    def post(self, key, payload=None):
+        return self.client.post("/api/orders/", payload or self.payload, format="json", HTTP_IDEMPOTENCY_KEY=key)
+
+    @override_settings(IDEMPOTENCY_LOCK_SECONDS=0.3)
+    def test_marca_en_curso_no_vence_en_un_checkout_lento(self):
+        key = f"idem:/api/orders/:{User.objects.get().pk}:{hashlib.sha1(b'lento').hexdigest()}"
+        create = OrderCreateSerializer.create
+        seen = []
+
+        def slow_create(serializer, validated):
+            time.sleep(1)   # p. ej. esperando bloqueos de fila, más que IDEMPOTENCY_LOCK_SECONDS
+            seen.append(cache.get(key))
+            return create(serializer, validated)
+
+        with mock.patch.object(OrderCreateSerializer, "create", slow_create):
+            self.assertEqual(self.post("lento").status_code, 201)
+        self.assertEqual(seen[0][0], "pending")   # un reintento aquí habría esperado, no creado otra orden
+        self.assertEqual(cache.get(key)[0], "done")
+
+    def test_reintento_devuelve_la_misma_orden_sin_tocar_stock(self):
+        first = self.post("k1")
+        self.assertEqual(first.status_code, 201)
+        with CaptureQueriesContext(connection) as ctx:
+            again = self.post("k1")
+        self.assertEqual((again.status_code, again.json()), (201, first.json()))
+        self.assertEqual(again["Idempotent-Replayed"], "true")
+        self.assertEqual(len(ctx), 0)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(Product.objects.get(pk="P001").stock, 8)
+
+        other = dict(self.payload, items=[{"product_id": "P002", "quantity": 1}])
+        self.assertEqual(self.post("k1", other).status_code, 422)
+        self.assertEqual(self.post("k2", other).status_code, 201)
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=0.2)
+    def test_duplicado_en_curso_espera_y_error_libera_la_clave(self):
+        key = "idem:/api/orders/:{}:{}".format(
+            User.objects.get().pk, hashlib.sha1(b"k1").hexdigest(),
+        )
+        body = json.dumps(self.payload, sort_keys=True)
+        cache.set(key, ("pending", hashlib.sha256(body.encode()).hexdigest()))
+        self.assertEqual(self.post("k1").status_code, 409)
+        cache.delete(key)
+
+        # add que falla sin dejar nada guardado (caché caída, clave que expira justo): no gira sin fin
+        with mock.patch.object(type(caches["default"]), "add", return_value=False):
+            self.assertEqual(self.post("k2").status_code, 409)
+        self.assertFalse(Order.objects.exists())
+
+        bad = dict(self.payload, items=[{"product_id": "P001", "quantity": 99}])
+        self.assertEqual(self.post("k3", bad).status_code, 400)
+        self.assertEqual(self.post("k3").status_code, 201)
+
+
+class LiveEventsTests(TestCase):
+    def setUp(self):
+        make_catalog()
+        self.start = events.broker().head()
+
+    @override_settings(EVENTS_WSGI_STREAM_SECONDS=0.2)
+    def test_checkout_y_edicion_se_publican_y_se_retoman(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            checkout(("P001", 2))
+        product = Product.objects.get(pk="P002")
+        product.price = 2500
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        sent, reset = events.broker().since(self.start)
+        self.assertFalse(reset)
+        self.assertEqual(
+            [(e.type, e.data) for e in sent],
+            [("stock", {"id": "P001", "stock": 8}), ("price", {"id": "P002", "price": 2500})],
+        )
+
+        r = self.client.get("/api/events/", HTTP_LAST_EVENT_ID=str(self.start))
+        self.assertEqual(r["Content-Type"], "text/event-stream")
+        body = b"".join(r.streaming_content).decode()   # stream corto (EVENTS_WSGI_STREAM_SECONDS)
+        self.assertIn(f"id: {sent[-1].id}\nevent: price\n", body)
+        self.assertEqual(events.broker().since(0), ([], True))  # id fuera del buffer -> reset
+
+    def test_broker_en_cache_no_resetea_por_un_publish_en_vuelo(self):
+        b = events.CacheBroker(alias="default", size=100)
+        start = b.publish("stock", {"id": "P001", "stock": 1})
+        b.cache.incr(b.HEAD)   # otro publish: incr hecho, set pendiente
+        self.assertEqual(b.since(start), ([], False))
+        b.publish("stock", {"id": "P002", "stock": 2})   # queda detrás del hueco
+        self.assertEqual(b.since(start), ([], False))
+        self.assertEqual([e.data["id"] for e in b.since(start - 1)[0]], ["P001"])
+        b.cache.set(f"events:{start + 1}", ("stock", {"id": "P003", "stock": 3}, 0), None)
+        self.assertEqual([e.id for e in b.since(start)[0]], [start + 1, start + 2])
+        # hueco con eventos viejos detrás: expiró
+        b.cache.delete(f"events:{start + 1}")
+        with mock.patch("api.events.time.time", return_value=time.time() + b.IN_FLIGHT_SECONDS):
+            self.assertEqual(b.since(start), ([], True))
+
+    @override_settings(
+        CACHES={**settings.CACHES, "events": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://127.0.0.1:1/0",
+        }},
+        EVENTS_BACKEND="api.events.CacheBroker",
+        EVENTS_CACHE_ALIAS="events",
+    )
+    def test_broker_en_cache_caida_falla_al_arrancar(self):
+        errors = events.check_broker()
+        self.assertEqual([e.id for e in errors], ["api.E001"])
+        self.assertIn("'events' no responde", errors[0].msg)
+        with override_settings(EVENTS_BACKEND="api.events.LocalBroker"):
+            self.assertEqual(events.check_broker(), [])
+
+    @override_settings(EVENTS_WSGI_MAX_STREAMS=1, EVENTS_WSGI_STREAM_SECONDS=0, EVENTS_BUSY_RETRY_MS=20000)
+    def test_wsgi_limita_streams_por_proceso(self):
+        first = self.client.get("/api/events/")
+        busy = self.client.get("/api/events/")
+        self.assertEqual(b"".join(busy.streaming_content), b"retry: 20000\n\n")
+        # corte inmediato; al terminar el stream se cierra la respuesta y se libera el cupo
+        self.assertEqual(b"".join(first.streaming_content), b"retry: 3000\n\n")
+        again = self.client.get("/api/events/")
+        self.assertEqual(b"".join(again.streaming_content), b"retry: 3000\n\n")
+
+
+class StatsTests(APITestCase):
+    def setUp(self):
+        make_catalog()
+        seller = User.objects.create_user("vendedor")
+        seller.groups.add(Group.objects.create(name="vendedor"))
+        self.client.force_authenticate(seller)
+
+    def test_kpis_desde_el_rollup_y_rebuild(self):
+        checkout(("P001", 2), ("P002", 1))
+        checkout(("P003", 1))
+        yesterday = checkout(("P004", 1))
+        Order.objects.filter(pk=yesterday.pk).update(created_at=timezone.now() - timedelta(days=1))
+        DailySales.objects.all().delete()
+        call_command("rebuild_daily_sales", stdout=io.StringIO())   # la orden de ayer queda en su día
+        Product.objects.filter(pk="P004").update(stock=2)
+
+        data = self.client.get("/api/stats/").json()
+        self.assertEqual(
+            {k: data["today"][k] for k in ("total", "orders", "avg_ticket")},
+            {"total": 7000, "orders": 2, "avg_ticket": 3500},
+        )
+        self.assertEqual(len(data["last7"]), 7)
+        self.assertEqual([(d["total"], d["orders"]) for d in data["last7"][-2:]], [(4000, 1), (7000, 2)])
+        self.assertEqual(sum(d["orders"] for d in data["last7"]), 3)
+        self.assertEqual((data["low_stock"]["count"], [p["id"] for p in data["low_stock"]["items"]]), (1, ["P004"]))
+        self.assertEqual(data["top_products"][0], {"sku": "SKU-4", "name": "Producto 4", "units": 1, "revenue": 4000})
+
+        checkout(("P001", 1))   # el checkout suma al rollup en la misma transacción
+        self.assertEqual(self.client.get("/api/stats/").json()["today"]["total"], 8000)
+
+    def test_rebuild_reescribe_en_su_lugar_y_no_cuenta_dos_veces(self):
+        order = checkout(("P001", 2))
+        row = DailySales.objects.get()
+        # la orden tal como la ven las dos lecturas si archive_orders la mueve entre medio
+        ArchivedOrder.objects.create(
+            id=order.pk, code=order.code, created_at=order.created_at, status="paid", total=order.total,
+            payload=ArchivedOrder.pack({"order": {}, "items": []}),
+        )
+        DailySales.objects.filter(pk=row.pk).update(orders=9, total=1)
+        DailySales.objects.create(day=row.day - timedelta(days=3), orders=1, total=5)   # sin órdenes: sobra
+        call_command("rebuild_daily_sales", stdout=io.StringIO())
+        # misma fila (un UPDATE de checkout en espera la sigue encontrando), con la orden una sola vez
+        self.assertEqual(list(DailySales.objects.values_list("pk", "orders", "total")), [(row.pk, 1, 2000)])
+
+
+class ProductSalesRollupTests(APITestCase):
+    def setUp(self):
+        make_catalog()
+        admin = User.objects.create_user("admin")
+        admin.groups.add(Group.objects.create(name="admin"))
+        self.client.force_authenticate(admin)
+
+    def ranking(self, query=""):
+        return [(t["sku"], t["units"], t["revenue"]) for t in self.client.get(f"/api/reports/top-products/{query}").json()["results"]]
+
+    def test_checkout_anulacion_y_rebuild_cuadran(self):
+        checkout(("P001", 2), ("P002", 1), ("P001", 1))
+        cancelled = checkout(("P002", 4), ("P003", 1))
+        checkout(("P003", 5))
+        self.client.post(f"/api/orders/{cancelled.pk}/cancel/")
+        expected = [("SKU-3", 5, 15000), ("SKU-1", 3, 3000), ("SKU-2", 1, 2000)]
+        self.assertEqual(self.ranking(), expected)
+        self.assertEqual(self.ranking("?by=units&limit=1"), [("SKU-3", 5, 15000)])
+
+        call_command("rebuild_product_sales", stdout=io.StringIO())
+        self.assertEqual(self.ranking(), expected)
+        r = self.client.get("/api/reports/top-products/?sku=SKU-1&group=week").json()
+        self.assertEqual([b["units"] for b in r["results"]], [3])
+        self.assertEqual(self.client.get("/api/reports/top-products/?period=siglo").status_code, 400)
+
+    def test_rebuild_en_su_lugar_y_orden_archivada_entre_lecturas(self):
+        order = checkout(("P001", 2))
+        row = ProductSalesDaily.objects.get()
+        # la orden tal como la ven las dos lecturas si archive_orders la mueve entre medio
+        ArchivedOrder.objects.create(
+            id=order.pk, code=order.code, created_at=order.created_at, status="paid", total=order.total,
+            payload=ArchivedOrder.pack({"order": {}, "items": [
+                {"product_sku": "SKU-1", "product_name": "Producto 1", "quantity": 2, "price": 1000},
+            ]}),
+        )
+        ProductSalesDaily.objects.filter(pk=row.pk).update(units=0, revenue=0)
+        day = timezone.localdate()
+        call_command("rebuild_product_sales", date_from=day.isoformat(), date_to=day.isoformat(), stdout=io.StringIO())
+        self.assertEqual(list(ProductSalesDaily.objects.values_list("pk", "units", "revenue")), [(row.pk, 2, 2000)])
+
+
+class AdminQueryTests(TestCase):
+    def setUp(self):
+        make_catalog()
+        Product.objects.update(stock=100)
+        self.client.force_login(User.objects.create_superuser("root", password="x"))
+
+    def queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(ctx)
+
+    def test_consultas_constantes_por_pagina(self):
+        small = checkout(("P001", 1))
+        urls = [
+            "/admin/api/order/", "/admin/api/order/?status__exact=paid", "/admin/api/stockmovement/",
+            "/admin/api/product/", f"/admin/api/order/{small.pk}/change/",
+        ]
+        [self.queries(u) for u in urls]   # calienta la caché de ContentType
+        before = [self.queries(u) for u in urls]
+        for _ in range(15):
+            big = checkout(("P001", 1), ("P002", 1), ("P003", 1), ("P004", 1))
+        urls[-1] = f"/admin/api/order/{big.pk}/change/"
+        self.assertEqual([self.queries(u) for u in urls], before)
+
+    def test_filtro_de_categoria_no_carga_las_categorias(self):
+        url = "/admin/api/product/"
+        self.queries(url)
+        before = self.queries(url)
+        Category.objects.bulk_create([Category(name=f"Categoría {n}") for n in range(200)])
+        self.assertEqual(self.queries(url), before)
+        response = self.client.get(url)
+        self.assertNotContains(response, "Categoría 199")
+        self.assertContains(response, 'name="category__id__exact"')
+        filtered = self.client.get(f"{url}?category__id__exact={Category.objects.get(name='Ramos').pk}")
+        self.assertEqual(len(filtered.context["cl"].result_list), 4)
+        self.assertEqual(self.client.get(f"{url}?category__id__exact=x").status_code, 302)
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=2)
+    def test_paginas_despues_del_conteo_acotado(self):
+        paginator = EstimatedCountPaginator(Product.objects.order_by("pk"), 1)
+        self.assertEqual((paginator.count, paginator.exact), (2, False))
+        self.assertEqual([p.pk for p in paginator.page(4)], ["P004"])
+        with self.assertRaises(EmptyPage):
+            paginator.page(5)
+        with mock.patch.object(ProductAdmin, "list_per_page", 1):
+            response = self.client.get("/admin/api/product/?category__id__exact=1&p=4")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p.pk for p in response.context["cl"].result_list], ["P001"])   # orden -pk
+
+
+class BenchSmokeTests(TransactionTestCase):
+    def test_bench_api_con_dataset_minimo(self):
+        make_catalog()
+        checkout(("P001", 2))   # una venta real del día: tiene que sobrevivir a la limpieza
+        namesake = Order.objects.create(   # orden real con el mismo nombre que usa el bench
+            full_name="Cliente Bench", phone="+56 9 0000 0000", delivery_mode="retiro", payment_method="efectivo",
+            status="cancelled",   # fuera de los rollups
+        )
+        sales = list(DailySales.objects.values_list("day", "orders", "total"))
+        product_sales = list(ProductSalesDaily.objects.values_list("day", "product_sku", "units", "revenue"))
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        output = f"{tmp}/results.json"
+        call_command(
+            "bench_api", products=60, orders=5, requests=1, concurrency=1, concurrent_requests=2,
+            in_place=True, baseline=f"{tmp}/sin-baseline.json", output=output,
+            stdout=io.StringIO(), stderr=io.StringIO(),
+        )
+        with open(output) as fh:
+            results = json.load(fh)
+        self.assertEqual({name: r["errors"] for name, r in results.items() if r["errors"]}, {})
+        self.assertIn("orders_create", results)
+        self.assertTrue(Order.objects.filter(pk=namesake.pk).exists())
+        self.assertEqual(Order.objects.count(), 2)   # las del checkout del bench se borraron
+        # la limpieza también borra el ledger de los productos sembrados
+        self.assertFalse(Product.objects.filter(pk__startswith="bench-").exists())
+        self.assertFalse(StockMovement.objects.filter(product_sku__contains="-0000").exists())
+        # los rollups del día vuelven a contar solo la venta real
+        self.assertEqual(list(DailySales.objects.values_list("day", "orders", "total")), sales)
+        self.assertEqual(
+            list(ProductSalesDaily.objects.values_list("day", "product_sku", "units", "revenue")), product_sales,
+        )
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    """Checkouts en paralelo contra el mismo SKU: sin sobreventa y sin deadlocks."""
+
+    def test_sku_caliente(self):
+        make_catalog()
+        Product.objects.filter(pk="P001").update(stock=5)
+        results, errors = [], []
+
+        def worker(n):
+            # la mitad de los carritos trae los productos en orden inverso
+            lines = [("P002", 1), ("P001", 1)] if n % 2 else [("P001", 1), ("P002", 1)]
+            try:
+                checkout(*lines)
+                results.append(n)
+            except serializers.ValidationError:
+                pass
+            except Exception as e:  # deadlock / lock wait timeout
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(12)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(results), 5)
+        self.assertEqual(Product.objects.get(pk="P001").stock, 0)
+        self.assertEqual(Product.objects.get(pk="P002").stock, 5)
+        self.assertEqual(Order.objects.count(), 5)
+        self.assertEqual(ledger_balances(["P002"]), {"P002": 5})
+
+
+    @skipIf(connection.vendor != "mysql", "los bloqueos S de las FK y el deadlock 1213 son de InnoDB")
+    def test_carritos_opuestos_sin_deadlock_en_innodb(self):
+        make_catalog()
+        Product.objects.update(stock=1000)
+        barrier, errors = threading.Barrier(2), []
+
+        def worker(lines):
+            try:
+                for _ in range(25):
+                    barrier.wait()
+                    checkout(*lines)
+            except Exception as e:
+                errors.append(e)
+                barrier.abort()
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=worker, args=([("P001", 1), ("P002", 1), ("P003", 1)],)),
+            threading.Thread(target=worker, args=([("P003", 1), ("P002", 1), ("P001", 1)],)),
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Order.objects.count(), 50)
+        self.assertEqual(
+            dict(Product.objects.filter(pk__in=["P001", "P002", "P003"]).values_list("pk", "stock")),
+            {"P001": 950, "P002": 950, "P003": 950},
+        )
+
+
+class GroupCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("vendedora", password="x")
+        self.vendedor = Group.objects.create(name="vendedor")
+        self.user.groups.add(self.vendedor)
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_me_y_permisos_sin_consultar_grupos(self):
+        self.client.get("/api/me/")  # calienta la caché
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get("/api/me/").json()["role"], "vendedor")
+            self.assertEqual(self.client.get("/api/orders/list/").status_code, 200)
+        self.assertFalse([q for q in ctx.captured_queries if "auth_group" in q["sql"]])
+
+    def test_cambio_de_membresia_invalida(self):
+        self.assertEqual(self.client.get("/api/orders/list/").status_code, 200)
+        self.user.groups.remove(self.vendedor)
+        self.assertEqual(self.client.get("/api/orders/list/").status_code, 403)
+        self.vendedor.user_set.add(self.user)
+        self.assertEqual(self.client.get("/api/orders/list/").status_code, 200)
+        self.vendedor.user_set.clear()
+        self.assertEqual(self.client.get("/api/me/").json()["groups"], [])
+
+    @override_settings(
+        CACHES={**settings.CACHES, "groups": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "groups"}},
+        GROUPS_CACHE_ALIAS="groups",
+    )
+    def test_invalida_tambien_despues_del_commit(self):
+        groups = caches["groups"]
+        self.assertEqual(self.client.get("/api/me/").json()["groups"], ["vendedor"])
+        self.assertEqual(groups.get(f"user-groups:{self.user.pk}"), ("vendedor",))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.remove(self.vendedor)
+            # otro worker lee la membresía todavía sin commit y la vuelve a cachear
+            groups.set(f"user-groups:{self.user.pk}", ("vendedor",))
+        self.assertIsNone(groups.get(f"user-groups:{self.user.pk}"))
+        self.assertEqual(self.client.get("/api/orders/list/").status_code, 403)
+
+
+@override_settings(REPLICA_READS=True)
+@skipIf(
+    "replica" not in settings.DATABASES or settings.DATABASES["replica"]["TEST"]["MIRROR"],
+    "requiere la réplica como segunda BD (SQLite)",
+)
+class ReplicaRoutingTests(APITestCase):
+    """La réplica es otra BD: lo que no se copia a mano simula el atraso de la replicación."""
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        cache.clear()
+        caches["catalog"].clear()
+        make_catalog()
+        Category.objects.using("replica").create(name="Solo en réplica")
+        vendedor = Group.objects.create(name="vendedor")
+        self.user = User.objects.create_user("v1")
+        self.other = User.objects.create_user("v2")
+        vendedor.user_set.add(self.user, self.other)
+
+    def test_catalogo_lee_de_la_replica_salvo_recien_cambiado(self):
+        names = lambda: [c["name"] for c in self.client.get("/api/categories/").json()]
+        self.assertEqual(names(), ["Solo en réplica"])
+        catalog_cache.bump_version()
+        self.assertEqual(names(), ["Ramos"])
+
+    def test_quien_escribe_lee_de_la_primaria(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get("/api/orders/list/").json(), [])
+        r = self.client.post("/api/orders/", {
+            "customer": {"full_name": "Cliente", "phone": "123"},
+            "delivery": {"mode": "retiro"},
+            "payment_method": "efectivo",
+            "items": [{"product_id": "P001", "quantity": 1}],
+        }, format="json")
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(len(self.client.get("/api/orders/list/").json()), 1)
+
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.get("/api/orders/list/").json(), [])
+
+    @override_settings(
+        CACHES={**settings.CACHES, "pins": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "pins"}},
+        REPLICA_PIN_CACHE_ALIAS="pins",
+    )
+    def test_pin_en_la_cache_configurada(self):
+        self.client.force_authenticate(self.user)
+        r = self.client.post("/api/orders/", {
+            "customer": {"full_name": "Cliente", "phone": "123"},
+            "delivery": {"mode": "retiro"},
+            "payment_method": "efectivo",
+            "items": [{"product_id": "P001", "quantity": 1}],
+        }, format="json")
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(caches["pins"].get(f"db-pin:{self.user.pk}"), 1)
+        self.assertIsNone(cache.get(f"db-pin:{self.user.pk}"))
+        self.assertEqual(len(self.client.get("/api/orders/list/").json()), 1)
+        caches["pins"].clear()
+        self.assertEqual(self.client.get("/api/orders/list/").json(), [])
+
+
+def png(color):
+    buf = io.BytesIO()
+    Image.new("RGB", (16, 16), color).save(buf, "PNG")
+    return SimpleUploadedFile("foto.png", buf.getvalue(), content_type="image/png")
+
+
+class MediaStorageTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=media, MEDIA_GC_GRACE_SECONDS=0, IMAGE_VARIANTS_ASYNC=False)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.a, self.b = make_catalog()[:2]
+
+    def set_image(self, product, upload):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.get(pk=product.pk)
+            product.image = upload
+            product.save()
+        return Product.objects.get(pk=product.pk)
+
+    def test_misma_foto_un_archivo_y_se_recolecta_al_quedar_huerfana(self):
+        a = self.set_image(self.a, png("red"))
+        b = self.set_image(self.b, png("red"))
+        self.assertEqual(a.image.name, b.image.name)
+        self.assertRegex(a.image.name, r"^products/[0-9a-f]{64}\.png$")
+        shared, variants = a.image.name, variant_files(a.image_variants)
+        self.assertTrue(variants)
+
+        self.set_image(a, png("blue"))   # b todavía la usa
+        self.assertTrue(default_storage.exists(shared))
+        with self.captureOnCommitCallbacks(execute=True):
+            b.delete()
+        self.assertFalse(default_storage.exists(shared))
+        self.assertFalse([v for v in variants if default_storage.exists(v)])
+
+    def test_variantes_por_ancho_srcset_y_backfill(self):
+        buf = io.BytesIO()
+        Image.new("RGB", (500, 250), "green").save(buf, "PNG")
+        product = self.set_image(self.a, SimpleUploadedFile("grande.png", buf.getvalue(), content_type="image/png"))
+        variants = product.image_variants
+        self.assertEqual(variants["src"], product.image.name)
+        self.assertEqual(sorted(variants["webp"], key=int), ["200", "400"])   # 800 no: más ancho que el original
+        with default_storage.open(variants["jpeg"]["400"]) as fh:
+            self.assertEqual(Image.open(fh).size, (400, 200))
+        with default_storage.open(variants["webp"]["200"]) as fh:
+            self.assertEqual(Image.open(fh).format, "WEBP")
+
+        srcset = ProductSerializer(product).data["image_srcset"]
+        for fmt in ("webp", "jpeg"):
+            urls = [default_storage.url(variants[fmt][w]) for w in ("200", "400")]
+            self.assertEqual(srcset[fmt], f"{urls[0]} 200w, {urls[1]} 400w")
+
+        Product.objects.filter(pk=product.pk).update(image_variants={})
+        call_command("build_image_variants", stdout=io.StringIO())
+        self.assertEqual(Product.objects.get(pk=product.pk).image_variants, variants)
+
+    def test_media_view_immutable_etag_y_range(self):
+        name = self.set_image(self.a, png("red")).image.name
+        url = f"/media/{name}"
+        r = self.client.get(url)
+        self.assertEqual(r["Cache-Control"], "public, max-age=31536000, immutable")
+        body = b"".join(r.streaming_content)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=r["ETag"]).status_code, 304)
+        r = self.client.get(url, HTTP_RANGE="bytes=1-4")
+        self.assertEqual(r.status_code, 206)
+        self.assertEqual(b"".join(r.streaming_content), body[1:5])
+        self.assertEqual(self.client.get(url, HTTP_RANGE=f"bytes={len(body)}-").status_code, 416)
+
+
+class ArchiveTests(APITestCase):
+    def setUp(self):
+        make_catalog()
+        admin = User.objects.create_user("admin")
+        admin.groups.add(Group.objects.create(name="admin"))
+        self.client.force_authenticate(admin)
+
+    def test_archivadas_se_leen_en_detalle_y_exportacion(self):
+        old = checkout(("P001", 2), ("P002", 1))
+        recent = checkout(("P003", 1))
+        Order.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=400))
+        before = self.client.get(f"/api/orders/{old.pk}/").json()
+
+        call_command("archive_orders", older_than_days=365, batch_size=1, stdout=io.StringIO())
+        self.assertEqual(list(Order.objects.values_list("pk", flat=True)), [recent.pk])
+        self.assertFalse(OrderItem.objects.filter(order_id=old.pk).exists())
+
+        after = self.client.get(f"/api/orders/{old.pk}/").json()
+        self.assertTrue(after.pop("archived"))
+        self.assertEqual(after, before)
+
+        r = self.client.get("/api/orders/export/?fmt=ndjson&kind=lines")
+        codes = [json.loads(line)["order_code"] for line in b"".join(r.streaming_content).decode().splitlines()]
+        self.assertEqual(codes, [old.code, old.code, recent.code])
+
+
+class OrderExportTests(APITestCase):
+    def setUp(self):
+        make_catalog()
+        admin = User.objects.create_user("admin")
+        admin.groups.add(Group.objects.create(name="admin"))
+        self.client.force_authenticate(admin)
+        Product.objects.update(stock=100)
+        self.orders = [checkout(("P001", 1), ("P002", n)) for n in range(1, 6)]
+        Order.objects.filter(pk=self.orders[1].pk).update(status="cancelled")
+        Order.objects.filter(pk=self.orders[0].pk).update(created_at=timezone.now() - timedelta(days=10))
+
+    def test_bloques_por_keyset(self):
+        with CaptureQueriesContext(connection) as ctx:
+            rows = list(export.iter_orders(Order.objects.all(), chunk_size=2))
+        self.assertEqual([o["id"] for o, _ in rows], [o.pk for o in self.orders])
+        self.assertEqual([len(lines) for _, lines in rows], [2] * 5)
+        self.assertEqual(len(ctx), 3 * 2 + 1)   # órdenes + ítems por bloque, y el bloque vacío final
+        self.assertIn('"api_order"."id" >', ctx.captured_queries[2]["sql"])
+
+    def test_csv_de_ordenes_y_lineas_con_filtros(self):
+        r = self.client.get("/api/orders/export/?status=paid")
+        self.assertEqual(r["Content-Type"], "text/csv; charset=utf-8")
+        self.assertEqual(r["Content-Disposition"], 'attachment; filename="orders.csv"')
+        rows = list(csv.DictReader(io.StringIO(b"".join(r.streaming_content).decode())))
+        self.assertEqual([row["code"] for row in rows], [o.code for o in self.orders if o != self.orders[1]])
+        self.assertEqual(rows[-1]["total"], str(1000 + 5 * 2000))
+        self.assertEqual(rows[-1]["items"], "2")
+
+        day = timezone.localdate().isoformat()
+        r = self.client.get(f"/api/orders/export/?kind=lines&from={day}&to={day}")
+        rows = list(csv.reader(io.StringIO(b"".join(r.streaming_content).decode())))
+        self.assertEqual(rows[0], ["order_code", "created_at", "status", "product_sku", "product_name",
+                                   "quantity", "price", "line_total"])
+        self.assertEqual(len(rows), 1 + 4 * 2)
+        self.assertEqual((rows[1][0], rows[1][2]), (self.orders[1].code, "cancelled"))   # la de hace 10 días no
+        self.assertEqual(rows[-1][3:], ["SKU-2", "Producto 2", "5", "2000", "10000"])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = f"{tmp}/lines.csv"
+            call_command("export_orders", kind="lines", date_from=day, chunk_size=2, output=path)
+            with open(path, newline="", encoding="utf-8") as fh:
+                self.assertEqual(list(csv.reader(fh)), rows)
+        self.assertEqual(self.client.get("/api/orders/export/?from=ayer").status_code, 400)
+
+
+class StatelessAuthTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("bodega", password="clave-123")
+        self.user.groups.add(Group.objects.create(name="bodeguero"))
+        r = self.client.post("/api/token/", {"username": "bodega", "password": "clave-123"})
+        self.tokens = r.json()
+
+    def authenticate(self, access):
+        request = APIRequestFactory().get("/api/products/", HTTP_AUTHORIZATION=f"Bearer {access}")
+        return StatelessJWTAuthentication().authenticate(request)
+
+    def test_usuario_desde_claims_sin_consultas(self):
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate(self.tokens["access"])
+        self.assertIsInstance(user, ClaimsUser)
+        self.assertEqual((user.pk, user.username), (self.user.pk, "bodega"))
+        self.assertEqual(user._group_names, ("bodeguero",))
+
+    def test_cambio_de_grupos_revoca_y_refresh_trae_claims_nuevos(self):
+        self.user.groups.add(Group.objects.create(name="vendedor"))
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(self.tokens["access"])
+        r = self.client.post("/api/token/refresh/", {"refresh": self.tokens["refresh"]})
+        user, _ = self.authenticate(r.json()["access"])
+        self.assertEqual(set(user._group_names), {"bodeguero", "vendedor"})
+
+    @override_settings(
+        CACHES={**settings.CACHES, "revocados": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "rev"}},
+        JWT_REVOCATION_CACHE_ALIAS="revocados",
+    )
+    def test_revocacion_en_su_alias(self):
+        cache.clear()   # el setUp ya revocó al agregar "bodeguero"
+        self.user.groups.add(Group.objects.create(name="vendedor"))
+        self.assertIsNotNone(caches["revocados"].get(f"jwt-revoked-before:{self.user.pk}"))
+        self.assertIsNone(cache.get(f"jwt-revoked-before:{self.user.pk}"))
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(self.tokens["access"])
+
+
+class FastReadSerializerTests(TestCase):
+    def setUp(self):
+        make_catalog()
+        Product.objects.filter(pk="P001").update(image="products/foto.jpg")
+        checkout(("P001", 2), ("P003", 1))
+        checkout(("P002", 1))
+        self.request = APIRequestFactory().get("/api/products/")
+
+    def test_productos_igual_que_model_serializer(self):
+        qs = Product.objects.select_related("category").order_by("name")
+        slow = ProductSerializer(qs, many=True, context={"request": self.request}).data
+        fast = product_rows(qs.values(*PRODUCT_LIST_VALUES), self.request)
+        self.assertEqual(fast, [dict(r) for r in slow])
+
+    def test_ordenes_igual_que_model_serializer_y_sin_product(self):
+        qs = Order.objects.order_by("-created_at", "-id")
+        slow = OrderSerializer(qs.prefetch_related("items"), many=True).data
+        with CaptureQueriesContext(connection) as ctx:
+            fast = order_rows(qs.values(*ORDER_LIST_VALUES))
+        self.assertEqual(fast, [dict(r) for r in slow])
+        self.assertEqual(len(ctx), 2)
+
+
+class QueryBudgetTests(APITestCase):
+    """Consultas por request en los endpoints calientes: no deben crecer con los datos."""
+
+    def setUp(self):
+        cache.clear()
+        caches["catalog"].clear()
+        self.products = make_catalog()
+        user = User.objects.create_user("jefa")
+        user.groups.add(Group.objects.create(name="admin"))
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+        self.client.get("/api/me/")  # grupos en caché
+
+    def more_data(self):
+        for n in range(5):
+            checkout(("P001", 1), ("P002", 1), ("P003", 1))
+        Product.objects.bulk_create([
+            Product(id=f"X{n}", sku=f"X-{n}", name=f"Extra {n}", category=self.products[0].category, price=100)
+            for n in range(20)
+        ])
+        caches["catalog"].clear()
+
+    def test_listado_de_productos(self):
+        with self.assertNumQueries(2):  # usuario + productos
+            self.assertEqual(self.client.get("/api/products/").status_code, 200)
+        self.more_data()
+        with self.assertNumQueries(2):
+            self.assertEqual(len(self.client.get("/api/products/").json()), 24)
+
+    def test_listado_de_ordenes_paginado(self):
+        checkout(("P001", 1))
+        with self.assertNumQueries(3):  # usuario + órdenes + ítems
+            self.assertEqual(self.client.get("/api/orders/list/?limit=50").status_code, 200)
+        self.more_data()
+        with self.assertNumQueries(3):
+            self.assertEqual(len(self.client.get("/api/orders/list/?limit=50").json()["results"]), 6)
+
+    def test_detalle_de_orden(self):
+        order = checkout(("P001", 1), ("P002", 2), ("P003", 1), ("P004", 1))
+        with self.assertNumQueries(3):  # usuario + orden + ítems
+            self.assertEqual(self.client.get(f"/api/orders/{order.pk}/").status_code, 200)
+
+
+class SharedStateTests(TestCase):
+    def test_locmem_y_broker_local_son_por_proceso(self):
+        self.assertEqual(len(process_local_stores()), 6)
+
+    @override_settings(
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://redis:6379/0"},
+            "catalog": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://redis:6379/2"},
+        },
+        EVENTS_BACKEND="api.events.CacheBroker",
+    )
+    def test_compartido(self):
+        self.assertEqual(process_local_stores(), [])
+
+    @override_settings(
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": "/tmp/x"},
+            "catalog": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": "/tmp/y"},
+        },
+        EVENTS_BACKEND="api.events.CacheBroker",
+        EVENTS_CACHE_ALIAS="default",
+    )
+    def test_file_no_sirve_para_locks_ni_contadores(self):
+        self.assertEqual(process_local_stores(), [
+            "caché y versión del catálogo (api/catalog_cache.py)",
+            "Idempotency-Key (api/idempotency.py)",
+            "broker de /api/events/ (api/events.py)",
+        ])
+
+
+def use_async_urls(enabled):
+    """Las urls eligen las vistas al importarse: se recargan con ASYNC_READ_VIEWS=enabled."""
+    from proyecto import urls as root_urls
+    with override_settings(ASYNC_READ_VIEWS=enabled):
+        importlib.reload(api_urls)
+        importlib.reload(root_urls)
+    clear_url_caches()
+
+
+@override_settings(ASYNC_READ_VIEWS=True)
+class AsyncReadViewsTests(TestCase):
+    def setUp(self):
+        caches["catalog"].clear()
+        make_catalog()
+        use_async_urls(True)
+        self.addCleanup(use_async_urls, settings.ASYNC_READ_VIEWS)
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+        self.async_client = AsyncClient()
+
+    async def test_listado_y_detalle_por_el_orm_async(self):
+        self.assertIs(resolve("/api/products/").func, async_views.product_list)
+        response = await self.async_client.get("/api/products/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p["id"] for p in response.json()], ["P001", "P002", "P003", "P004"])
+        self.assertEqual((await self.async_client.get("/api/categories/")).json()[0]["name"], "Ramos")
+        self.assertEqual((await self.async_client.get("/api/orders/999/")).status_code, 401)
+
+    async def test_metricas_en_el_middleware_async(self):
+        await self.async_client.get("/api/products/")
+        await self.async_client.get("/api/products/")   # desde la caché del catálogo
+        histogram = metrics.registry.queries[("api/products/", "GET")]
+        self.assertEqual(histogram.count, 2)
+        self.assertGreaterEqual(histogram.sum, 1)
+        self.assertEqual(metrics.registry.requests[("api/products/", "GET", "200")], 2)
+
+
+class MetricsTests(APITestCase):
+    def setUp(self):
+        make_catalog()
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+
+    def test_sin_token_solo_en_debug(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get("/metrics").status_code, 200)
+        with override_settings(METRICS_TOKEN="s3cret"):
+            self.assertEqual(self.client.get("/metrics").status_code, 403)
+            self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer otro").status_code, 403)
+            response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("# TYPE api_requests_total counter", response.content.decode())
+
+    def test_checkout_dentro_de_su_presupuesto(self):
+        seller = User.objects.create_user("vendedor")
+        seller.groups.add(Group.objects.create(name="vendedor"))
+        self.client.force_authenticate(seller)
+        with self.assertNoLogs("api.metrics", "WARNING"):
+            response = self.client.post("/api/orders/", {
+                "customer": {"full_name": "Cliente", "phone": "+56 9 1234 5678"},
+                "delivery": {"mode": "retiro"},
+                "payment_method": "efectivo",
+                "items": [{"product_id": "P001", "quantity": 1}, {"product_id": "P002", "quantity": 1}],
+            }, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(metrics.registry.requests[("api/orders/", "POST", "201")], 1)
+        queries = metrics.registry.queries[("api/orders/", "POST")]
+        self.assertLessEqual(queries.sum, settings.METRICS_QUERY_BUDGETS["api/orders/"])
@@ -1,23 +1,53 @@
+from django.conf import settings
 from django.urls import path
+from .events import events_view
 from .views import (
     MeView,
     CategoryListCreateView, CategoryDetailView,
-    ProductListCreateView, ProductDetailView,
-    OrderCreateView, OrderListView, OrderDetailView,
+    ProductListCreateView, ProductDetailView, ProductImportView, CatalogBootstrapView, StockAdjustView,
+    OrderCreateView, OrderListView, OrderDetailView, OrderCancelView,
+    StatsView, TopProductsView, OrderExportView,
 )
 
+if settings.ASYNC_READ_VIEWS:
+    # modo ASGI: GET por el ORM async, escrituras por las mismas vistas DRF (api/async_views.py)
+    from . import async_views
+    category_list = async_views.category_list
+    product_list = async_views.product_list
+    order_detail = async_views.order_detail
+else:
+    category_list = CategoryListCreateView.as_view()
+    product_list = ProductListCreateView.as_view()
+    order_detail = OrderDetailView.as_view()
+
 urlpatterns = [
     path("me/", MeView.as_view()),
     # Categorías (IDs enteros)
-    path("categories/", CategoryListCreateView.as_view()),
+    path("categories/", category_list),
     path("categories/<int:pk>/", CategoryDetailView.as_view()),
 
+    # Carga inicial de la tienda: categorías con conteos + primera página de productos
+    path("catalog/", CatalogBootstrapView.as_view()),
+
     # Productos (IDs alfanuméricos -> usar <str:pk>)
-    path("products/", ProductListCreateView.as_view()),
+    path("products/", product_list),
+    path("products/import/", ProductImportView.as_view()),   # antes del detalle (<str:pk>)
     path("products/<str:pk>/", ProductDetailView.as_view()),   # <= aquí el cambio
 
+    # Ajuste/conteo de stock en lote
+    path("stock/adjust/", StockAdjustView.as_view()),
+
     # Órdenes (IDs enteros)
     path("orders/", OrderCreateView.as_view()),
     path("orders/list/", OrderListView.as_view()),
-    path("orders/<int:pk>/", OrderDetailView.as_view()),
+    path("orders/export/", OrderExportView.as_view()),
+    path("orders/<int:pk>/", order_detail),
+    path("orders/<int:pk>/cancel/", OrderCancelView.as_view()),
+
+    # Dashboard (rollups)
+    path("stats/", StatsView.as_view()),
+    path("reports/top-products/", TopProductsView.as_view()),
+
+    # Stock/precio en vivo (SSE)
+    path("events/", events_view),
 ]
@@ -1,35 +1,80 @@
-from rest_framework.permissions import AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.permissions import SAFE_METHODS, AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
-from .perms import group_perm
+from .perms import group_perm, user_groups
+from .authentication import full_user
+from .pagination import CatalogPagination, KeysetPagination
+from .catalog_cache import CachedCatalogListMixin
+from .idempotency import IdempotentPostMixin
+from .search import CatalogFilter, ProductSearchFilter
+from . import catalog_cache, export, rollups, routers, stock
+from .catalog_import import import_rows, read_rows
 from rest_framework.views import APIView
-from rest_framework import generics, filters
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework import generics
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.shortcuts import get_object_or_404
+from django.http import Http404, StreamingHttpResponse
 from django.db.models.deletion import ProtectedError
+from django.utils import timezone
+from datetime import timedelta
 
-from .models import Category, Product, Order
+from .models import ArchivedOrder, Category, Product, Order, DailySales
 from .serializers import (
     CategorySerializer,
     ProductSerializer,
     OrderSerializer,
     OrderCreateSerializer,
+    StockAdjustSerializer,
+    PRODUCT_LIST_VALUES, product_rows,
+    ORDER_LIST_VALUES, order_rows, archived_order_row,
 )
 
+# ---------- Listados rápidos ----------
+class ValuesListMixin:
+    """
+    GET de listado desde .values(list_values). Cada vista fija list_rows =
+    staticmethod(fn), con fn(rows, request) -> lista de dicts (ver serializers.py).
+    """
+    list_values = ()
+    list_rows = None
+
+    def list(self, request, *args, **kwargs):
+        qs = self.filter_queryset(self.get_queryset()).values(*self.list_values)
+        page = self.paginate_queryset(qs)
+        if page is not None:
+            return self.get_paginated_response(self.list_rows(page, request))
+        return Response(self.list_rows(qs, request))
+
+class ReplicaReadMixin:
+    """GET desde la réplica de lectura (ver api/routers.py); catalog=True respeta los cambios recientes del catálogo."""
+    replica_catalog = False
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.request.method not in SAFE_METHODS:
+            return qs
+        fresh = self.replica_catalog and catalog_cache.recently_changed()
+        return qs.using(routers.read_db(self.request, fresh=fresh))
+
 # ---------- Usuario ----------
 class MeView(APIView):
     permission_classes = [IsAuthenticated]
     def get(self, request):
-        u = request.user
-        groups = list(u.groups.values_list("name", flat=True))
+        u = full_user(request)
+        groups = list(user_groups(request.user))
         role = groups[0] if groups else "user"
         return Response({"id": u.id, "username": u.username, "email": u.email, "groups": groups, "role": role})
 
 # ---------- Categorías ----------
-class CategoryListCreateView(generics.ListCreateAPIView):
+class CategoryListCreateView(CachedCatalogListMixin, ReplicaReadMixin, generics.ListCreateAPIView):
     def get_permissions(self):
         if self.request.method in ("POST",):
             return [group_perm("admin","bodeguero")()]
         return [IsAuthenticatedOrReadOnly()]
     queryset = Category.objects.order_by("name")
+    replica_catalog = True
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
@@ -43,29 +88,79 @@ class CategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticatedOrReadOnly]
 
 # ---------- Productos ----------
-class ProductListCreateView(generics.ListCreateAPIView):
+class ProductListCreateView(CachedCatalogListMixin, ValuesListMixin, ReplicaReadMixin, generics.ListCreateAPIView):
     permission_classes = [IsAuthenticatedOrReadOnly]
     def get_permissions(self):
         if self.request.method in ("POST",):
             return [group_perm("admin","bodeguero")()]
         return super().get_permissions()
     queryset = Product.objects.select_related("category").order_by("name")
+    replica_catalog = True
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [CatalogFilter, ProductSearchFilter]
     search_fields = ["name", "sku"]
     if hasattr(Product, "barcode"):
         search_fields.append("barcode")
+    # ?limit=&offset= opcional (ver CatalogPagination)
+    pagination_class = CatalogPagination
 
     # ⚠️ necesario para subir imagen en POST
     parser_classes = [MultiPartParser, FormParser]
 
+    list_values = PRODUCT_LIST_VALUES
+    list_rows = staticmethod(product_rows)
+
     # ✅ pasa request al serializer (URLs absolutas de imagen)
     def get_serializer_context(self):
         ctx = super().get_serializer_context()
         ctx["request"] = self.request
         return ctx
 
+class CatalogBootstrapPagination(CatalogPagination):
+    @property
+    def default_limit(self):
+        return settings.CATALOG_PAGE_SIZE
+
+
+class CatalogBootstrapView(ProductListCreateView):
+    """
+    GET /api/catalog/: carga inicial de la tienda en un request y de tamaño fijo:
+    categorías con su cantidad de productos y la primera página (mismos filtros que /api/products/).
+    """
+    http_method_names = ["get", "head", "options"]
+    pagination_class = CatalogBootstrapPagination
+
+    def get_paginated_response(self, data):
+        qs = Category.objects.using(self.get_queryset().db).order_by("name")
+        in_stock = self.request.query_params.get("in_stock", "").lower() in ("1", "true")
+        counts = qs.annotate(count=Count("products", filter=Q(products__stock__gt=0) if in_stock else None))
+        return Response({
+            "categories": list(counts.values("id", "name", "count")),
+            "products": super().get_paginated_response(data).data,
+        })
+
+class ProductImportView(APIView):
+    """POST /api/products/import/: archivo CSV/JSON en "file" o una lista JSON de filas (upsert por SKU)."""
+    permission_classes = [group_perm("admin","bodeguero")]
+    parser_classes = [JSONParser, MultiPartParser, FormParser]
+
+    def post(self, request):
+        upload = request.FILES.get("file")
+        try:
+            if upload is not None:
+                fmt = "json" if upload.name.lower().endswith(".json") else "csv"
+                rows = read_rows(upload, fmt)
+            else:
+                rows = request.data.get("rows", []) if isinstance(request.data, dict) else request.data
+        except (ValueError, UnicodeDecodeError):
+            return Response({"detail": "Archivo inválido: se espera CSV (UTF-8) o JSON."}, status=400)
+        if not isinstance(rows, list) or not rows:
+            return Response({"detail": "No hay filas para importar."}, status=400)
+
+        report = import_rows(rows)
+        return Response(report, status=200)
+
 class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_permissions(self):
         if self.request.method in ("PATCH","PUT","DELETE"):
@@ -92,8 +187,19 @@ class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
                 status=409
             )
 
+class StockAdjustView(APIView):
+    """POST /api/stock/adjust/: [{"product_id", "delta" | "absolute"}, ...] o {"items": [...], "note": ""}."""
+    permission_classes = [group_perm("admin","bodeguero")]
+    parser_classes = [JSONParser]
+
+    def post(self, request):
+        data = {"items": request.data} if isinstance(request.data, list) else request.data
+        s = StockAdjustSerializer(data=data)
+        s.is_valid(raise_exception=True)
+        return Response({"results": s.save()})
+
 # ---------- Órdenes ----------
-class OrderCreateView(generics.CreateAPIView):
+class OrderCreateView(IdempotentPostMixin, generics.CreateAPIView):
     permission_classes = [group_perm("admin","vendedor")]
     serializer_class = OrderCreateSerializer
 
@@ -104,10 +210,14 @@ class OrderCreateView(generics.CreateAPIView):
         # ✅ pasa request para consistencia (si luego agregas imágenes)
         return Response(OrderSerializer(order, context={"request": request}).data, status=201)
 
-class OrderListView(generics.ListAPIView):
-    queryset = Order.objects.order_by("-created_at").prefetch_related("items__product")
+class OrderListView(ValuesListMixin, ReplicaReadMixin, generics.ListAPIView):
+    queryset = Order.objects.order_by("-created_at", "-id")
     serializer_class = OrderSerializer
     permission_classes = [group_perm("admin","vendedor")]
+    # ?limit=50 / ?cursor=... -> {"next", "results"}; sin params -> lista completa (legacy)
+    pagination_class = KeysetPagination
+    list_values = ORDER_LIST_VALUES
+    list_rows = staticmethod(order_rows)
 
     def get_serializer_context(self):
         ctx = super().get_serializer_context()
@@ -115,11 +225,142 @@ class OrderListView(generics.ListAPIView):
         return ctx
 
 class OrderDetailView(generics.RetrieveAPIView):
-    queryset = Order.objects.prefetch_related("items__product")
+    queryset = Order.objects.prefetch_related("items")
     serializer_class = OrderSerializer
     permission_classes = [group_perm("admin","vendedor")]
 
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            # órdenes antiguas: ver api/archive.py
+            archived = ArchivedOrder.objects.filter(pk=kwargs["pk"]).first()
+            if archived is None:
+                raise
+            return Response(archived_order_row(archived))
+
     def get_serializer_context(self):
         ctx = super().get_serializer_context()
         ctx["request"] = self.request
         return ctx
+
+class OrderCancelView(APIView):
+    """POST /api/orders/<id>/cancel/: anula la orden y devuelve el stock (ledger)."""
+    permission_classes = [group_perm("admin")]
+
+    def post(self, request, pk):
+        with transaction.atomic():
+            order = get_object_or_404(Order.objects.select_for_update(), pk=pk)
+            if order.status == "cancelled":
+                return Response({"detail": "La orden ya está anulada."}, status=409)
+            stock.cancel_order(order)
+        return Response(OrderSerializer(order, context={"request": request}).data)
+
+# ---------- Exportación ----------
+class OrderExportView(APIView):
+    """GET /api/orders/export/?fmt=csv|ndjson&kind=orders|lines&from=YYYY-MM-DD&to=YYYY-MM-DD&status=paid"""
+    permission_classes = [group_perm("admin")]
+    content_types = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+    def get(self, request):
+        params = request.query_params
+        fmt = params.get("fmt", "csv")
+        kind = params.get("kind", "orders")
+        status = params.get("status") or None
+        if fmt not in export.FORMATS or kind not in export.KINDS:
+            return Response({"detail": "fmt debe ser csv|ndjson y kind orders|lines."}, status=400)
+        if status and status not in dict(Order.STATUS_CHOICES):
+            return Response({"detail": "status inválido."}, status=400)
+        try:
+            date_from, date_to = export.parse_day(params.get("from")), export.parse_day(params.get("to"))
+        except ValueError:
+            return Response({"detail": "Fechas en formato YYYY-MM-DD."}, status=400)
+
+        orders = export.iter_history(date_from, date_to, status, using=routers.read_db(request))
+        rows = export.export_rows(fmt, kind, orders)
+        response = StreamingHttpResponse(rows, content_type=self.content_types[fmt])
+        response["Content-Disposition"] = f'attachment; filename="{kind}.{fmt}"'
+        return response
+
+# ---------- Dashboard ----------
+LOW_STOCK_THRESHOLD = 5
+
+class StatsView(APIView):
+    """KPIs del panel: se leen del rollup DailySales, no de las órdenes."""
+    permission_classes = [group_perm("admin","vendedor","bodeguero")]
+
+    def get(self, request):
+        db = routers.read_db(request)
+        today = timezone.localdate()
+        days = [today - timedelta(days=n) for n in range(6, -1, -1)]
+        rows = {r.day: r for r in DailySales.objects.using(db).filter(day__range=(days[0], today))}
+
+        last7 = []
+        for d in days:
+            r = rows.get(d)
+            last7.append({"date": d.isoformat(), "total": r.total if r else 0, "orders": r.orders if r else 0})
+        hoy = last7[-1]
+
+        low_qs = Product.objects.using(db).filter(stock__lte=LOW_STOCK_THRESHOLD)
+        low = list(low_qs.order_by("stock", "name").values("id", "sku", "name", "stock")[:50])
+
+        # top de los últimos 30 días desde el rollup por producto (no recorre OrderItem)
+        top = rollups.top_products(today - timedelta(days=29), today, limit=5, using=db)
+
+        return Response({
+            "today": {
+                "date": hoy["date"],
+                "total": hoy["total"],
+                "orders": hoy["orders"],
+                "avg_ticket": round(hoy["total"] / hoy["orders"]) if hoy["orders"] else 0,
+            },
+            "last7": last7,
+            "low_stock": {"threshold": LOW_STOCK_THRESHOLD, "count": low_qs.count(), "items": low},
+            "top_products": [
+                {"sku": t["product_sku"], "name": t["name"], "units": t["units"], "revenue": t["revenue"]}
+                for t in top
+            ],
+        })
+
+
+class TopProductsView(APIView):
+    """
+    GET /api/reports/top-products/ desde ProductSalesDaily:
+      ?period=day|week|month|year (el actual, por defecto month) o ?from=YYYY-MM-DD&to=YYYY-MM-DD
+      &limit=20&by=revenue|units -> ranking
+      &sku=RAMO-PRIM&group=day|week|month -> serie de ese producto
+    """
+    permission_classes = [group_perm("admin","vendedor","bodeguero")]
+    PERIODS = ("day", "week", "month", "year")
+
+    def get(self, request):
+        params = request.query_params
+        today = timezone.localdate()
+        period = params.get("period", "month")
+        if period not in self.PERIODS:
+            return Response({"detail": "period debe ser day|week|month|year."}, status=400)
+        try:
+            date_from = export.parse_day(params.get("from")) or rollups.period_start(today, period)
+            date_to = export.parse_day(params.get("to")) or today
+            limit = min(max(int(params.get("limit", 20)), 1), 100)
+        except ValueError:
+            return Response({"detail": "Fechas en formato YYYY-MM-DD y limit numérico."}, status=400)
+        db = routers.read_db(request)
+        span = {"from": date_from.isoformat(), "to": date_to.isoformat()}
+
+        sku = params.get("sku")
+        if sku:
+            group = params.get("group", "day")
+            if group not in ("day", "week", "month"):
+                return Response({"detail": "group debe ser day|week|month."}, status=400)
+            series = rollups.product_series(sku, date_from, date_to, group, using=db)
+            return Response({**span, "sku": sku, "group": group, "results": series})
+
+        by = params.get("by", "revenue")
+        if by not in ("revenue", "units"):
+            return Response({"detail": "by debe ser revenue|units."}, status=400)
+        top = rollups.top_products(date_from, date_to, limit, by, using=db)
+        return Response({**span, "by": by, "results": [
+            {"sku": t["product_sku"], "name": t["name"], "units": t["units"], "revenue": t["revenue"]}
+            for t in top
+        ]})
@@ -0,0 +1,57 @@
+# Backend/gunicorn.conf.py: servidor de producción (SERVER_MODE=wsgi|asgi, ver start.sh)
+import multiprocessing
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "proyecto.settings")
+from django.conf import settings  # noqa: E402
+
+from api.shared_state import process_local_stores  # noqa: E402
+
+# el modo sale de settings (SERVER_MODE): CONN_MAX_AGE y ASYNC_READ_VIEWS dependen de él,
+# así que gunicorn y Django no pueden tener defaults distintos. Cualquier valor que no
+# sea asgi corre WSGI
+_mode = settings.SERVER_MODE
+
+# cachés/broker en memoria del proceso: con varios workers cada uno vería su propia copia
+_local = process_local_stores()
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS") or (1 if _local else multiprocessing.cpu_count() * 2 + 1))
+
+if _mode == "asgi":
+    # uvicorn dentro de gunicorn: gunicorn maneja los procesos, uvicorn el event loop
+    wsgi_app = "proyecto.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "proyecto.wsgi:application"
+    worker_class = "gthread"
+    threads = int(os.getenv("GUNICORN_THREADS", "4"))
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+# reciclar workers de a poco (fugas de memoria, cachés locmem que crecen)
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "200"))
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    if server.cfg.workers > 1 and _local:
+        raise SystemExit(
+            f"{server.cfg.workers} workers con estado por proceso: {', '.join(_local)}. "
+            "Configura DEFAULT_CACHE_BACKEND=redis, CATALOG_CACHE_BACKEND=redis y EVENTS_BACKEND=cache, "
+            "o usa GUNICORN_WORKERS=1."
+        )
+    # broker en caché (EVENTS_BACKEND=cache): que falle aquí y no en el primer evento
+    import django
+    django.setup()
+    from api.events import check_broker
+    errors = check_broker()
+    if errors:
+        raise SystemExit(f"{errors[0].msg} {errors[0].hint}")
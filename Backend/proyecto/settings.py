@@ -1,7 +1,9 @@
 # Archivo completo sugerido para Backend/proyecto/settings.py
 import os
+import tempfile
 from datetime import timedelta
 from pathlib import Path
+from corsheaders.defaults import default_headers
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -31,6 +33,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.metrics.MetricsMiddleware",
+    "api.routers.ReplicaPinMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -43,6 +47,15 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = "proyecto.urls"
 
+# Métricas por vista en /metrics (api/metrics.py); se loguea un warning al pasar el presupuesto
+METRICS_QUERY_BUDGET = int(os.getenv("METRICS_QUERY_BUDGET", "20"))
+# presupuesto por ruta donde el default no alcanza: el checkout bloquea, descuenta,
+# escribe ledger/rollup y reserva el código de la orden (~23 consultas)
+METRICS_QUERY_BUDGETS = {"api/orders/": 30}
+METRICS_LATENCY_BUDGET_MS = int(os.getenv("METRICS_LATENCY_BUDGET_MS", "500"))
+# /metrics exige "Authorization: Bearer <token>"; sin token solo responde con DEBUG
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
@@ -61,20 +74,134 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "proyecto.wsgi.application"
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.mysql",
-        "NAME": os.getenv("DB_NAME", "appdb"),
-        "USER": os.getenv("DB_USER", "appuser"),
-        "PASSWORD": os.getenv("DB_PASSWORD", "apppass"),
-        "HOST": os.getenv("DB_HOST", "db"),
-        "PORT": os.getenv("DB_PORT", "3306"),
-        "OPTIONS": {
-            "charset": "utf8mb4",
-            "init_command": "SET sql_mode='STRICT_TRANS_TABLES'",
-        },
+# dev (runserver) | wsgi | asgi: lo usa start.sh; gunicorn.conf.py lo lee de aquí (único default)
+SERVER_MODE = os.getenv("SERVER_MODE", "dev")
+
+# GET de catálogo y detalle de orden por el ORM async (api/async_views.py)
+ASYNC_READ_VIEWS = os.getenv("ASYNC_READ_VIEWS", str(SERVER_MODE == "asgi")).lower() == "true"
+
+# bajo ASGI cada request corre en su propio hilo y las conexiones persistentes no se
+# reutilizan (Django recomienda CONN_MAX_AGE=0 y un pooler como ProxySQL/MaxScale)
+_default_conn_age = "0" if SERVER_MODE == "asgi" else "60"
+
+# DB_ENGINE=sqlite: base local en un archivo (tests / benchmarks sin MariaDB)
+if os.getenv("DB_ENGINE", "mysql") == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.getenv("SQLITE_PATH", str(BASE_DIR / "db.sqlite3")),
+            # BD de test en archivo, no en memoria: los tests con threads (checkout concurrente)
+            # necesitan el busy timeout de SQLite; en memoria fallan con "table is locked"
+            "TEST": {"NAME": os.getenv("SQLITE_TEST_PATH") or str(Path(tempfile.gettempdir()) / "proyecto_test.sqlite3")},
+        }
     }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.mysql",
+            "NAME": os.getenv("DB_NAME", "appdb"),
+            "USER": os.getenv("DB_USER", "appuser"),
+            "PASSWORD": os.getenv("DB_PASSWORD", "apppass"),
+            "HOST": os.getenv("DB_HOST", "db"),
+            "PORT": os.getenv("DB_PORT", "3306"),
+            "OPTIONS": {
+                "charset": "utf8mb4",
+                "init_command": "SET sql_mode='STRICT_TRANS_TABLES'",
+            },
+            # conexiones persistentes por worker/hilo (0 = una conexión por request);
+            # con health checks se descarta la conexión caída antes de usarla
+            "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE") or _default_conn_age),
+            "CONN_HEALTH_CHECKS": os.getenv("DB_CONN_HEALTH_CHECKS", "True").lower() == "true",
+        }
+    }
+
+# Réplica de lectura (api/routers.py): listados, estadísticas y exportación leen de "replica"
+if os.getenv("DB_ENGINE", "mysql") == "sqlite":
+    # con SQLite la "réplica" es otro archivo (por defecto el mismo); en tests es una segunda BD
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": os.getenv("SQLITE_REPLICA_PATH", DATABASES["default"]["NAME"]),
+        "TEST": {"NAME": DATABASES["default"]["TEST"]["NAME"].replace(".sqlite3", "_replica.sqlite3")},
+    }
+elif os.getenv("DB_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": os.getenv("DB_REPLICA_HOST"),
+        "PORT": os.getenv("DB_REPLICA_PORT", DATABASES["default"]["PORT"]),
+        "USER": os.getenv("DB_REPLICA_USER", DATABASES["default"]["USER"]),
+        "PASSWORD": os.getenv("DB_REPLICA_PASSWORD", DATABASES["default"]["PASSWORD"]),
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_ROUTERS = ["api.routers.PrimaryReplicaRouter"]
+REPLICA_READS = os.getenv("DB_REPLICA_READS", str(bool(os.getenv("DB_REPLICA_HOST")))).lower() == "true"
+# segundos que un usuario lee de la primaria después de escribir (read-your-writes)
+REPLICA_PIN_SECONDS = int(os.getenv("DB_REPLICA_PIN_SECONDS", "5"))
+# dónde se guarda ese pin: con varios workers, una caché compartida
+REPLICA_PIN_CACHE_ALIAS = os.getenv("DB_REPLICA_PIN_CACHE_ALIAS") or "default"
+
+# Cachés: "catalog" guarda los listados de productos/categorías (ver api/catalog_cache.py);
+# "default", los grupos por usuario, el pin a la primaria y los Idempotency-Key.
+# *_CACHE_BACKEND: locmem (un proceso), file (compartida en la máquina, pero sin add/incr
+# atómicos: no sirve para el catálogo ni para Idempotency-Key con varios workers), redis
+# (*_CACHE_LOCATION) o ruta a un backend de Django. Si algo queda sin compartir, gunicorn
+# corre un solo worker (ver api/shared_state.py)
+_CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
+}
+_default_backend = os.getenv("DEFAULT_CACHE_BACKEND") or "locmem"
+_catalog_backend = os.getenv("CATALOG_CACHE_BACKEND") or "locmem"
+CACHES = {
+    "default": {
+        "BACKEND": _CACHE_BACKENDS.get(_default_backend, _default_backend),
+        "LOCATION": os.getenv("DEFAULT_CACHE_LOCATION") or {
+            "file": "/tmp/django_default_cache",
+            "redis": "redis://redis:6379/0",
+        }.get(_default_backend, ""),
+    },
+    "catalog": {
+        "BACKEND": _CACHE_BACKENDS.get(_catalog_backend, _catalog_backend),
+        "LOCATION": os.getenv("CATALOG_CACHE_LOCATION") or {
+            "file": "/tmp/django_catalog_cache",
+            "redis": "redis://redis:6379/2",
+        }.get(_catalog_backend, "catalog"),
+    },
 }
+if _catalog_backend in ("locmem", "file"):
+    # redis no acepta MAX_ENTRIES (sus OPTIONS van al cliente); ahí manda maxmemory
+    CACHES["catalog"]["OPTIONS"] = {"MAX_ENTRIES": 2000}
+CATALOG_CACHE_TIMEOUT = int(os.getenv("CATALOG_CACHE_TIMEOUT", "600"))
+# productos en la primera página de /api/catalog/
+CATALOG_PAGE_SIZE = int(os.getenv("CATALOG_PAGE_SIZE") or "48")
+
+# Stock/precio en vivo por SSE (/api/events/, ver api/events.py)
+# EVENTS_BACKEND: local (memoria del proceso, un solo worker) o cache (compartido entre
+# workers; necesita incr atómico: redis o memcached en EVENTS_CACHE_LOCATION)
+_events_backend = os.getenv("EVENTS_BACKEND") or "local"
+EVENTS_BACKEND = {
+    "local": "api.events.LocalBroker",
+    "cache": "api.events.CacheBroker",
+}.get(_events_backend, _events_backend)
+if _events_backend == "cache":
+    CACHES["events"] = {
+        "BACKEND": os.getenv("EVENTS_CACHE_BACKEND") or "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("EVENTS_CACHE_LOCATION") or "redis://redis:6379/1",
+    }
+    EVENTS_CACHE_ALIAS = "events"
+EVENTS_BUFFER = int(os.getenv("EVENTS_BUFFER") or "1000")
+# cada conexión se corta a los N segundos y EventSource reconecta con Last-Event-ID
+EVENTS_STREAM_SECONDS = int(os.getenv("EVENTS_STREAM_SECONDS") or "300")
+EVENTS_RETRY_MS = 3000
+# WSGI (gthread): cada stream ocupa un thread del worker hasta que se corta. Streams cortos
+# y a lo más N por proceso; el resto recibe un retry de EVENTS_BUSY_RETRY_MS y reconecta.
+# Para muchos clientes en vivo, SERVER_MODE=asgi
+EVENTS_WSGI_STREAM_SECONDS = int(os.getenv("EVENTS_WSGI_STREAM_SECONDS") or "25")
+EVENTS_WSGI_MAX_STREAMS = int(os.getenv("EVENTS_WSGI_MAX_STREAMS") or "2")
+EVENTS_BUSY_RETRY_MS = 15000
+# grupos por usuario para los permisos (api/perms.py); se invalida al cambiar membresía
+GROUPS_CACHE_TTL = int(os.getenv("GROUPS_CACHE_TTL", "300"))
+GROUPS_CACHE_ALIAS = os.getenv("GROUPS_CACHE_ALIAS") or "default"
 
 STATIC_URL = "/static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
@@ -84,19 +211,52 @@ TIME_ZONE = "America/Santiago"
 USE_I18N = True
 USE_TZ = True
 
+# JWT_STATELESS_AUTH=True: el usuario se arma desde los claims del token, sin SELECT a auth_user
+JWT_STATELESS_AUTH = os.getenv("JWT_STATELESS_AUTH", "False").lower() == "true"
+# tokens revocados antes de expirar (api/authentication.py); compartida con varios workers
+JWT_REVOCATION_CACHE_ALIAS = os.getenv("JWT_REVOCATION_CACHE_ALIAS") or "default"
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "api.authentication.StatelessJWTAuthentication"
+        if JWT_STATELESS_AUTH
+        else "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.AllowAny",
     ),
 }
 
+# /api/orders/list/ sin ?cursor ni ?limit devuelve la lista completa (compatibilidad con Orders.jsx)
+ORDERS_LEGACY_LIST = os.getenv("ORDERS_LEGACY_LIST", "True").lower() == "true"
+
+# admin: sobre esta cantidad de filas los changelists muestran un conteo estimado (api/pagination.py)
+ADMIN_EXACT_COUNT_LIMIT = int(os.getenv("ADMIN_EXACT_COUNT_LIMIT") or "100000")
+
+# archive_orders mueve a ArchivedOrder las órdenes con más de estos días (api/archive.py)
+ORDER_ARCHIVE_AFTER_DAYS = int(os.getenv("ORDER_ARCHIVE_AFTER_DAYS", "365"))
+
+# Idempotency-Key en POST /api/orders/ (api/idempotency.py): respuestas guardadas por clave
+# esta cantidad de segundos. Con varios workers, IDEMPOTENCY_CACHE_ALIAS debe ser una caché compartida
+IDEMPOTENCY_CACHE_ALIAS = os.getenv("IDEMPOTENCY_CACHE_ALIAS") or "default"
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL") or "86400")
+# cuánto espera un duplicado concurrente al primero antes de responder 409
+IDEMPOTENCY_WAIT_SECONDS = 10
+# vida de la marca "en curso"; se renueva mientras corre el checkout, así que solo acota
+# cuánto queda trabada una clave si el worker muere a mitad de camino
+IDEMPOTENCY_LOCK_SECONDS = 30
+
+# correlativos de Order.code reservados por worker en cada viaje a la BD
+ORDER_CODE_BLOCK_SIZE = int(os.getenv("ORDER_CODE_BLOCK_SIZE", "20"))
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
     "AUTH_HEADER_TYPES": ("Bearer",),
+    # claims username/groups/is_superuser en el token (api/authentication.py)
+    "TOKEN_OBTAIN_SERIALIZER": "api.authentication.ClaimsTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "api.authentication.ClaimsTokenRefreshSerializer",
+    "TOKEN_USER_CLASS": "api.authentication.ClaimsUser",
 }
 
 raw_origins = os.getenv("CORS_ALLOWED_ORIGINS", "")
@@ -106,6 +266,8 @@ else:
     CORS_ALLOWED_ORIGINS = []
 
 CORS_ALLOW_CREDENTIALS = False
+# EventSource manda Last-Event-ID al reconectar (api/events.py); el checkout, Idempotency-Key
+CORS_ALLOW_HEADERS = (*default_headers, "last-event-id", "idempotency-key")
 
 if DEBUG and not CORS_ALLOWED_ORIGINS:
     CORS_ALLOW_ALL_ORIGINS = True
@@ -113,3 +275,19 @@ if DEBUG and not CORS_ALLOWED_ORIGINS:
 BASE_DIR = Path(__file__).resolve().parent.parent
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+
+# archivos nombrados por sha256 (api/storage.py): dedupe y caché immutable
+STORAGES = {
+    "default": {"BACKEND": "api.storage.ContentAddressedStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+# "" = Django envía el archivo; "x-accel" (nginx) / "x-sendfile" (Apache) lo delegan al proxy
+MEDIA_OFFLOAD = os.getenv("MEDIA_OFFLOAD", "")
+MEDIA_ACCEL_PREFIX = os.getenv("MEDIA_ACCEL_PREFIX", "/protected-media/")
+# un archivo reutilizado hace menos de esto no se borra al reemplazar la imagen (queda para gc_media)
+MEDIA_GC_GRACE_SECONDS = int(os.getenv("MEDIA_GC_GRACE_SECONDS", "600"))
+
+# Variantes de Product.image (api/images.py)
+IMAGE_VARIANT_WIDTHS = tuple(int(w) for w in os.getenv("IMAGE_VARIANT_WIDTHS", "200,400,800").split(","))
+IMAGE_VARIANT_WORKERS = int(os.getenv("IMAGE_VARIANT_WORKERS", "2"))
+IMAGE_VARIANTS_ASYNC = os.getenv("IMAGE_VARIANTS_ASYNC", "True").lower() == "true"
@@ -1,15 +1,19 @@
 # Archivo completo sugerido para Backend/proyecto/urls.py
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from api.metrics import metrics_view
+from api.storage import media_view
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("api/", include("api.urls")),   # ⬅️ prefijo único "api/"
+    path("metrics", metrics_view),        # Prometheus
+    # media con ETag/Range/caché immutable (también en producción; ver MEDIA_OFFLOAD)
+    re_path(rf"^{re.escape(settings.MEDIA_URL.lstrip('/'))}(?P<path>.+)$", media_view),
 ]
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
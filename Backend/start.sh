@@ -0,0 +1,16 @@
+#!/bin/sh
+# Backend/start.sh: SERVER_MODE=dev (runserver) | wsgi | asgi (gunicorn, ver gunicorn.conf.py)
+set -e
+
+python manage.py migrate --noinput
+python manage.py shell < init_superuser.py
+
+case "${SERVER_MODE:-dev}" in
+  dev)
+    exec python manage.py runserver 0.0.0.0:8000 ;;
+  wsgi|asgi)
+    exec gunicorn -c gunicorn.conf.py ;;
+  *)
+    echo "SERVER_MODE inválido: $SERVER_MODE (dev|wsgi|asgi)" >&2
+    exit 1 ;;
+esac
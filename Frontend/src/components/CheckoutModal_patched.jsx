@@ -1,7 +1,7 @@
 
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import { useCart } from "../context/CartContext";
-import { createOrder } from "../services/orders";
+import { createOrder, newIdempotencyKey } from "../services/orders";
 
 export default function CheckoutModal({ open, onClose, onSuccess }) {
   const { items, subtotal, clear } = useCart();
@@ -12,6 +12,8 @@ export default function CheckoutModal({ open, onClose, onSuccess }) {
   });
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState("");
+  // una clave por checkout: volver a enviar el mismo carrito no duplica la orden
+  const attempt = useRef({ body: "", key: "" });
 
   useEffect(() => { if (!open) { setError(""); setLoading(false); } }, [open]);
   const onChange = (e) => setForm({ ...form, [e.target.name]: e.target.value });
@@ -50,7 +52,10 @@ export default function CheckoutModal({ open, onClose, onSuccess }) {
         items: items.map((it) => ({ product_id: it.id, quantity: it.qty })),
       };
 
-      const order = await createOrder(payload);
+      const body = JSON.stringify(payload);
+      if (attempt.current.body !== body) attempt.current = { body, key: newIdempotencyKey() };
+      const order = await createOrder(payload, { idempotencyKey: attempt.current.key });
+      attempt.current = { body: "", key: "" };
       clear();
       onSuccess?.(order);
       onClose();
@@ -1,5 +1,6 @@
 import { useEffect, useState } from "react";
 import api from "../services/api";
+import { subscribeProducts } from "../services/events";
 import { useAuth } from "../context/AuthContext";
 import { useNavigate } from "react-router-dom";
 import "../styles/dashboard.css";
@@ -20,12 +21,6 @@ export default function Dashboard() {
 
   // ===== Configuración de zona horaria =====
   const TZ = "America/Santiago";
-  const ymd = (d) =>
-    new Intl.DateTimeFormat("sv-SE", { timeZone: TZ }).format(d);
-  const parseCreatedAt = (s) => {
-    const hasTZ = /Z|[+-]\d{2}:\d{2}$/.test(s);
-    return new Date(hasTZ ? s : `${s}Z`);
-  };
   const dayLabel = (d) =>
     new Intl.DateTimeFormat("es-CL", { weekday: "short", timeZone: TZ })
       .format(d)
@@ -33,74 +28,43 @@ export default function Dashboard() {
       .replace(/^./, (c) => c.toUpperCase());
 
   // ===== Lógica principal =====
+  // Todo viene agregado desde el backend (/api/stats/), no se descargan órdenes
   useEffect(() => {
     async function fetchData() {
       try {
-        const { data: orders } = await api.get("/api/orders/list/");
-        const { data: products } = await api.get("/api/products/");
-
-        const now = new Date();
-        const hoy = ymd(now);
-
-        const orderDay = (o) => ymd(parseCreatedAt(o.created_at));
-
-        // Ventas del día y tickets
-        const ordersHoy = orders.filter((o) => orderDay(o) === hoy);
-        const ventasHoy = ordersHoy.reduce(
-          (acc, o) => acc + Number(o.total || 0),
-          0
-        );
-        const ticketsHoy = ordersHoy.length;
-        const ticketPromedio =
-          ticketsHoy > 0 ? Math.round(ventasHoy / ticketsHoy) : 0;
-
-        // Stock bajo
-        const low = products
-          .filter((p) => (Number(p.stock) || 0) <= 5)
-          .map((p) => ({ sku: p.sku, nombre: p.name, stock: p.stock }));
-
-        // Top productos vendidos
-        const allItems = orders.flatMap((o) => o.items || []);
-        const grouped = {};
-        for (const it of allItems) {
-          const key = it.sku || it.product;
-          if (!grouped[key])
-            grouped[key] = { nombre: it.product, vendidos: 0, ingreso: 0 };
-          grouped[key].vendidos += Number(it.quantity || 0);
-          grouped[key].ingreso += Number(it.line_total || 0);
-        }
-        const top = Object.values(grouped)
-          .sort((a, b) => b.ingreso - a.ingreso)
-          .slice(0, 5);
-
-        // Ventas últimos 7 días
-        const dias = Array.from({ length: 7 }, (_, i) => {
-          const d = new Date(now);
-          d.setDate(d.getDate() - (6 - i));
-          return d;
-        });
-        const serie = dias.map((d) => {
-          const dStr = ymd(d);
-          return orders
-            .filter((o) => orderDay(o) === dStr)
-            .reduce((acc, o) => acc + Number(o.total || 0), 0);
-        });
+        const { data } = await api.get("/api/stats/");
 
         setStats({
-          ventasHoy,
-          ticketsHoy,
-          ticketPromedio,
-          lowStockCount: low.length,
+          ventasHoy: data.today.total,
+          ticketsHoy: data.today.orders,
+          ticketPromedio: data.today.avg_ticket,
+          lowStockCount: data.low_stock.count,
         });
-        setLowStock(low);
-        setTopProductos(top);
-        setVentas7(serie);
+        setLowStock(
+          data.low_stock.items.map((p) => ({ sku: p.sku, nombre: p.name, stock: p.stock }))
+        );
+        setTopProductos(
+          data.top_products.map((p) => ({ nombre: p.name, vendidos: p.units, ingreso: p.revenue }))
+        );
+        setVentas7(data.last7.map((d) => d.total));
       } catch (err) {
         console.error("Error cargando datos del dashboard:", err);
       }
     }
 
     fetchData();
+
+    // ventas en vivo: se recalcula como mucho cada 2 s (los eventos llegan en ráfagas)
+    let timer = null;
+    const refresh = () => {
+      clearTimeout(timer);
+      timer = setTimeout(fetchData, 2000);
+    };
+    const unsubscribe = subscribeProducts({ onChange: refresh, onReset: refresh });
+    return () => {
+      clearTimeout(timer);
+      unsubscribe();
+    };
   }, []);
 
   // ===== Render =====
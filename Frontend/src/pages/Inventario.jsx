@@ -1,5 +1,7 @@
-import { useEffect, useMemo, useState } from "react";
+import { useEffect, useMemo, useRef, useState } from "react";
 import api, { API_BASE } from "../services/api";
+import { applyProductChange, subscribeProducts } from "../services/events";
+import { adjustStock } from "../services/stock";
 import "../styles/inventory.css";
 
 export default function Inventario() {
@@ -47,6 +49,17 @@ export default function Inventario() {
       .finally(() => setLoading(false));
   }, []);
 
+  // ventas y ediciones de otros usuarios, en vivo
+  useEffect(
+    () =>
+      subscribeProducts({
+        onChange: (change) => setProducts((prev) => applyProductChange(prev, change)),
+        onReset: () =>
+          api.get("/api/products/").then((r) => setProducts(r.data || [])).catch(() => {}),
+      }),
+    []
+  );
+
   const grouped = useMemo(() => {
     const term = q.trim().toLowerCase();
     const list = products.filter((p) => {
@@ -168,19 +181,38 @@ export default function Inventario() {
   }
 }
 
-  async function adjStock(p, delta) {
+  // Los clics de +1/+5/-1 se juntan y se mandan en un solo ajuste (/api/stock/adjust/)
+  const pendingDeltas = useRef(new Map());
+  const flushTimer = useRef(null);
+
+  function adjStock(p, delta) {
+    const current = Number(p.stock) || 0;
+    if (current + delta < 0) return;
+    pendingDeltas.current.set(p.id, (pendingDeltas.current.get(p.id) || 0) + delta);
+    setProducts((prev) => prev.map((x) => (x.id === p.id ? { ...x, stock: current + delta } : x)));
+    clearTimeout(flushTimer.current);
+    flushTimer.current = setTimeout(flushStock, 400);
+  }
+
+  async function flushStock() {
+    const items = [...pendingDeltas.current].map(([product_id, delta]) => ({ product_id, delta }));
+    pendingDeltas.current = new Map();
+    if (!items.length) return;
     try {
-      const newStock = Math.max(0, (Number(p.stock) || 0) + delta);
-      const { data } = await api.patch(`/api/products/${p.id}/`, {
-        stock: newStock,
-        category_id: p.category?.id ?? p.category,
-      });
-      setProducts((prev) => prev.map((x) => (x.id === p.id ? data : x)));
+      const levels = await adjustStock(items, "inventario");
+      setProducts((prev) => levels.reduce(applyProductChange, prev));
     } catch {
       alert("No se pudo actualizar el stock.");
+      api.get("/api/products/").then((r) => setProducts(r.data || [])).catch(() => {});
     }
   }
 
+  // al salir de la página se mandan los clics pendientes
+  useEffect(() => () => {
+    clearTimeout(flushTimer.current);
+    flushStock();
+  }, []);
+
   async function quickAddCategory() {
     const name = (newCatName || "").trim();
     if (name.length < 2) return alert("Escribe un nombre de categoría.");
@@ -1,33 +1,63 @@
-import { useEffect, useMemo, useState } from "react";
+import { useEffect, useState } from "react";
 import { useNavigate } from "react-router-dom";
 import api,{ API_BASE } from "../services/api";
+import { applyProductChange, subscribeProducts } from "../services/events";
 import "../styles/shop.css";
 
+const PAGE_SIZE = 48;
+
 export default function Shop() {
   const navigate = useNavigate();
 
-  // Cargar desde backend (categorías y productos)
+  // Catálogo paginado en el backend: la carga inicial es un solo request de tamaño fijo
+  // (/api/catalog/); al filtrar o buscar se pide /api/products/ con los mismos límites.
   const [categories, setCategories] = useState([]);
   const [products, setProducts] = useState([]);
-
-  useEffect(() => {
-    api.get("/api/categories/").then(r => setCategories(r.data)).catch(() => setCategories([]));
-    api.get("/api/products/").then(r => setProducts(r.data)).catch(() => setProducts([]));
-  }, []);
+  const [next, setNext] = useState(null);
+  const [reload, setReload] = useState(0);
 
   // Filtros
   const [query, setQuery] = useState("");
   const [catId, setCatId] = useState(null);
 
-  const filtered = useMemo(() => {
-    const q = query.trim().toLowerCase();
-    return products.filter(p => {
-      const matchCat = catId ? (p.category?.id ?? p.category) === catId : true;
-      const name = (p.name || "").toLowerCase();
-      const sku = (p.sku || "").toLowerCase();
-      return matchCat && (!q || name.includes(q) || sku.includes(q));
+  useEffect(() => {
+    let cancelled = false;
+    const q = query.trim();
+    const params = new URLSearchParams({ limit: PAGE_SIZE });
+    if (catId) params.set("category_id", catId);
+    if (q) params.set("search", q);
+    const url = catId || q ? `/api/products/?${params}` : `/api/catalog/?${params}`;
+    // al escribir en el buscador se espera a que termine de tipear
+    const timer = setTimeout(() => {
+      api.get(url)
+        .then(r => {
+          if (cancelled) return;
+          const page = r.data.products || r.data;
+          if (r.data.categories) setCategories(r.data.categories);
+          setProducts(page.results);
+          setNext(page.next);
+        })
+        .catch(() => !cancelled && setProducts([]));
+    }, q ? 300 : 0);
+    return () => { cancelled = true; clearTimeout(timer); };
+  }, [query, catId, reload]);
+
+  useEffect(
+    () =>
+      subscribeProducts({
+        onChange: (change) => setProducts(ps => applyProductChange(ps, change)),
+        onReset: () => setReload(n => n + 1),
+      }),
+    []
+  );
+
+  function loadMore() {
+    if (!next) return;
+    api.get(next).then(r => {
+      setProducts(ps => [...ps, ...r.data.results]);
+      setNext(r.data.next);
     });
-  }, [products, query, catId]);
+  }
 
   // Carrito
   const [cart, setCart] = useState([]);
@@ -125,7 +155,7 @@ export default function Shop() {
               key={c.id}
               className={`cat ${catId === c.id ? "active" : ""}`}
               onClick={() => setCatId(prev => prev === c.id ? null : c.id)}
-              title={c.name}
+              title={`${c.name} (${c.count ?? 0})`}
             >
               <span className="cat-ic">🪴</span>
               <span className="cat-tx">{c.name}</span>
@@ -134,16 +164,31 @@ export default function Shop() {
         </div>
 
         <div className="grid-products">
-          {filtered.map((p) => (
+          {products.map((p) => (
             <button key={p.id} className="prod" onClick={() => addToCart(p)}>
               <div className="pic">
-                <img src={p.image?.startsWith("http") ? p.image : `${API_BASE}${p.image}`} alt={p.name} />
+                {/* variantes redimensionadas si ya existen; si no, el original */}
+                <picture>
+                  {p.image_srcset?.webp && (
+                    <source type="image/webp" srcSet={p.image_srcset.webp} sizes="200px" />
+                  )}
+                  <img
+                    src={p.image?.startsWith("http") ? p.image : `${API_BASE}${p.image}`}
+                    srcSet={p.image_srcset?.jpeg || undefined}
+                    sizes="200px"
+                    loading="lazy"
+                    alt={p.name}
+                  />
+                </picture>
               </div>
               <div className="pname">{p.name}</div>
               <div className="pprice">{formatCLP(p.price)}</div>
             </button>
           ))}
         </div>
+        {next && (
+          <button className="load-more" onClick={loadMore}>Ver más</button>
+        )}
       </main>
     </div>
   );
@@ -0,0 +1,18 @@
+import { API_BASE } from "./api";
+
+// Stock y precio en vivo (SSE en /api/events/). EventSource reconecta solo y manda
+// Last-Event-ID, así que tras un corte llegan los cambios que faltaron; si ya no
+// están en el servidor llega "reset" y hay que recargar la lista.
+export function subscribeProducts({ onChange, onReset }) {
+  const es = new EventSource(`${API_BASE}/api/events/`);
+  const handle = (e) => onChange(JSON.parse(e.data));
+  es.addEventListener("stock", handle);
+  es.addEventListener("price", handle);
+  es.addEventListener("reset", () => onReset && onReset());
+  return () => es.close();
+}
+
+// change: { id, stock } o { id, price }
+export function applyProductChange(products, change) {
+  return products.map((p) => (p.id === change.id ? { ...p, ...change } : p));
+}
@@ -1,6 +1,25 @@
 import api from "./api";
 
-export async function createOrder(payload) {
-  const { data } = await api.post("/api/orders/", payload);
-  return data;
+// crypto.randomUUID solo existe en contextos seguros (https/localhost); el POS puede ir por http en la LAN
+export function newIdempotencyKey() {
+  if (globalThis.crypto?.randomUUID) return crypto.randomUUID();
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}-${Math.random().toString(36).slice(2)}`;
+}
+
+// idempotencyKey: la misma en cada reintento de un mismo checkout. Si la red corta
+// después de que el backend creó la orden, el reintento devuelve esa misma orden.
+export async function createOrder(payload, { idempotencyKey, retries = 2 } = {}) {
+  const headers = idempotencyKey ? { "Idempotency-Key": idempotencyKey } : {};
+  for (let attempt = 0; ; attempt++) {
+    try {
+      const { data } = await api.post("/api/orders/", payload, { headers });
+      return data;
+    } catch (err) {
+      // sin respuesta (red) o 409 (el mismo checkout sigue en curso): se reintenta con la misma clave
+      const status = err?.response?.status;
+      const retriable = idempotencyKey && (!err?.response || status === 409);
+      if (!retriable || attempt >= retries) throw err;
+      await new Promise((r) => setTimeout(r, 1000 * (attempt + 1)));
+    }
+  }
 }
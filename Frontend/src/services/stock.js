@@ -0,0 +1,8 @@
+import api from "./api";
+
+// items: [{ product_id, delta }] o [{ product_id, absolute }]; todo en una transacción.
+// Devuelve los saldos nuevos: [{ id, stock }]
+export async function adjustStock(items, note = "") {
+  const { data } = await api.post("/api/stock/adjust/", { items, note });
+  return data.results;
+}